@@ -1,942 +1,242 @@
 import streamlit as st
 import json
-from openai import OpenAI
 import os
 from docx import Document
 from docx.shared import Pt, Inches
 from docx.enum.style import WD_STYLE_TYPE  # 添加这行导入
 import io
+import hashlib
 import datetime
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from llm import chat_completion, get_client, set_usage_recorder, llm_metrics
+from ExamDB import ExamDatabase
+from exam_context import parse_outline
+from st_context import attach_script_run_ctx, get_api_key, current_session_id
+from fair_scheduler import request_scope
+from deadline import CancelToken, Cancelled, deadline_scope
+from job_queue import JobQueue, JOB_RUNNING, JOB_DONE, JOB_FAILED
+import exam_generator
+from exam_generator import estimate_exam_prompt_tokens
 
 # 设置页面配置必须是第一个 Streamlit 命令
 st.set_page_config(page_title="课程考试生成器", page_icon="📚", layout="wide")
 
-# 在文件开头添加这个函数定义
-def get_project_score_standards(project_requirements):
-    """生成项目评分标准文本"""
-    standards = {
-        "需求分析": {
-            "score": 20,
-            "items": [
-                {"name": "需求完整性", "score": 5, "criteria": "需求覆盖度和准确性"},
-                {"name": "分析深度", "score": 5, "criteria": "问题分析的深度和合理性"},
-                {"name": "文档质量", "score": 5, "criteria": "文档的规范性和完整性"},
-                {"name": "创新性", "score": 5, "criteria": "解决方案的创新程度"}
-            ]
-        },
-        "概要设计": {
-            "score": 25,
-            "items": [
-                {"name": "架构设计", "score": 8, "criteria": "系构的合理性和可扩展性"},
-                {"name": "技术方案", "score": 7, "criteria": "技术选型的适当性"},
-                {"name": "模块划分", "score": 5, "criteria": "模块划分的清晰度和耦合度"},
-                {"name": "创新性", "score": 5, "criteria": "设计方案的创新性"}
-            ]
-        },
-        "详细设计": {
-            "score": 20,
-            "items": [
-                {"name": "设计完整性", "score": 6, "criteria": "设计文档的完整性"},
-                {"name": "设计合理性", "score": 6, "criteria": "设计方案的可行性"},
-                {"name": "规范性", "score": 4, "criteria": "设计规范的遵循程度"},
-                {"name": "创新性", "score": 4, "criteria": "设计细节的创新点"}
-            ]
-        },
-        "代码实现": {
-            "score": 25,
-            "items": [
-                {"name": "功能实现", "score": 8, "criteria": "功能的完整性和正确性"},
-                {"name": "代码质量", "score": 7, "criteria": "代码规范性和可维护性"},
-                {"name": "性能优化", "score": 5, "criteria": "代码执行效率"},
-                {"name": "新实现", "score": 5, "criteria": "技术实现的创新性"}
-            ]
-        },
-        "测试报告": {
-            "score": 10,
-            "items": [
-                {"name": "测试覆盖", "score": 3, "criteria": "测试用例的覆盖度"},
-                {"name": "测试执行", "score": 3, "criteria": "测试执行的完整性"},
-                {"name": "问题修复", "score": 2, "criteria": "问题跟踪和解决情况"},
-                {"name": "报告质量", "score": 2, "criteria": "测试报告的规范性"}
-            ]
-        }
-    }
-    
-    result = []
-    total_score = 0
-    
-    for req in project_requirements:
-        if req in standards:
-            std = standards[req]
-            total_score += std['score']
-            result.append(f"\n{req}（{std['score']}分）：")
-            for item in std['items']:
-                result.append(f"- {item['name']}（{item['score']}分）：{item['criteria']}")
-    
-    # 添加总分说明
-    if result:
-        result.insert(0, f"总分：{total_score}分")
-    
-    return "\n".join(result)
+# 界面生成时使用会话的API Key，提示直接显示在页面上
+exam_generator.configure(api_key=get_api_key(), reporter=lambda level, message: getattr(st, level)(message))
+
+# 每次大模型调用的token、耗时等统计写入usage_logs
+set_usage_recorder(ExamDatabase().log_llm_call)
+
+# 界面上一次生成的整体时限（秒）
+EXAM_DEADLINE_SECONDS = float(os.environ.get("EXAM_DEADLINE_SECONDS", "600"))
+
+@contextmanager
+def generation_deadline(seconds=EXAM_DEADLINE_SECONDS):
+    """界面发起的生成：限定整体时限，页面重跑时取消尚未完成的模型调用"""
+    previous_token = st.session_state.get('exam_cancel_token')
+    if previous_token is not None:
+        previous_token.cancel("页面已重新运行")
+    token = st.session_state['exam_cancel_token'] = CancelToken()
+    try:
+        with deadline_scope(seconds=seconds, token=token):
+            yield token
+    except BaseException:
+        token.cancel("页面已重新运行")
+        raise
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def _parse_course_outline(digest, _raw):
+    # 按内容哈希缓存，返回同一个对象，页面重跑时不再复制或重新解析
+    return parse_outline(_raw, digest)
 
 def load_course_outline(uploaded_file):
-    """加载课程大纲JSON文件"""
+    """加载课程大纲JSON文件，返回 ParsedOutline；相同内容只解析一次"""
     if uploaded_file is not None:
-        return json.load(uploaded_file)
+        raw = uploaded_file.getvalue()
+        return _parse_course_outline(hashlib.sha256(raw).hexdigest(), raw)
     return None
 
-def create_exam_prompt(outline_data, exam_type, chapters=None, additional_requirements=None, config=None):
-    """创建考试提示"""
-    # 获取课程基本信息
-    course_type = outline_data['basic_info']['course_type']
-    department = outline_data['basic_info']['department']
-    major = outline_data['basic_info']['major']
-    
-    # 处理章节文本
-    if chapters and isinstance(chapters, list):
-        chapters_text = ', '.join(chapters)
-    else:
-        chapters_text = "全部章节"
-    
-    # 根据考试类型选择JSON格式
-    if exam_type == "实验":
-        json_format = get_experiment_json_format()
-    elif exam_type == "大作业":
-        json_format = get_project_json_format()
-    else:
-        json_format = '''{
-            "questions": [
-                {
-                    "type": "选择题/判断题/简答题/编程题",
-                    "question": "题目内容",
-                    "options": ["A. 选项1", "B. 选项2", "C. 选项3", "D. 选项4"],
-                    "answer": "标准答案",
-                    "explanation": "解题思路和解析",
-                    "course_objectives": ["对应的课程目标"],
-                    "aacsb_goals": ["对应的AACSB目标"],
-                    "difficulty": "基础/中等/困",
-                    "score": "分值"
-                }
-            ]
-        }'''
-    
-    system_prompt = f"""
-    你一位专业的教育考试出题专家，门负责{department}{major}专业的{course_type}考试命题工作
-    请于提供的课程信息生成高质量的考试题目，并以JSON格式输出，要求如下：
+@st.cache_data(max_entries=256, show_spinner=False)
+def cached_prompt_tokens(digest, exam_type, chapters, difficulty, _outline_data):
+    """按大纲内容哈希缓存提示词规模估算，章节和题型不变时页面重跑不再重新构建提示词"""
+    return estimate_exam_prompt_tokens(
+        _outline_data, exam_type, list(chapters),
+        config={"type": exam_type, "difficulty": difficulty}
+    )
 
-    1. 考试目标：
-       - 准确评学生对课程知识点的掌握程度
-       - 考核学生的实践应用能力
-       - 符合AACSB认证标准的要求
-       - 体现专业特色和课程定位
-    
-    2. 题目要求：
-       - 每道题目必须对应具体的课程目标和AACSB目标
-       - 题目难度要合理分布，并明确标注难度级别
-       - 实践类题目必须符合专业特点
-       - 所有题都要提供详细的解析和评分标准
-       - 确保题目符合{department}{major}专业的特点和要求
-    
-    3. 知识点关联要求：
-       - 体现知识点间的逻辑关系和递进性
-       - 注重前后章节知识的连贯性
-       - 强调知识点的实际应用场景
-       - 突出重点和难点知识的关联
-       - 体现知识体系的完整性
+def generate_exam(outline_data, exam_type, chapters=None, additional_requirements=None, config=None, temperature=0.7, use_cache=True, on_question=None, priority="interactive", user=None):
+    """界面调用的考试生成，出错时在页面上提示并返回None，参数见 exam_generator.generate_exam"""
+    try:
+        return exam_generator.generate_exam(
+            outline_data, exam_type, chapters, additional_requirements, config,
+            temperature=temperature, use_cache=use_cache, on_question=on_question, priority=priority,
+            user=current_session_id() if user is None else user
+        )
+    except Cancelled as e:
+        st.warning(f"生成已停止：{e}")
+        return None
+    except Exception as e:
+        st.error(f"API调用错误: {str(e)}")
+        return None
+
+def generate_and_display_exam(outline_data, exam_type, chapters=None, additional_requirements=None, config=None, temperature=0.7, use_cache=True):
+    """生成并显示考试内容，题目类考试边生成边显示"""
+    if exam_type in ("大作业", "实验"):
+        exam_content = generate_exam(outline_data, exam_type, chapters, additional_requirements, config, temperature, use_cache)
+        display_exam_content(exam_content, exam_type)
+        return exam_content
     
-    4. 能力递进要求：
-       - 基础能力：概念理解和基本应用
-       - 进阶能力：知识综合和问题分析
-       - 高阶能力：创新设计和优化改进
-       - 实践能力：工程实践和项目开发
+    st.markdown("---")
+    st.subheader("📝 生成的考试内容")
+    shown = []
     
-    5. JSON输出格式：
-    {json_format}
+    def show_question(q):
+        shown.append(q)
+        display_question(q, len(shown))
+        st.markdown("---")
     
-    请确保输出严格遵循上述JSON格式。
+    exam_content = generate_exam(
+        outline_data, exam_type, chapters, additional_requirements, config,
+        temperature, use_cache, on_question=show_question
+    )
+    if not exam_content:
+        st.error("未能成功生成内容")
+    elif 'questions' not in exam_content:
+        st.error("生成的考试内容格式不正确")
+    elif len(exam_content['questions']) > len(shown):
+        # 流式解析未能拆出的题目在结束后补充显示
+        for i, q in enumerate(exam_content['questions'][len(shown):], len(shown) + 1):
+            display_question(q, i)
+            st.markdown("---")
+    return exam_content
+
+# 批量生成时可选的试卷套别
+EXAM_VARIANT_LABELS = ["A卷", "B卷", "C卷", "补考卷"]
+
+def generate_exam_variants(outline_data, exam_type, chapters=None, additional_requirements=None, config=None, variant_labels=None, max_concurrency=4, temperature=0.7, use_cache=True):
+    """并发生成多套试卷，返回 {套别: 考试内容}
+
+    并发数由线程池大小限制，每次API调用还受 llm.rate_limiter 的
+    每分钟请求数/token数限制。
     """
+    variant_labels = variant_labels or EXAM_VARIANT_LABELS
     
-    # 根据不同考试类型调整提示内容
-    exam_type_prompts = {
-        "练习": f"""
-        {course_type}练习题要求：
-        
-        练习难度要求（{config.get('difficulty', '中等')}）：
-        {
-            '''
-            基础难度（Remember & Understand）：
-            1. 题型分布：
-               - 基础概念题（40%）：考察核心概念理解
-               - 简单应用题（40%）：考察基本原理应用
-               - 基础分析题（20%）：考察简单问题分析
-            
-            2. 知识覆盖：
-               - 核心概念准确理解
-               - 基本原理正确应用
-               - 标准流程熟练掌握
-               - 基础编程技能运用
-            
-            3. 答题要求：
-               - 概念定义准确清晰
-               - 基本步骤完整规范
-               - 代码实现基本正确
-               - 结果计算准确无误
-            
-            4. 评分标准：
-               - 概念理解（40%）：术语确、原理清晰
-               - 应用能力（40%）：步骤正确、结果准确
-               - 表达能力（20%）：条理清晰、书写规范
-            ''' if config.get('difficulty') == '基础' else
-            '''
-            中等难度（Apply & Analyze）：
-            1. 题型分布：
-               - 概念应用题（30%）：考察知识综合运用
-               - 综合分析题（40%）：考察问题分析能力
-               - 实践应用题（30%）：考察实际问题解决
-            
-            2. 知识覆盖：
-               - 多知识点综合运用
-               - 实际问题分析能力
-               - 算法设计与优化
-               - 代码实现与调试
-            
-            3. 答题要求：
-               - 分析过程逻辑完整
-               - 解决方案合理可行
-               - 代码实现规范高效
-               - 结果分析深入准确
-            
-            4. 评分标准：
-               - 分析能力（35%）：思路清晰、逻辑严谨
-               - 解决方案（35%）：方案合理、实现正确
-               - 创新思维（30%）：方法创新、优化改进
-            ''' if config.get('difficulty') == '中等' else
-            '''
-            提高难度（Evaluate & Create）：
-            1. 题型分布：
-               - 综合应用题（30%）：考察系统性思维
-               - 方案设计题（40%）：考察创新设计能力
-               - 优化改进题（30%）：考察问题优化能力
-            
-            2. 知识覆盖：
-               - 系统架构设计能力
-               - 性能优化分析能力
-               - 创新解决方案能力
-               - 工程实践应用能力
-            
-            3. 答题要求：
-               - 方案设计完整创新
-               - 性能分析深入全面
-               - 代码实现高效优雅
-               - 优化思路清晰可行
-            
-            4. 评分标准：
-               - 设计能力（30%）：方案创新、架构合理
-               - 实现能力（30%）：代码优秀、性能优化
-               - 创新能力（40%）：思路创新、解决方案优秀
-            '''
-        }
-        
-        通用评分标准：
-        1. 答题完整性（20%）：
-           - 问题理解准确
-           - 解答步骤完整
-           - 结果表达清晰
-        
-        2. 专业规范性（30%）：
-           - 专业术语使用准确
-           - 解题思路专业规范
-           - 代码编写符合规范
-        
-        3. 创新思维（20%）：
-           - 解题思路创新
-           - 方法选择合理
-           - 优化改进意识
-        
-        4. 实践应用（30%）：
-           - 理论联系实际
-           - 解决实际问题
-           - 考虑实际约束
-        
-        要求说明：
-        1. 题型要求（必须严格按照以下数量生成）：
-        {chr(10).join([
-            f"   - {q_type}：必须生成{details['count']}题（{details['description']}）"
-            for q_type, details in config.get('practice_types', {}).items()
-        ])}
-        
-        2. 知识点覆盖：
-           - 重点章节内容占比70%
-           - 基础知识考察30%
-           - 确保知识点分布合理
-        
-        3. 题目要求：
-           - 每道题目必须标注对应的课程目标和AACSB目标
-           - 每道题目必须包含详细的答案和解析
-           - 题目描述必须清晰准确
-           - 答案和评分标准必须明确
-        
-        4. 实施要求：
-           - 题目数量必须严格按照要求生成
-           - 每道题的分值必须与设定一致
-           - 各种题型的总分必须符合设定
-           - 必须覆盖选定的所有章节内容
-           - 确保题目难度分布合理
-        
-        5. 特殊说明：
-           - 选择题必须包含4个选项
-           - 判断题必须明确是非
-           - 简答题必须提供详细评分点
-           - 编程题必须包含测试用例
-        """,
-        
-        "实验": f"""
-        请生成一个完整的{course_type}实验指导方案，类型为{config.get('lab_type', '综合性')}实验。
-        
-        实验难度要求（{config.get('difficulty', '中等')}）：
-        {
-            '''
-            基础难度（Remember & Understand）：
-            1. 实验内容：
-               - 聚焦单个核心知识点
-               - 步骤清晰，流程明确
-               - 提供完整的代码框架
-               - 详细的操作指导
-            
-            2. 实验要求：
-               - 基本功能的实现
-               - 代码规范性要求
-               - 简单的功能测试
-               - 基础实验报告
-            
-            3. 评分标准：
-               - 功能完整性（40%）
-               - 代码规范性（30%）
-               - 实验报告（30%）
-            ''' if config.get('difficulty') == '基础' else
-            '''
-            中等难度（Apply & Analyze）：
-            1. 实验内容：
-               - 组合多个知识点
-               - 部分步骤需自主设计
-               - 提供部分代码框架
-               - 关键步骤有指导
-            
-            2. 实验要求：
-               - 完整功能实现
-               - 代码优化要求
-               - 完整的测试方案
-               - 详细的分析报告
-            
-            3. 评分标准：
-               - 功能实现（35%）
-               - 代码质量（35%）
-               - 实验报告（30%）
-            ''' if config.get('difficulty') == '中等' else
-            '''
-            提高难度（Evaluate & Create）：
-            1. 实验内容：
-               - 综合性问题解决
-               - 完全自主设计
-               - 仅提供基本框架
-               - 鼓励创新设计
-            
-            2. 实验要求：
-               - 创新性解决方案
-               - 性能优化要求
-               - 完整的测试体系
-               - 深入的分析报告
-            
-            3. 评分标准：
-               - 方案创新性（30%）
-               - 实现质量（40%）
-               - 分析报告（30%）
-            '''
-        }
-        
-        实验设计要求：
-        1. 实验定位：
-           {config.get('lab_type', '综合性')}实验的特点：
-           {
-               '''
-               基础性实验：
-               - 针对单个知识点的掌握和应用
-               - 提供详细的操作指导
-               - 给出完整的代码框架
-               - 设置明确的检查点
-               - 预期结果清晰具体
-               ''' if config.get('lab_type') == '基础性' else
-               '''
-               综合性实验：
-               - 涉及多个知识点的综合应用
-               - 提供关键步骤的指导
-               - 给出部分代码框架
-               - 需要自主设计部分内容
-               - 有一定的探索空间
-               ''' if config.get('lab_type') == '综合性' else
-               '''
-               设计性实验：
-               - 提供开放性问题
-               - 需要自主设计解决方案
-               - 只提基本框或不提供
-               - 鼓励创新和多样化
-               - 重视方案的可行性
-               '''
-           }
-
-        2. 识要求：
-           - 应章节：{chapters_text}
-           - 涉及知识点：请根章节内容列
-           - 前置知识要求：请明确指出
-        
-        3. 实验内容：
-           - 实验名称：应明确反映实验内容和类型
-           - 实验目标：应对应课程目标和AACSB目标
-           - 实验步骤：应符合实验型特点
-           - 预期结果：应明确可验证
-        
-        4. 实验指导：
-           - 环境准备：详细的环境配置说明
-           - 操作步骤：符合实验类型的详细程度
-           - 代码模板：根据实验类型提供相应的代码
-           - 注意事项：可能遇到的问题和解决方案
-        
-        5. 考核要求：
-           - 实验准备（20分）：
-             * 环境配置完整性
-             * 预习报告质量
-           - 实验实现（50分）：
-             * 功能完成度
-             * 代码质量
-             * 实现效果
-           - 实验报告（30分）：
-             * 文档规范性
-             * 结果分析
-             * 总结反思
-        
-        6. 创新与拓展：
-           - 提供选做内容
-           - 鼓励创新维
-           - 指出扩展方向
-        
-        请确保生成的实验内容：
-        1. 符合{major}专业特点
-        2. 难度适合{course_type}水平
-        3. 符合{config.get('lab_type', '综合性')}实的特点
-        4. 与所选章节内容紧密相关
-        5. 实验步骤清晰可执行
-        6. 分标准客观可量化
-        
-        请严格按照提供的JSON格式生成实验内容。
-        """,
-        
-        "大作业": f"""
-        {course_type}大作业要求：
-        
-        项目难度要求（{config.get('difficulty', '中等')}）：
-        {
-            '''
-            基础难度（Remember & Understand）：
-            1. 项目范围：
-               - 单一主题研究
-               - 明确的研究目标
-               - 基础理论应用
-               - 标准研究方法
-            
-            2. 内容要求：
-               - 基本概念运用
-               - 规范的研究过程
-               - 基础数据分析
-               - 简单的结论总结
-            
-            3. 文档要求：
-               - 基础研究报告
-               - 简单文献综述
-               - 基本数据说明
-               - 研究过程描述
-            ''' if config.get('difficulty') == '基础' else
-            '''
-            中等难度（Apply & Analyze）：
-            1. 项目范围：
-               - 多维度研究主题
-               - 完整的研究体系
-               - 多种方法应用
-               - 规范的研究管理
-            
-            2. 内容要求：
-               - 深入的理论分析
-               - 合理的方法应用
-               - 完整的数据处理
-               - 有价值的研究发现
-            
-            3. 文档要求：
-               - 详细研究报告
-               - 完整文献综述
-               - 深入分析说明
-               - 研究价值论证
-            ''' if config.get('difficulty') == '中等' else
-            '''
-            提高难度（Evaluate & Create）：
-            1. 项目范围：
-               - 创新性研究主题
-               - 跨学科研究方向
-               - 前沿理论应用
-               - 系统性研究设计
-            
-            2. 内容要求：
-               - 创新性研究方法
-               - 深度理论探讨
-               - 系统数据分析
-               - 有创见的结论
-            
-            3. 文档要求：
-               - 学术性研究报告
-               - 系统文献综述
-               - 创新点分析
-               - 研究展望讨论
-            '''
-        }
-        
-        项目类型（根据{course_type}特点）：
-        {
-            '''
-            编程开发类：
-            - 软件系统开发
-            - 算法实现与优化
-            - 数据处理分析
-            - 应用系统集成
-            ''' if "程序设计" in course_type or "编程" in course_type else
-            '''
-            数据分析类：
-            - 数据收集与处理
-            - 统计分析研究
-            - 数据可视化
-            - 预测模型构建
-            ''' if "统计" in course_type or "数据" in course_type else
-            '''
-            理论研究类：
-            - 文献综述研究
-            - 理论模型构建
-            - 案例分析研究
-            - 对比研究分析
-            ''' if "理论" in course_type or "研究" in course_type else
-            '''
-            实验研究类：
-            - 实验设计与实施
-            - 数据采集分析
-            - 实验结果验证
-            - 实验报告撰写
-            ''' if "实验" in course_type else
-            '''
-            综合研究类：
-            - 主题研究设计
-            - 资料收集整理
-            - 分析与总结
-            - 研究报告撰写
-            '''
+    def generate_variant(label):
+        variant_requirements = (
+            f"本次生成的是{label}。同批次共生成{'、'.join(variant_labels)}，"
+            f"各套试卷题型、分值和难度保持一致，但题目内容不得重复。"
+        )
+        if additional_requirements:
+            variant_requirements = f"{additional_requirements}\n{variant_requirements}"
+        # 多套试卷按批量类请求调度，不挤占其他用户的交互请求
+        return generate_exam(
+            outline_data, exam_type, chapters, variant_requirements, config, temperature, use_cache,
+            priority="batch", user=user
+        )
+    
+    user = current_session_id()
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        # 复制当前上下文，各套试卷沿用调用方的截止时间和取消令牌
+        futures = {
+            label: executor.submit(contextvars.copy_context().run, attach_script_run_ctx(generate_variant), label)
+            for label in variant_labels
         }
-        
-        项目要求：
-           选定的项目要求：{', '.join(config.get('project_requirements', ['研究分析']))}
-           
-           具体要求：
-           {chr(10).join([
-               f"- {req}：" + (
-                   '''
-                   研究分析：
-                   * 研究背景调研
-                   * 研究目标确定
-                   * 研究方法选择
-                   * 研究框架设计
-                   * 研究计划制定
-                   * 可行性分析
-                   ''' if req == "研究分析" else
-                   '''
-                   理论基础：
-                   * 文献资料收集
-                   * 理论框架构建
-                   * 研究假设提出
-                   * 变量关系分析
-                   * 理论模型设计
-                   * 研究方法确定
-                   ''' if req == "理论基础" else
-                   '''
-                   方案设计：
-                   * 研究方案设计
-                   * 技术路线规划
-                   * 研究步骤安排
-                   * 数据采集计划
-                   * 分析方法选择
-                   * 预期成果设定
-                   ''' if req == "方案设计" else
-                   '''
-                   实施过程：
-                   * 数据收集整理
-                   * 分析过程实施
-                   * 结果记录整理
-                   * 过程质量控制
-                   * 问题解决记录
-                   * 阶段成果总结
-                   ''' if req == "实施过程" else
-                   '''
-                   总结报告：
-                   * 研究报告撰写
-                   * 研究结果分析
-                   * 研究结论提炼
-                   * 研究价值论证
-                   * 研究局限讨论
-                   * 未来展望建议
-                   '''
-               ) for req in config.get('project_requirements', ['研究分析'])
-           ])}
-        
-        评分标准（总分100分）：
-           {get_project_score_standards(config.get('project_requirements', ['研究分析']))}
-        
-        提交要求：
-           - 提交时间：严格遵守截止日期
-           - 提交格式：
-             * 研究报告（PDF格式）
-             * 支撑材料（根据项目类型提供）
-             * 演示文稿（PPT格式）
-             * 研究成果展示（视频或现场）
-        
-        加分项（总分基础上最多加10分）：
-           - 创新性：研究视角或方法创新（+3分）
-           - 实用性：研究成果具有实际应用价值（+3分）
-           - 完整性：资料完整、结构清晰（+2分）
-           - 表现：成果展示和答辩表现优秀（+2分）
-        
-        扣分项：
-           - 迟交：每迟交一天扣总分5分
-           - 抄袭：发现抄袭直接记0分
-           - 资料缺失：缺少关键资料扣5-10分
-           - 内容缺陷：重要内容缺失每项扣3-5分
-        
-        时间安排：
-           - 前期准备：建议用时20%
-           - 实施阶段：建议用时50%
-           - 总结分析：建议用时30%
-        
-        团队协作要求（如果是团队项目）：
-           - 明确的分工安排
-           - 定期的进度汇报
-           - 规范的资料管理
-           - 完整的协作记录
-        
-        请确保生成的大作业内容：
-        1. 符合{course_type}课程特点
-        2. 难度适合{major}专业水平
-        3. 与所选章节内容紧密相关
-        4. 研究要求清晰可执行
-        5. 评分标准客观可量化
-        6. 体现学术研究规范
-        
-        请严格按照提供的JSON格式生成大作业内容。
-        """,
-        
-        "期末试题": f"""
-        {course_type}期末试题要求：
-        
-        特别强调：
-        1. 题型数量严格要求：
-           - 必须严格按照以下配置生成题目，不能多也不能少：
-           {chr(10).join([
-               f"   * {q_type}：必须精确生成{details['count']}题，每题{details['score']}分，总计{details['total']}分"
-               for q_type, details in config.get('question_types', {}).items()
-           ])}
-           - 禁止生成未指定的题型
-           - 禁止更改题目数量
-           - 禁止更改分值设置
+        return {label: future.result() for label, future in futures.items()}
 
-        2. 分值合计检查：
-           - 总分必须严格等于{config.get('total_score', 100)}分
-           - 每种题型的总分必须与设定值完全一致
-           - 每道题的分值必须与设定一致
-        
-        试题难度要求（{config.get('difficulty', '中等')}）：
-        {
-            '''
-            基础难度（Remember & Understand）：
-            1. 题型分布：
-               - 基础概念题（40%）：考察核心概念理解
-               - 简单应用题（40%）：考察基本原理应用
-               - 基础分析题（20%）：考察简单问题分析
-            
-            2. 知识覆盖：
-               - 核心概念准确理解
-               - 基本原理正确应用
-               - 标准流程熟练掌握
-               - 基础编程技能运用
-            
-            3. 答题要求：
-               - 概念定义准确清晰
-               - 基本步骤完整规范
-               - 代码实现基本正确
-               - 结果计算准确无误
-            
-            4. 评分标准：
-               - 概念理解（40%）：术语确、原理清晰
-               - 应用能力（40%）：步骤正确、结果准确
-               - 表达能力（20%）：条理清晰、书写规范
-            ''' if config.get('difficulty') == '基础' else
-            '''
-            中等难度（Apply & Analyze）：
-            1. 题型分布：
-               - 概念应用题（30%）：考察知识综合运用
-               - 综合分析题（40%）：考察问题分析能力
-               - 实践应用题（30%）：考察实际问题解决
-            
-            2. 知识覆盖：
-               - 多知识点综合运用
-               - 实际问题分析能力
-               - 算法设计与优化
-               - 代码实现与调试
-            
-            3. 答题要求：
-               - 分析过程逻辑完整
-               - 解决方案合理可行
-               - 代码实现规范高效
-               - 结果分析深入准确
-            
-            4. 评分标准：
-               - 分析能力（35%）：思路清晰、逻辑严谨
-               - 解决方案（35%）：方案合理、实现正确
-               - 创新思维（30%）：方法创新、优化改进
-            ''' if config.get('difficulty') == '中等' else
-            '''
-            提高难度（Evaluate & Create）：
-            1. 题型分布：
-               - 综合应用题（30%）：考察系统性思维
-               - 方案设计题（40%）：考察创新设计能力
-               - 优化改进题（30%）：考察问题优化能力
-            
-            2. 知识覆盖：
-               - 系统架构设计能力
-               - 性能优化分析能力
-               - 创新解决方案能力
-               - 工程实践应用能力
-            
-            3. 答题要求：
-               - 方案设计完整创新
-               - 性能分析深入全面
-               - 代码实现高效优雅
-               - 优化思路清晰可行
-            
-            4. 评分标准：
-               - 设计能力（30%）：方案创新、架构合理
-               - 实现能力（30%）：代码优秀、性能优化
-               - 创新能力（40%）：思路创新、解决方案优秀
-            '''
+def create_question_prompt(outline_data, exam_content, index, config=None):
+    """创建单题替换的提示，只携带该题需要的上下文"""
+    questions = exam_content['questions']
+    old_question = questions[index]
+    basic_info = outline_data['basic_info']
+    chapters = (config or {}).get('chapters')
+    
+    system_prompt = """
+    你是一位专业的教育考试出题专家，请替换试卷中的一道题目，并以JSON格式输出：
+    {
+        "question": {
+            "type": "选择题/判断题/简答题/编程题",
+            "question": "题目内容",
+            "options": ["A. 选项1", "B. 选项2", "C. 选项3", "D. 选项4"],
+            "answer": "标准答案",
+            "explanation": "解题思路和解析",
+            "course_objectives": ["对应的课程目标"],
+            "aacsb_goals": ["对应的AACSB目标"],
+            "difficulty": "基础/中等/困难",
+            "score": "分值"
         }
-        
-        考试基本要求：
-        1. 考试时长：{config.get('duration', 120)}分钟
-        2. 总分：{config.get('total_score', 100)}分
-        
-        题型结构要求：
-        1. 选择题要求（如有）：
-           - 必须包含4个选项(A/B/C/D)
-           - 选项内容互斥且完整
-           - 答案唯一且明确
-
-        2. 判断题要求（如有）：
-           - 判断内容必须明确
-           - 答案必须是明确的"正确"或"错误"
-           - 避免模棱两可的表述
-
-        3. 填空题要求（如有）：
-           - 空格数量适当
-           - 答案必须唯一明确
-           - 填写内容长度合理
-
-        4. 简答题要求（如有）：
-           - 题目表述清晰
-           - 答题要点明确
-           - 提供详细的评分标准
-
-        5. 编程题要求（如有）：
-           - 问题描述完整
-           - 包含输入输出示例
-           - 提供测试用例
-           - 说明性能要求
-        
-        通用评分标准：
-        1. 答题完整性（20%）：
-           - 问题理解准确
-           - 解答步骤完整
-           - 结果表达清晰
-        
-        2. 专业规范性（30%）：
-           - 专业术语使用准确
-           - 解题思路专业规范
-           - 代码编写符合规范
-        
-        3. 创新思维（20%）：
-           - 解题思路创新
-           - 方法选择合理
-           - 优化改进意识
-        
-        4. 实践应用（30%）：
-           - 理论联系实际
-           - 解决实际问题
-           - 考虑实际约束
-        
-        要求说明：
-        1. 知识点覆盖：
-           - 重点章节内容占比70%
-           - 基础知识考察30%
-           - 确保知识点分布合理
-        
-        2. 题目要求：
-           - 每道题目必须标注对应的课程目标和AACSB目标
-           - 每道题目必须包含详细的答案和解析
-           - 题目描述必须清晰准确
-           - 答案和评分标准必须明确
-        
-        3. 实施要求：
-           - 题目数量必须严格按照要求生成
-           - 每道题的分值必须与设定一致
-           - 各种题型的总分必须符合设定
-           - 必须覆盖选定的所有章节内容
-           - 确保题目难度分布合理
-        
-        4. 特殊说明：
-           - 选择题必须包含4个选项
-           - 判断题必须明确是非
-           - 简答题必须提供详细评分点
-           - 编程题必须包含测试用例
-        
-        生成规范：
-        1. 每道题目必须包含：
-           - 题目类型
-           - 题目内容
-           - 标准答案
-           - 详细解析
-           - 评分标准
-           - 对应的课程目标
-           - 对应的AACSB目标
-        
-        2. 格式检查：
-           - 确保JSON格式完整正确
-           - 确保所有必填字段都有值
-           - 确保分值计算准确
-        
-        3. 质量要求：
-           - 题目表述专业规范
-           - 答案准确无误
-           - 解析详细充分
-           - 难度分布合理
-        
-        请严格遵循以上要求生成试题，确保题型数量和分值与配置完全一致。
-        """
     }
+    """
     
-    # 构建用户提示
-    user_prompt = f"""
-    课程基本信息：
-    - 课程名称：{outline_data['basic_info']['course_name_cn']}
-    - 课程代码：{outline_data['basic_info']['course_code']}
-    - 课程类型：{course_type}
-    - 开设院系：{department}
-    - 专业：{major}
-    - 考试类型：{exam_type}
+    # 其他题目只给出题干摘要，用于避免重复
+    other_questions = "\n".join(
+        f"- {str(q.get('question', ''))[:40]}"
+        for i, q in enumerate(questions) if i != index
+    )
     
-    AACSB学习目标：
-    {outline_data.get('aacsb_goals', '')}
+    user_prompt = f"""
+    课程：{basic_info['course_name_cn']}（{basic_info['course_type']}，{basic_info['major']}专业）
+    考核范围：{', '.join(chapters) if chapters else '全部章节'}
     
     课程目标：
     {outline_data.get('course_objectives', '')}
     
-    毕业要求：
-    知识要求：
-    {chr(10).join(outline_data['graduation_requirements']['knowledge'])}
-    
-    能力要求：
-    {chr(10).join(outline_data['graduation_requirements']['ability'])}
-    
-    素质要求：
-    {chr(10).join(outline_data['graduation_requirements']['quality'])}
-    
-    考核范围：
-    """
-    
-    if chapters:
-        user_prompt += "\n选定章节及关联：\n"
-        for chapter in chapters:
-            chapter_info = next((ch for ch in outline_data['course_schedule'] if ch['chapter'].startswith(str(chapter))), None)
-            if chapter_info:
-                # 获取前置和后续章节信息
-                chapter_num = int(chapter_info['chapter'].split('.')[0])
-                prev_chapter = next((ch for ch in outline_data['course_schedule'] if ch['chapter'].startswith(str(chapter_num-1))), None)
-                next_chapter = next((ch for ch in outline_data['course_schedule'] if ch['chapter'].startswith(str(chapter_num+1))), None)
-                
-                user_prompt += f"""
-                {chapter_info['chapter']}
-                - 内容：{', '.join(chapter_info['content'])}
-                - 要求：{', '.join(chapter_info['requirements'])}
-                - 类型：{chapter_info['type']}
-                - 知识关联：
-                  * 前置知识：{prev_chapter['chapter'] + ': ' + ', '.join(prev_chapter['content']) if prev_chapter else '无'}
-                  * 后续应用：{next_chapter['chapter'] + ': ' + ', '.join(next_chapter['content']) if next_chapter else '无'}
-                  * 重点关联：{chapter_info.get('key_connections', '本章重点知识点的内在联系')}
-                  * 实践应用：{chapter_info.get('practical_applications', '本章知识的实际应用场景')}
-                """
-    else:
-        user_prompt += """
-        覆盖全部章节：要求：
-        1. 知识体系完整性：
-           - 基础知识到高阶应用的递进
-           - 理论知识到实践应用的转化
-           - 不同���节知识点的有机结合
-        
-        2. 重点知识关联：
-           - 核心概念的内在联系
-           - 重点知识的应用场景
-           - 难点知识的突破路径
-        
-        3. 能力培养路径：
-           - 从基础理解到综合应用
-           - 从简单实践到复杂项目
-           - 从标准应用到创新设计
-        """
+    AACSB学习目标：
+    {outline_data.get('aacsb_goals', '')}
     
-    # 添加考试类型特定的提示
-    exam_type_prompt = exam_type_prompts.get(exam_type, "")
-    if exam_type_prompt:
-        user_prompt += f"\n{exam_type}具体要求：\n{exam_type_prompt}"
+    需要替换的题目：
+    {json.dumps(old_question, ensure_ascii=False)}
     
-    # 添加额外要求
-    if additional_requirements:
-        user_prompt += f"\n额外要求：\n{additional_requirements}"
+    试卷中的其他题目（新题不得与之重复）：
+    {other_questions or '无'}
     
-    if exam_type == "实验":
-        lab_type = config.get('lab_type', '综合性')
-        lab_requirements = get_lab_type_requirements(lab_type, course_type, major)
-        user_prompt += f"\n{lab_requirements}"
+    要求：
+    1. 题型、难度、分值与被替换的题目保持一致
+    2. 对应的课程目标和AACSB目标保持一致
+    3. 题目内容必须与被替换的题目不同
+    4. 必须包含详细的答案和解析
     
+    请以json格式输出新题目。
+    """
     return system_prompt, user_prompt
 
-def generate_exam(outline_data, exam_type, chapters=None, additional_requirements=None, config=None, temperature=0.7):
-    """调用DeepSeek API生成考试内容"""
-    client = OpenAI(
-        api_key=st.secrets["DEEPSEEK_API_KEY"],
-        base_url="https://api.deepseek.com/beta"
-    )
-    
-    system_prompt, user_prompt = create_exam_prompt(outline_data, exam_type, chapters, additional_requirements, config)
+def regenerate_question(outline_data, exam_content, index, config=None, temperature=0.9):
+    """重新生成试卷中的第index道题（从0开始），返回新题目"""
+    client = get_client(get_api_key())
+    system_prompt, user_prompt = create_question_prompt(outline_data, exam_content, index, config)
     
     try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            response_format={"type": "json_object"},
-            temperature=temperature  # 使用传入的temperature参数
-        )
-        return json.loads(response.choices[0].message.content)
+        # 单题替换是交互类请求，批量生成排队时也能优先获得并发名额
+        with request_scope(
+            priority="interactive",
+            department=outline_data['basic_info'].get('department', ''),
+            user=current_session_id()
+        ):
+            content = chat_completion(
+                client,
+                model="deepseek-chat",
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                response_format={"type": "json_object"},
+                temperature=temperature,
+                use_cache=False,
+                stage="regenerate_question",
+                metadata={
+                    "exam_type": (config or {}).get('type'),
+                    "course_code": outline_data['basic_info']['course_code']
+                }
+            )
+        result = json.loads(content)
+        if not isinstance(result.get('question'), dict):
+            st.error("生成的题目格式不正确")
+            return None
+        return result['question']
+    except Cancelled as e:
+        st.warning(f"生成已停止：{e}")
+        return None
     except Exception as e:
         st.error(f"API调用错误: {str(e)}")
         return None
@@ -1210,343 +510,30 @@ def display_question(q, index):
                     st.markdown("**解析：**")
                     st.write(q['explanation'])
 
-def get_project_json_format():
-    """获取大作业的JSON格式"""
-    return '''{
-        "project": {
-            "title": "项目标题",
-            "type": "项目类型",
-            "duration": "建议完成时间",
-            "objectives": [
-                "项目目标1",
-                "项目目标2"
-            ],
-            "requirements": {
-                "需求分析": {
-                    "说明": "需求分析的详细描述",
-                    "交付物": [
-                        "需求规格说明书",
-                        "用例文档"
-                    ],
-                    "具体要求": [
-                        "具体要求1",
-                        "具体要求2"
-                    ]
-                }
-            },
-            "grading_criteria": {
-                "文档质量": {
-                    "分值": 30,
-                    "评分项": [
-                        {"名称": "完整性", "分数": 10, "评分标准": "分标准描述"},
-                        {"名称": "规范性", "分数": 10, "评分标准": "评分标准描述"},
-                        {"名称": "质量", "分数": 10, "评分标准": "评分标准描述"}
-                    ]
-                }
-            },
-            "submission_requirements": {
-                "文档要求": [
-                    "PDF格式的文档",
-                    "Word格式的源文件"
-                ],
-                "代码要求": [
-                    "源代码",
-                    "可执行文件"
-                ]
-            },
-            "timeline": {
-                "第一周": [
-                    "需求分析",
-                    "概要设计"
-                ],
-                "第二周": [
-                    "详细设计",
-                    "始编码"
-                ]
-            },
-            "team_requirements": [
-                "团队规模：2-3人",
-                "明确的分工"
-            ]
-        }
-    }'''
-
-def get_lab_type_requirements(lab_type, course_type, major):
-    """获取不同类型实验的具体要求"""
-    lab_types = {
-        "基础": {
-            "characteristics": [
-                "针对单个知识点的掌握和应用",
-                "提供详细的操作指导",
-                "给出完整的代码框架",
-                "设置明确的检查点",
-                "预期结果清晰具体"
-            ],
-            "guidance_level": [
-                "提供完整的实验步骤",
-                "包含详细的代码示例",
-                "给出具体的验证方法",
-                "明确的完成标准"
-            ],
-            "evaluation_focus": [
-                "基本概念的理解",
-                "基本技能的掌握",
-                "操作的规范性",
-                "结果的正确"
-            ],
-            "report_requirements": [
-                "详细记录实验步骤",
-                "展示关键操作截图",
-                "说明实验结果",
-                "总结实验要点"
-            ]
-        },
-        "综合性": {
-            "characteristics": [
-                "涉及多个知识点的综合应用",
-                "需要综合运用多种技术",
-                "包含一定的设计环节",
-                "有一定的探索空间"
-            ],
-            "guidance_level": [
-                "提供实",
-                "给出关键步骤指导",
-                "部分内容需要自主设计",
-                "预期结果有一定弹性"
-            ],
-            "evaluation_focus": [
-                "知识点的综合运用",
-                "问题分析能力",
-                "方案设计能力",
-                "实现的完整性"
-            ],
-            "report_requirements": [
-                "方案设计说明",
-                "实现过程描述",
-                "结果分析讨论",
-                "创新点说明"
-            ]
-        },
-        "设计性": {
-            "characteristics": [
-                "提供开放性问题",
-                "需自主设计解决方案",
-                "强调创新思维",
-                "注重方案可行性"
-            ],
-            "guidance_level": [
-                "只提供基本要",
-                "生自主设计方案",
-                "鼓励多样化解决方案",
-                "重视创新性思维"
-            ],
-            "evaluation_focus": [
-                "方案的创新性",
-                "设计的合理性",
-                "实现的可行性",
-                "文档的专业性"
-            ],
-            "report_requirements": [
-                "完整的设计文档",
-                "详细的实现说明",
-                "创新点分析",
-                "改进方向建议"
-            ]
-        }
-    }
-    
-    lab_type_info = lab_types.get(lab_type, lab_types["综合性"])
-    
-    return f"""
-    {course_type}{lab_type}实验要求
-    
-    1. 实验特：
-    {chr(10).join(f"   - {char}" for char in lab_type_info["characteristics"])}
-    
-    2. 指导方式：
-    {chr(10).join(f"   - {guide}" for guide in lab_type_info["guidance_level"])}
-    
-    3. 评价重点：
-    {chr(10).join(f"   - {eval}" for eval in lab_type_info["evaluation_focus"])}
-    
-    4. 报告求：
-    {chr(10).join(f"   - {req}" for req in lab_type_info["report_requirements"])}
-    
-    5. 专业特色：
-    - 结合{major}专业特点设计实验内容
-    - 注重专业技能的培养
-    - 符合行业实践要求
-    """
-
-def get_experiment_json_format():
-    """获取实验内容的JSON格式"""
-    return '''
-    {
-        "experiment": {
-            "title": "实验标题",
-            "type": "实验类型（基础性/综合性/设计性）",
-            "duration": "建议实验时长",
-            "objectives": {
-                "knowledge": ["知识目标1", "知识目标2"],
-                "skill": ["技能目标1", "技能目标2"],
-                "course_objectives": ["对应的课程目标"],
-                "aacsb_goals": ["对应的AACSB目标"]
-            },
-            "prerequisites": {
-                "knowledge": ["前置知识要求"],
-                "environment": {
-                    "hardware": ["硬件要求"],
-                    "software": ["软件要求"],
-                    "packages": ["需要的包或库"]
-                },
-                "references": ["参考资料"]
-            },
-            "content": {
-                "description": "实验内容概述",
-                "steps": [
-                    {
-                        "step_number": "1",
-                        "title": "步骤标题",
-                        "description": "详细步骤说明",
-                        "code_template": "相关代码模板",
-                        "expected_output": "预期输出结果",
-                        "notes": "注意事项"
-                    }
-                ]
-            },
-            "requirements": {
-                "basic": ["基本要求（60分标准）"],
-                "good": ["良好要求（80分标准）"],
-                "excellent": ["优秀要求（90分标准）"],
-                "innovative": ["创新要求（加分项）"]
-            },
-            "grading_criteria": {
-                "preparation": {
-                    "weight": 20,
-                    "items": [
-                        {"name": "环境配置", "score": 5, "criteria": "评分标准"},
-                        {"name": "预习报告", "score": 15, "criteria": "评分标准"}
-                    ]
-                },
-                "implementation": {
-                    "weight": 50,
-                    "items": [
-                        {"name": "功能完成度", "score": 20, "criteria": "评分标准"},
-                        {"name": "代码质量", "score": 15, "criteria": "评分标准"},
-                        {"name": "实现效果", "score": 15, "criteria": "评分标准"}
-                    ]
-                },
-                "report": {
-                    "weight": 30,
-                    "items": [
-                        {"name": "实验报告", "score": 20, "criteria": "评分标准"},
-                        {"name": "总结反思", "score": 10, "criteria": "评分标准"}
-                    ]
-                }
-            },
-            "report_template": {
-                "sections": [
-                    {
-                        "title": "1. 实验目的",
-                        "description": "明确说明本次实验要达到的目标，包括：",
-                        "requirements": [
-                            "理论知识点：需要掌握的核心概念和原理",
-                            "实践技能点：需要培养的具体技能",
-                            "创新目标：鼓励探索和创新的方向"
-                        ]
-                    },
-                    {
-                        "title": "2. 实验环境",
-                        "description": "详细描述实验环境的配置情况，包括：",
-                        "requirements": [
-                            "硬件环境：计算机配置、特殊设备等",
-                            "软件环境：操作系统、开发工具、版本信息等",
-                            "相关依赖：需要安装的包、库、插件等",
-                            "环境配置：具体的配置步骤和注意事项"
-                        ]
-                    },
-                    {
-                        "title": "3. 实验步骤",
-                        "description": "按照时间顺序记录实验的完整过程，要求：",
-                        "requirements": [
-                            "前期准备：实验前的准备工作",
-                            "操作过程：详细的操作步骤，配图说明",
-                            "关键代码：核心代码片段及其说明",
-                            "结果验证：每个步骤的验证方法和结果",
-                            "注意事项：操作中的重点和难点"
-                        ]
-                    },
-                    {
-                        "title": "4. 实验结果",
-                        "description": "展示和分析实验的最终结果，包括：",
-                        "requirements": [
-                            "结果展示：运行结果截图或输出",
-                            "数据分析：相关数据的分析和说明",
-                            "结果验证：验证结果的正确性",
-                            "性能分析：程序性能相关数据（如有）",
-                            "对比分析：与预期结果的对比"
-                        ]
-                    },
-                    {
-                        "title": "5. 问题与解决",
-                        "description": "记录实验过程中遇到的问题及解决方案：",
-                        "requirements": [
-                            "问题描述：清晰描述遇到的问题",
-                            "原因分析：分析问题产生的原因",
-                            "解决过程：解决问题的具体步骤",
-                            "解决方案：最终采用的解决方案",
-                            "经验总结：解决问题的心得体会"
-                        ]
-                    },
-                    {
-                        "title": "6. 总结反思",
-                        "description": "对本次实验进行总结和反思：",
-                        "requirements": [
-                            "知识总结：本次实验学到的主要知识点",
-                            "技能提升��提升的具体技能",
-                            "创新点：实验中的创新或改进之处",
-                            "不足分析：实验中的不足之处",
-                            "改进建议：对实验的改进建议",
-                            "心得体会：个人感悟和建议"
-                        ]
-                    }
-                ],
-                "format_requirements": {
-                    "general": [
-                        "文档格式：PDF或Word格式",
-                        "字体要求：正文宋体四，标题黑体三号",
-                        "页边距：上下2.54cm，左右3.17cm",
-                        "行间距：1.5倍行距",
-                        "页码：页面底部居中"
-                    ],
-                    "content": [
-                        "文字描述：清晰、准确、专业",
-                        "图片要求：清晰、大小适中、有序号和说明",
-                        "代码格式：统一的代码风格，有注释",
-                        "引用标注：引用需注明来源",
-                        "专业术语：准确使用专业术语"
-                    ],
-                    "submission": [
-                        "文件命名：学号_姓名_实验X",
-                        "提交方式：通过指定平台提交",
-                        "提交时间：在规定截止日期前提交",
-                        "相关材料：源代码等相关文件一并提交"
-                    ]
-                }
-            }
-        }
-    }
-    '''
+def display_llm_metrics():
+    """在侧边栏显示接口调用的并发、重试和排队状态"""
+    metrics = llm_metrics()
+    adaptive = metrics['adaptive']
+    with st.sidebar.expander("接口调用状态"):
+        st.metric("当前并发上限", adaptive['limit'], help="根据接口延迟和429/5xx反馈自动调整")
+        st.write(f"进行中：{adaptive['in_flight']}　成功：{adaptive['successes']}")
+        st.write(f"过载：{adaptive['overloads']}　重试：{adaptive['retries']}　其他错误：{adaptive['errors']}")
+        for cls, stats in metrics['scheduler'].items():
+            label = "交互" if cls == "interactive" else "批量"
+            st.write(f"{label}请求：运行{stats['running']}/{stats['limit']}，排队{stats['waiting']}，平均等待{stats['avg_wait']:.1f}秒")
+        st.write(f"缓存命中率：{metrics['cache']['hit_rate']:.0%}")
 
 def main():
     st.title("课程考试生成器 📚")
     st.markdown("---")
+    display_llm_metrics()
     
     # 上传课程大纲文件
     uploaded_file = st.file_uploader("上传课程大纲JSON文件", type=['json'])
     
     if uploaded_file is not None:
-        outline_data = load_course_outline(uploaded_file)
+        outline = load_course_outline(uploaded_file)
+        outline_data = outline.data if outline else None
         
         if outline_data:
             st.success("✅ 课程大纲加载成功！")
@@ -1588,15 +575,13 @@ def main():
                 
                 # 显示AACSB目标
                 with st.expander("查看AACSB目标"):
-                    for goal in outline_data['aacsb_goals'].split('\n'):
-                        if goal.strip():  # 确保不是空行
-                            st.markdown(f"- {goal}")
+                    for goal in outline.aacsb_goals:
+                        st.markdown(f"- {goal}")
                 
                 # 显示课程目标
                 with st.expander("查看课程目标"):
-                    for objective in outline_data['course_objectives'].split('\n'):
-                        if objective.strip():  # 确保不是空行
-                            st.markdown(f"- {objective}")
+                    for objective in outline.course_objectives:
+                        st.markdown(f"- {objective}")
             
             with col2:
                 # 将难度选择移到考试类型选择之前
@@ -1641,16 +626,26 @@ def main():
                 )
                 
                 # 章节选择 - 为多选
-                chapters = [
-                    f"{ch['chapter']}"  # 直接使用chapter字段
-                    for ch in outline_data['course_schedule']
-                ]
                 selected_chapters = st.multiselect(
                     "选择考核章", 
-                    chapters,
+                    outline.chapters,
                     default=[],  # 默认不选择任何章节
                     help="以选择个章节，不选择则默认覆所有章节"
                 )
+                
+                # 显示按章节压缩上下文后的提示词规模
+                if selected_chapters:
+                    tokens_before, tokens_after = cached_prompt_tokens(
+                        outline.digest,
+                        selected_type,
+                        tuple(selected_chapters),
+                        difficulty_level,
+                        outline_data
+                    )
+                    st.caption(f"已按所选章节精简大纲上下文：提示词约 {tokens_before} → {tokens_after} tokens")
+                    related_objectives = outline.related_objectives(selected_chapters)
+                    if related_objectives:
+                        st.caption(f"所选章节关联的课程目标：{'、'.join(map(str, related_objectives))}")
 
                 # 根据选择的考试类型显示相关置
                 if selected_type == "练习":
@@ -1923,6 +918,23 @@ def main():
                 help="在这里输入任何额外的要求，这些要求将被用于定制生成的考试内容"
             )
             
+            # 批量生成多套试卷
+            batch_mode = st.checkbox("批量生成多套试卷", help="同时生成A/B/C卷、补考卷等多套内容，各套并发生成")
+            variant_labels = []
+            if batch_mode:
+                variant_labels = st.multiselect(
+                    "选择要生成的试卷",
+                    EXAM_VARIANT_LABELS,
+                    default=EXAM_VARIANT_LABELS[:3]
+                )
+            
+            # 后台生成：提交到任务队列，由工作进程（python job_queue.py）生成
+            background_mode = st.checkbox(
+                "提交到后台生成",
+                disabled=batch_mode,
+                help="关闭页面或刷新不会中断生成，完成后回到本页查看结果"
+            )
+            
             # 在 main 函数中修改生成内容的部分
             if st.button("🎯 生成考试内容", use_container_width=True):
                 # 构建配置信息
@@ -1959,26 +971,51 @@ def main():
                 if 'temperature' not in st.session_state:
                     st.session_state.temperature = 0.7
                 
-                with st.spinner("正在生成考试内容，请稍候..."):
-                    exam_content = generate_exam(
-                        outline_data, 
-                        selected_type,  # 使用 selected_type 而不是 config["type"]
-                        selected_chapters,  # 使用 selected_chapters 而不是 config["chapters"]
-                        additional_requirements,
-                        config,
-                        temperature=st.session_state.temperature
-                    )
-                    
-                    # 保存生成的内容到session state
-                    st.session_state.last_exam_content = exam_content
-                    
-                    # 显示生成的内容
-                    display_exam_content(exam_content, selected_type)
+                if background_mode and not batch_mode:
+                    st.session_state.pop('exam_variants', None)
+                    st.session_state.exam_job_id = JobQueue().enqueue("exam", {
+                        "outline_data": outline_data,
+                        "exam_type": selected_type,
+                        "chapters": selected_chapters,
+                        "additional_requirements": additional_requirements,
+                        "config": config,
+                        "temperature": st.session_state.temperature,
+                        "user": current_session_id()
+                    })
+                elif batch_mode and variant_labels:
+                    with st.spinner(f"正在并发生成{len(variant_labels)}套内容，请稍候..."), generation_deadline():
+                        st.session_state.exam_variants = generate_exam_variants(
+                            outline_data,
+                            selected_type,
+                            selected_chapters,
+                            additional_requirements,
+                            config,
+                            variant_labels=variant_labels,
+                            temperature=st.session_state.temperature
+                        )
+                else:
+                    st.session_state.pop('exam_variants', None)
+                    with st.spinner("正在生成考试内容，请稍候..."), generation_deadline():
+                        # 生成并逐题显示内容
+                        exam_content = generate_and_display_exam(
+                            outline_data, 
+                            selected_type,  # 使用 selected_type 而不是 config["type"]
+                            selected_chapters,  # 使用 selected_chapters 而不是 config["chapters"]
+                            additional_requirements,
+                            config,
+                            temperature=st.session_state.temperature
+                        )
+                        
+                        # 保存生成的内容到session state；超时或失败时保留上一次的结果
+                        if exam_content:
+                            st.session_state.last_exam_content = exam_content
+                        elif st.session_state.get('last_exam_content'):
+                            st.warning("本次未能生成内容，下方仍显示上一次生成的结果")
 
             # 添加重新生成按钮
             if 'last_config' in st.session_state:
                 if st.button("🔄 重新生成", use_container_width=True):
-                    with st.spinner("正在重新生成内容，请稍候..."):
+                    with st.spinner("正在重新生成内容，请稍候..."), generation_deadline():
                         # 增加temperature以增加随机性
                         st.session_state.temperature += 0.1
                         if st.session_state.temperature > 1.0:
@@ -1987,22 +1024,77 @@ def main():
                         # 构建新的提示词
                         additional_reqs = f"请生成与之前不同的内容。当前随机性参数：{st.session_state.temperature}"
                         
-                        # 重新生成内容
-                        new_exam_content = generate_exam(
+                        # 重新生成并逐题显示内容
+                        new_exam_content = generate_and_display_exam(
                             outline_data,
                             st.session_state.last_config["type"],
                             st.session_state.last_config.get("chapters"),  # 使用 get 方法避免 KeyError
                             additional_reqs,
                             st.session_state.last_config,
-                            temperature=st.session_state.temperature
+                            temperature=st.session_state.temperature,
+                            use_cache=False  # 重新生成需要新的结果，跳过缓存
                         )
                         
-                        # 保存新生成的内容到session state
-                        st.session_state.last_exam_content = new_exam_content
-                        
-                        # 显示新生成的内容
-                        display_exam_content(new_exam_content, selected_type)
+                        # 保存新生成的内容到session state；超时或失败时保留上一次的结果
+                        if new_exam_content:
+                            st.session_state.last_exam_content = new_exam_content
+                        elif st.session_state.get('last_exam_content'):
+                            st.warning("本次未能生成内容，下方仍显示上一次生成的结果")
+
+            # 查询后台任务状态，完成后载入生成结果
+            if st.session_state.get('exam_job_id'):
+                job_queue = JobQueue()
+                job = job_queue.get(st.session_state.exam_job_id)
+                if job is None:
+                    st.session_state.pop('exam_job_id')
+                elif job['status'] == JOB_DONE:
+                    st.session_state.pop('exam_job_id')
+                    st.session_state.last_exam_content = job['result']
+                    st.success(f"后台任务{job['id']}已完成")
+                    display_exam_content(job['result'], selected_type)
+                elif job['status'] == JOB_FAILED:
+                    st.session_state.pop('exam_job_id')
+                    st.error(f"后台任务{job['id']}失败：{job['error']}")
+                else:
+                    if job['status'] == JOB_RUNNING:
+                        status = f"执行中（第{job['attempts']}次）"
+                    elif job['attempts']:
+                        status = f"等待重试（上次失败原因：{job['error']}）"
+                    else:
+                        status = "等待执行"
+                    st.info(f"后台任务{job['id']}{status}，排队任务数：{job_queue.counts().get('queued', 0)}")
+                    if st.button("🔄 刷新任务状态", key="refresh_exam_job"):
+                        st.rerun()
 
+            # 单题替换：只重新生成选中的题目并合并回当前试卷
+            last_exam_content = st.session_state.get('last_exam_content')
+            if last_exam_content and last_exam_content.get('questions'):
+                st.markdown("### 单题替换")
+                questions = last_exam_content['questions']
+                col_select, col_replace = st.columns([3, 1])
+                with col_select:
+                    question_index = st.selectbox(
+                        "选择要替换的题目",
+                        range(len(questions)),
+                        format_func=lambda i: f"第{i + 1}题 {questions[i].get('type', '')}：{str(questions[i].get('question', ''))[:30]}"
+                    )
+                with col_replace:
+                    replace_clicked = st.button("🔁 替换该题", use_container_width=True)
+                
+                if replace_clicked:
+                    with st.spinner(f"正在重新生成第{question_index + 1}题..."), generation_deadline():
+                        new_question = regenerate_question(
+                            outline_data,
+                            last_exam_content,
+                            question_index,
+                            st.session_state.get('last_config')
+                        )
+                    if new_question:
+                        questions[question_index] = new_question
+                        st.session_state.last_exam_content = last_exam_content
+                        st.success(f"第{question_index + 1}题已替换")
+                        display_question(new_question, question_index + 1)
+            
             # 添加下载按钮部分
             if 'last_exam_content' in st.session_state:
                 st.markdown("### 下载选项")
@@ -2044,6 +1136,41 @@ def main():
                         use_container_width=True
                     )
 
+            # 批量生成的多套试卷
+            if st.session_state.get('exam_variants'):
+                display_exam_variants(st.session_state.exam_variants, selected_type, st.session_state.course_name)
+
+def display_exam_variants(exam_variants, selected_type, course_name):
+    """分标签页显示批量生成的多套试卷及下载按钮"""
+    st.markdown("### 批量生成结果")
+    tabs = st.tabs(list(exam_variants.keys()))
+    for tab, (label, exam_content) in zip(tabs, exam_variants.items()):
+        with tab:
+            display_exam_content(exam_content, selected_type)
+            if not exam_content:
+                continue
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button(
+                    label=f"📥 下载{label}JSON格式",
+                    data=json.dumps(exam_content, ensure_ascii=False, indent=2),
+                    file_name=f"{course_name}_{selected_type}_{label}.json",
+                    mime="application/json",
+                    key=f"variant_json_{label}",
+                    use_container_width=True
+                )
+            with col2:
+                doc_io = create_word_document(exam_content, selected_type, f"{course_name}（{label}）")
+                st.download_button(
+                    label=f"📄 下载{label}Word格式",
+                    data=doc_io.getvalue(),
+                    file_name=f"{course_name}_{selected_type}_{label}.docx",
+                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                    key=f"variant_docx_{label}",
+                    use_container_width=True
+                )
+
 def create_word_document(exam_content, selected_type, course_name):
     """创建Word文档"""
     doc = Document()
@@ -1,91 +1,397 @@
 import sqlite3
 import json
 import datetime
+import os
+import threading
+import re
+from contextlib import contextmanager
 from pathlib import Path
+from db_pool import get_pool
+
+# 连续的中日韩汉字，题目检索的二元分词只处理这部分文字
+CJK_RUN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+
+def cjk_bigrams(text):
+    """把文本中连续的汉字切成相邻两字一组、以空格分隔的词（“线性回归”→“线性 性回 回归”），其余文字不变
+
+    配合 unicode61 分词的全文索引，两个字的关键词也能使用索引检索。
+    """
+    def split(match):
+        run = match.group()
+        if len(run) == 1:
+            return f' {run} '
+        return ' ' + ' '.join(run[i:i + 2] for i in range(len(run) - 1)) + ' '
+    return CJK_RUN.sub(split, text or '')
+
+def _question_terms(question_content, answer, explanation):
+    """题目写入二元分词索引的文字"""
+    return cjk_bigrams(' '.join(text or '' for text in (question_content, answer, explanation)))
+
+# 本进程中已初始化表结构的数据库，页面每次重跑都会创建ExamDatabase，不必重复建表
+_initialized = set()
+_init_lock = threading.Lock()
 
 class ExamDatabase:
-    def __init__(self, db_path="exam_system.db"):
-        """初始化数据库连接"""
+    def __init__(self, db_path="exam_system.db", **pool_options):
+        """初始化数据库连接
+
+        同一数据库文件在进程内共用一个连接池（见 db_pool），pool_options 可指定
+        max_size、busy_timeout_ms、synchronous、cache_size、mmap_size。
+        """
         self.db_path = db_path
-        self.init_database()
+        self._pool = get_pool(db_path, **pool_options)
+        with _init_lock:
+            if os.path.abspath(db_path) not in _initialized:
+                self.init_database()
+                _initialized.add(os.path.abspath(db_path))
+
+    def _connect(self):
+        """从连接池取出连接，with 代码块结束时提交并归还"""
+        return self._pool.connection()
+
+    def close(self):
+        """关闭该数据库的连接池，之后再创建的ExamDatabase会重新建立连接"""
+        self._pool.close()
 
     def init_database(self):
-        """初始化数据库表结构"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # 创建课程信息表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS courses (
-                    course_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    course_name_cn TEXT NOT NULL,
-                    course_name_en TEXT,
-                    course_code TEXT UNIQUE NOT NULL,
-                    department TEXT NOT NULL,
-                    major TEXT NOT NULL,
-                    course_type TEXT NOT NULL,
-                    credits INTEGER,
-                    exam_type TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # 创建考试内容表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS exams (
-                    exam_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    course_id INTEGER NOT NULL,
-                    exam_type TEXT NOT NULL,
-                    exam_content JSON NOT NULL,
-                    chapters TEXT,
-                    difficulty TEXT,
-                    creator TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    status TEXT DEFAULT 'draft',
-                    FOREIGN KEY (course_id) REFERENCES courses (course_id)
-                )
-            ''')
-            
-            # 创建题目库表
+        """初始化数据库表结构，并把已有数据库升级到最新版本
+
+        快速导入中断（进程退出、断电）时被删除的索引和触发器在这里恢复，
+        其他进程的快速导入仍在进行时不恢复，由该导入结束时重建；
+        全文索引在之前的迁移中因 SQLite 不支持而跳过的，每次启动时重新尝试创建，
+        其他程序写入、尚未进入二元分词索引的题目在这里补齐。
+        """
+        with self._connect() as conn:
+            self.migrate(conn)
+            if not self._bulk_load_running():
+                self._restore_bulk_objects(conn)
+            self._ensure_question_search(conn)
+
+    def migrate(self, conn):
+        """依次执行尚未执行的迁移，返回迁移后的版本号
+
+        已执行到的版本记录在 PRAGMA user_version 中；每个迁移在一个事务中执行并更新版本号，
+        BEGIN IMMEDIATE 保证多个进程同时启动时同一迁移只执行一次。
+        """
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        for target, migration in MIGRATIONS:
+            if target <= version:
+                continue
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # 等待写锁期间其他进程可能已完成迁移
+                if conn.execute('PRAGMA user_version').fetchone()[0] < target:
+                    migration(self, conn.cursor())
+                    conn.execute(f'PRAGMA user_version = {target}')
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            version = target
+        return version
+
+    def _create_base_schema(self, cursor):
+        """版本1：课程、考试、题目和使用记录表"""
+        # 创建课程信息表
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS courses (
+                course_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                course_name_cn TEXT NOT NULL,
+                course_name_en TEXT,
+                course_code TEXT UNIQUE NOT NULL,
+                department TEXT NOT NULL,
+                major TEXT NOT NULL,
+                course_type TEXT NOT NULL,
+                credits INTEGER,
+                exam_type TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # 创建考试内容表
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS exams (
+                exam_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                course_id INTEGER NOT NULL,
+                exam_type TEXT NOT NULL,
+                exam_content JSON NOT NULL,
+                chapters TEXT,
+                difficulty TEXT,
+                creator TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                status TEXT DEFAULT 'draft',
+                FOREIGN KEY (course_id) REFERENCES courses (course_id)
+            )
+        ''')
+        
+        # 创建题目库表
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS questions (
+                question_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                course_id INTEGER NOT NULL,
+                exam_id INTEGER,
+                question_type TEXT NOT NULL,
+                question_content TEXT NOT NULL,
+                answer TEXT,
+                explanation TEXT,
+                difficulty TEXT,
+                course_objectives TEXT,
+                aacsb_goals TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (course_id) REFERENCES courses (course_id),
+                FOREIGN KEY (exam_id) REFERENCES exams (exam_id)
+            )
+        ''')
+        
+        # 创建使用记录表（包含每次大模型调用的token、耗时等统计）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS usage_logs (
+                log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                course_id INTEGER,
+                exam_type TEXT,
+                generation_params JSON,
+                result_status TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                ip_address TEXT,
+                stage TEXT,
+                model TEXT,
+                prompt_tokens INTEGER DEFAULT 0,
+                completion_tokens INTEGER DEFAULT 0,
+                cached_tokens INTEGER DEFAULT 0,
+                latency_ms INTEGER,
+                retries INTEGER DEFAULT 0,
+                finish_reason TEXT,
+                cache_hit INTEGER DEFAULT 0,
+                FOREIGN KEY (course_id) REFERENCES courses (course_id)
+            )
+        ''')
+        self._upgrade_usage_logs(cursor)
+
+    def _create_indexes(self, cursor):
+        """版本2：常用查询的索引"""
+        # 题目库按课程和题型筛选
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_questions_course_type
+            ON questions (course_id, question_type)
+        ''')
+        # 课程的考试列表按创建时间倒序
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_exams_course_created
+            ON exams (course_id, created_at DESC)
+        ''')
+        # 使用统计（stage为空的记录）：覆盖索引，按月分组时不必回表
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_usage_logs_usage
+            ON usage_logs (course_id, exam_type, created_at, stage)
+            WHERE stage IS NULL
+        ''')
+        # 大模型调用统计按时间范围筛选后按阶段汇总
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_usage_logs_llm
+            ON usage_logs (created_at, stage)
+            WHERE stage IS NOT NULL
+        ''')
+        cursor.execute('ANALYZE')
+
+    def _create_question_search(self, cursor):
+        """版本3：题目全文检索（FTS5，trigram分词），由触发器与questions表保持同步
+
+        trigram 按连续3个字符切分，中文无需分词即可检索；需要 SQLite 3.34 及以上，
+        不支持时跳过，search_questions 退回到逐行匹配。
+        """
+        try:
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS questions (
-                    question_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    course_id INTEGER NOT NULL,
-                    exam_id INTEGER,
-                    question_type TEXT NOT NULL,
-                    question_content TEXT NOT NULL,
-                    answer TEXT,
-                    explanation TEXT,
-                    difficulty TEXT,
-                    course_objectives TEXT,
-                    aacsb_goals TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (course_id) REFERENCES courses (course_id),
-                    FOREIGN KEY (exam_id) REFERENCES exams (exam_id)
+                CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+                    question_content, answer, explanation,
+                    content='questions', content_rowid='question_id',
+                    tokenize='trigram'
                 )
             ''')
-            
-            # 创建使用记录表
+        except sqlite3.OperationalError:
+            return
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS questions_fts_insert AFTER INSERT ON questions BEGIN
+                INSERT INTO questions_fts (rowid, question_content, answer, explanation)
+                VALUES (new.question_id, new.question_content, new.answer, new.explanation);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS questions_fts_delete AFTER DELETE ON questions BEGIN
+                INSERT INTO questions_fts (questions_fts, rowid, question_content, answer, explanation)
+                VALUES ('delete', old.question_id, old.question_content, old.answer, old.explanation);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS questions_fts_update AFTER UPDATE ON questions BEGIN
+                INSERT INTO questions_fts (questions_fts, rowid, question_content, answer, explanation)
+                VALUES ('delete', old.question_id, old.question_content, old.answer, old.explanation);
+                INSERT INTO questions_fts (rowid, question_content, answer, explanation)
+                VALUES (new.question_id, new.question_content, new.answer, new.explanation);
+            END
+        ''')
+        # 为已有题目建立索引
+        cursor.execute("INSERT INTO questions_fts (questions_fts) VALUES ('rebuild')")
+
+    def _create_listing_indexes(self, cursor):
+        """版本4：分页列表的索引"""
+        # 不筛选题型时按课程列出题目，索引末尾隐含question_id，可直接按ID倒序翻页
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_questions_course
+            ON questions (course_id)
+        ''')
+
+    def _extend_exam_listing_index(self, cursor):
+        """版本8：考试列表索引加上 exam_id DESC，按 (created_at, exam_id) 倒序翻页时无需再排序"""
+        cursor.execute('DROP INDEX IF EXISTS idx_exams_course_created')
+        cursor.execute('''
+            CREATE INDEX idx_exams_course_created
+            ON exams (course_id, created_at DESC, exam_id DESC)
+        ''')
+
+    def _create_bulk_load_state(self, cursor):
+        """版本5：快速导入期间被删除的索引和触发器，导入结束或下次启动时据此恢复"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS bulk_load_objects (
+                name TEXT PRIMARY KEY,
+                type TEXT NOT NULL,
+                sql TEXT NOT NULL
+            )
+        ''')
+
+    def _create_question_bigram_search(self, cursor):
+        """版本6：题目的二元分词全文索引，支持两个字的中文关键词
+
+        questions_bigram 保存题目内容、答案和解析经 cjk_bigrams 转换后的文字，用 unicode61 分词。
+        转换在 Python 中进行：本程序写入题目时同时写入索引，触发器只删除被修改或删除的题目的索引，
+        数据库在其他程序中仍可正常写入，这些题目在下次启动时补入索引（见 _sync_question_bigrams）。
+        不支持 FTS5 时跳过。
+        """
+        try:
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS usage_logs (
-                    log_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    course_id INTEGER NOT NULL,
-                    exam_type TEXT NOT NULL,
-                    generation_params JSON,
-                    result_status TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    ip_address TEXT,
-                    FOREIGN KEY (course_id) REFERENCES courses (course_id)
+                CREATE VIRTUAL TABLE IF NOT EXISTS questions_bigram USING fts5(
+                    terms, tokenize='unicode61'
                 )
             ''')
-            
+        except sqlite3.OperationalError:
+            return
+        self._create_question_bigram_triggers(cursor)
+        # 为已有题目建立索引
+        self._rebuild_question_search(cursor, trigram=False)
+
+    @staticmethod
+    def _create_question_bigram_triggers(cursor):
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS questions_fts_bigram_delete AFTER DELETE ON questions BEGIN
+                DELETE FROM questions_bigram WHERE rowid = old.question_id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS questions_fts_bigram_update AFTER UPDATE ON questions BEGIN
+                DELETE FROM questions_bigram WHERE rowid = old.question_id;
+            END
+        ''')
+
+    def _drop_function_triggers(self, cursor):
+        """版本7：删除调用 Python 函数的二元分词触发器，其他程序写入题目时不再报错"""
+        if not self._search_tables(cursor) >= {'questions_bigram'}:
+            return
+        cursor.execute('DROP TRIGGER IF EXISTS questions_fts_bigram_insert')
+        cursor.execute('DROP TRIGGER IF EXISTS questions_fts_bigram_update')
+        self._create_question_bigram_triggers(cursor)
+
+    @staticmethod
+    def _search_tables(conn):
+        return {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('questions_fts', 'questions_bigram')"
+        )}
+
+    @staticmethod
+    def _rebuild_question_search(conn, trigram=True, bigram=True):
+        """按questions表重建已存在的全文索引"""
+        tables = ExamDatabase._search_tables(conn)
+        if trigram and 'questions_fts' in tables:
+            conn.execute("INSERT INTO questions_fts (questions_fts) VALUES ('rebuild')")
+        if bigram and 'questions_bigram' in tables:
+            conn.execute('DELETE FROM questions_bigram')
+            ExamDatabase._sync_question_bigrams(conn)
+
+    @staticmethod
+    def _sync_question_bigrams(conn):
+        """把尚未进入二元分词索引的题目（新建索引、其他程序写入或修改的题目）补入索引"""
+        rows = conn.execute('''
+            SELECT question_id, question_content, answer, explanation
+            FROM questions
+            WHERE question_id NOT IN (SELECT rowid FROM questions_bigram)
+        ''').fetchall()
+        conn.executemany(
+            'INSERT INTO questions_bigram (rowid, terms) VALUES (?, ?)',
+            ((row[0], _question_terms(*row[1:])) for row in rows)
+        )
+
+    def _ensure_question_search(self, conn):
+        """全文索引表缺失时（迁移时 SQLite 不支持 FTS5 或 trigram）重新尝试创建，并补齐二元分词索引"""
+        tables = self._search_tables(conn)
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = conn.cursor()
+            if 'questions_fts' not in tables:
+                self._create_question_search(cursor)
+            if 'questions_bigram' not in tables:
+                self._create_question_bigram_search(cursor)
+            elif not conn.execute('SELECT 1 FROM bulk_load_objects LIMIT 1').fetchone():
+                # 快速导入进行中时其结束后会整体重建
+                self._sync_question_bigrams(conn)
             conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def _upgrade_usage_logs(self, cursor):
+        """将旧版usage_logs表升级为包含调用统计字段的新结构"""
+        cursor.execute('PRAGMA table_info(usage_logs)')
+        columns = [row[1] for row in cursor.fetchall()]
+        if 'stage' in columns:
+            return
+        
+        # 旧表的course_id/exam_type为NOT NULL，SQLite无法直接修改约束，需要重建表
+        cursor.execute('ALTER TABLE usage_logs RENAME TO usage_logs_old')
+        cursor.execute('''
+            CREATE TABLE usage_logs (
+                log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                course_id INTEGER,
+                exam_type TEXT,
+                generation_params JSON,
+                result_status TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                ip_address TEXT,
+                stage TEXT,
+                model TEXT,
+                prompt_tokens INTEGER DEFAULT 0,
+                completion_tokens INTEGER DEFAULT 0,
+                cached_tokens INTEGER DEFAULT 0,
+                latency_ms INTEGER,
+                retries INTEGER DEFAULT 0,
+                finish_reason TEXT,
+                cache_hit INTEGER DEFAULT 0,
+                FOREIGN KEY (course_id) REFERENCES courses (course_id)
+            )
+        ''')
+        cursor.execute('''
+            INSERT INTO usage_logs (
+                log_id, course_id, exam_type, generation_params,
+                result_status, created_at, ip_address
+            )
+            SELECT log_id, course_id, exam_type, generation_params,
+                   result_status, created_at, ip_address
+            FROM usage_logs_old
+        ''')
+        cursor.execute('DROP TABLE usage_logs_old')
 
     def add_course(self, course_data):
         """添加课程信息"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO courses (
@@ -107,7 +413,7 @@ class ExamDatabase:
 
     def save_exam(self, exam_data):
         """保存生成的考试内容"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO exams (
@@ -132,16 +438,10 @@ class ExamDatabase:
             
             return exam_id
 
-    def _save_questions(self, cursor, course_id, exam_id, questions):
-        """保存题目到题目库"""
+    @staticmethod
+    def _question_rows(course_id, exam_id, questions):
         for question in questions:
-            cursor.execute('''
-                INSERT INTO questions (
-                    course_id, exam_id, question_type,
-                    question_content, answer, explanation,
-                    difficulty, course_objectives, aacsb_goals
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
+            yield (
                 course_id,
                 exam_id,
                 question['type'],
@@ -151,11 +451,174 @@ class ExamDatabase:
                 question.get('difficulty'),
                 json.dumps(question.get('course_objectives', []), ensure_ascii=False),
                 json.dumps(question.get('aacsb_goals', []), ensure_ascii=False)
-            ))
+            )
+
+    def _save_questions(self, cursor, course_id, exam_id, questions):
+        """保存题目到题目库"""
+        self._insert_question_rows(cursor, self._question_rows(course_id, exam_id, questions))
+
+    @staticmethod
+    def _insert_question_rows(cursor, rows):
+        """写入题目，并把题目写入二元分词索引"""
+        rows = list(rows)
+        if not rows:
+            return
+        cursor.executemany('''
+            INSERT INTO questions (
+                course_id, exam_id, question_type,
+                question_content, answer, explanation,
+                difficulty, course_objectives, aacsb_goals
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        if 'questions_bigram' not in ExamDatabase._search_tables(cursor):
+            return
+        # 写锁在事务结束前一直持有，AUTOINCREMENT 的ID在本批中连续
+        last_id = cursor.execute('SELECT last_insert_rowid()').fetchone()[0]
+        first_id = last_id - len(rows) + 1
+        cursor.executemany(
+            'INSERT INTO questions_bigram (rowid, terms) VALUES (?, ?)',
+            ((first_id + i, _question_terms(row[3], row[4], row[5])) for i, row in enumerate(rows))
+        )
+
+    def _bulk_lock_path(self):
+        return self.db_path + '-bulk.lock'
+
+    @contextmanager
+    def _bulk_load_lock(self):
+        """快速导入期间持有的锁
+
+        在单独的锁文件上保持一个排他事务，进程退出（包括崩溃）时由操作系统释放；
+        已有快速导入在进行时抛出 RuntimeError。
+        """
+        lock = sqlite3.connect(self._bulk_lock_path(), timeout=0, isolation_level=None)
+        try:
+            try:
+                lock.execute('BEGIN EXCLUSIVE')
+            except sqlite3.OperationalError:
+                raise RuntimeError("该数据库已有快速导入正在进行") from None
+            yield
+        finally:
+            lock.close()
+
+    def _bulk_load_running(self):
+        """是否有进程正在对该数据库快速导入"""
+        if not os.path.exists(self._bulk_lock_path()):
+            return False
+        lock = sqlite3.connect(self._bulk_lock_path(), timeout=0, isolation_level=None)
+        try:
+            lock.execute('BEGIN EXCLUSIVE')
+            lock.execute('ROLLBACK')
+            return False
+        except sqlite3.OperationalError:
+            return True
+        finally:
+            lock.close()
+
+    @contextmanager
+    def _bulk_connection(self, tables, fast=False):
+        """批量导入使用的连接
+
+        fast=True 时导入期间关闭同步写盘，并先删除 tables 上的索引和全文检索触发器、
+        导入后重建，全文索引整体重建一次。只适合离线回填（没有其他会话使用该数据库时）：
+        导入期间其他会话的查询会变慢、检索不到新题目，断电可能丢失已提交的批次。
+        导入期间持有 _bulk_load_lock，其他进程的 init_database 据此不去重建被删除的对象；
+        被删除的对象先记录在 bulk_load_objects 中，导入中断时由下次 init_database 恢复。
+        """
+        if not fast:
+            with self._connect() as conn:
+                yield conn
+            return
+        with self._bulk_load_lock(), self._connect() as conn:
+            placeholders = ', '.join('?' for _ in tables)
+            objects = conn.execute(f'''
+                SELECT name, type, sql FROM sqlite_master
+                WHERE tbl_name IN ({placeholders}) AND sql IS NOT NULL
+                  AND (type = 'index' OR (type = 'trigger' AND name LIKE 'questions\\_fts\\_%' ESCAPE '\\'))
+            ''', tuple(tables)).fetchall()
+            conn.executemany(
+                'INSERT OR REPLACE INTO bulk_load_objects (name, type, sql) VALUES (?, ?, ?)', objects
+            )
+            for name, kind, _ in objects:
+                conn.execute(f'DROP {kind.upper()} "{name}"')
+            conn.commit()
+            conn.execute('PRAGMA synchronous=OFF')
+            try:
+                yield conn
+            except BaseException:
+                # 只保留已提交的批次
+                conn.rollback()
+                raise
+            finally:
+                conn.execute(f'PRAGMA synchronous={self._pool.synchronous}')
+                self._restore_bulk_objects(conn, rebuild_fts=any(kind == 'trigger' for _, kind, _ in objects))
+
+    @staticmethod
+    def _restore_bulk_objects(conn, rebuild_fts=False):
+        """重建快速导入时删除的索引和触发器；触发器删除期间写入的题目需要重建全文索引"""
+        objects = conn.execute('SELECT name, type, sql FROM bulk_load_objects').fetchall()
+        for name, kind, sql in objects:
+            exists = conn.execute(
+                'SELECT 1 FROM sqlite_master WHERE type = ? AND name = ?', (kind, name)
+            ).fetchone()
+            if not exists:
+                conn.execute(sql)
+            rebuild_fts = rebuild_fts or kind == 'trigger'
+        conn.execute('DELETE FROM bulk_load_objects')
+        if rebuild_fts:
+            ExamDatabase._rebuild_question_search(conn)
+        conn.commit()
+
+    def save_questions_bulk(self, course_id, questions, exam_id=None, chunk_size=1000, fast=False):
+        """批量保存题目到题目库，每 chunk_size 道题一个事务，返回保存的题目数
+
+        fast=True 时使用快速导入模式（见 _bulk_connection）。
+        """
+        count = 0
+        with self._bulk_connection(('questions',), fast) as conn:
+            for start in range(0, len(questions), chunk_size):
+                chunk = questions[start:start + chunk_size]
+                self._insert_question_rows(conn, self._question_rows(course_id, exam_id, chunk))
+                conn.commit()
+                count += len(chunk)
+        return count
+
+    def save_exams_bulk(self, exams, chunk_size=200, fast=False):
+        """批量保存考试内容及其题目，每 chunk_size 份考试一个事务，返回考试ID列表
+
+        exams 中每项的格式与 save_exam 相同；fast=True 时使用快速导入模式（见 _bulk_connection）。
+        """
+        exam_ids = []
+        with self._bulk_connection(('exams', 'questions'), fast) as conn:
+            for start in range(0, len(exams), chunk_size):
+                question_rows = []
+                for exam_data in exams[start:start + chunk_size]:
+                    cursor = conn.execute('''
+                        INSERT INTO exams (
+                            course_id, exam_type, exam_content,
+                            chapters, difficulty, creator, status
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ''', (
+                        exam_data['course_id'],
+                        exam_data['exam_type'],
+                        json.dumps(exam_data['exam_content'], ensure_ascii=False),
+                        json.dumps(exam_data['chapters']) if exam_data.get('chapters') else None,
+                        exam_data.get('difficulty'),
+                        exam_data.get('creator'),
+                        exam_data.get('status', 'draft')
+                    ))
+                    exam_ids.append(cursor.lastrowid)
+                    question_rows.extend(self._question_rows(
+                        exam_data['course_id'], cursor.lastrowid,
+                        exam_data['exam_content'].get('questions', [])
+                    ))
+                # 题目在考试插入后一次性写入
+                self._insert_question_rows(conn, question_rows)
+                conn.commit()
+        return exam_ids
 
     def log_usage(self, usage_data):
         """记录系统使用情况"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO usage_logs (
@@ -171,9 +634,76 @@ class ExamDatabase:
             ))
             return cursor.lastrowid
 
+    def log_llm_call(self, record):
+        """记录一次大模型调用的token用量、耗时和结果"""
+        params = record.get('params') or {}
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO usage_logs (
+                    course_id, exam_type, generation_params, result_status,
+                    stage, model, prompt_tokens, completion_tokens,
+                    cached_tokens, latency_ms, retries, finish_reason, cache_hit
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                params.get('course_id'),
+                params.get('exam_type'),
+                json.dumps(params, ensure_ascii=False),
+                record.get('result_status'),
+                record.get('stage'),
+                record.get('model'),
+                record.get('prompt_tokens', 0),
+                record.get('completion_tokens', 0),
+                record.get('cached_tokens', 0),
+                record.get('latency_ms'),
+                record.get('retries', 0),
+                record.get('finish_reason'),
+                1 if record.get('cache_hit') else 0
+            ))
+            return cursor.lastrowid
+
+    def get_llm_usage_by_stage(self, days=30):
+        """按生成阶段汇总最近days天的大模型调用统计"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT stage,
+                       COUNT(*) as calls,
+                       SUM(cache_hit) as cache_hits,
+                       SUM(CASE WHEN result_status = 'error' THEN 1 ELSE 0 END) as errors,
+                       SUM(prompt_tokens) as prompt_tokens,
+                       SUM(completion_tokens) as completion_tokens,
+                       SUM(cached_tokens) as cached_tokens,
+                       AVG(CASE WHEN cache_hit = 0 THEN latency_ms END) as avg_latency_ms,
+                       MAX(latency_ms) as max_latency_ms,
+                       SUM(latency_ms) as total_latency_ms,
+                       SUM(retries) as retries
+                FROM usage_logs
+                WHERE stage IS NOT NULL
+                  AND created_at >= datetime('now', ?)
+                GROUP BY stage
+                ORDER BY total_latency_ms DESC
+            ''', (f'-{int(days)} days',))
+            return cursor.fetchall()
+
+    def get_recent_llm_calls(self, limit=100):
+        """获取最近的大模型调用记录"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT created_at, stage, model, result_status, cache_hit,
+                       prompt_tokens, completion_tokens, cached_tokens,
+                       latency_ms, retries, finish_reason
+                FROM usage_logs
+                WHERE stage IS NOT NULL
+                ORDER BY log_id DESC
+                LIMIT ?
+            ''', (limit,))
+            return cursor.fetchall()
+
     def get_course_exams(self, course_id):
         """获取课程的所有考试"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT exam_id, exam_type, exam_content, created_at, status
@@ -183,9 +713,156 @@ class ExamDatabase:
             ''', (course_id,))
             return cursor.fetchall()
 
+    def list_course_exams(self, course_id, limit=20, after=None):
+        """按创建时间倒序分页列出课程的考试，只返回摘要字段，不含考试内容
+
+        after 为上一页返回的游标，返回 (行列表, 下一页游标)，没有下一页时游标为None。
+        每行为 (exam_id, exam_type, chapters, difficulty, creator, created_at, status)。
+        """
+        query = '''
+            SELECT exam_id, exam_type, chapters, difficulty, creator, created_at, status
+            FROM exams
+            WHERE course_id = ?
+        '''
+        params = [course_id]
+        if after is not None:
+            # 游标为上一页最后一行的 (created_at, exam_id)
+            query += ' AND (created_at, exam_id) < (?, ?)'
+            params.extend(after)
+        query += ' ORDER BY created_at DESC, exam_id DESC LIMIT ?'
+        params.append(limit + 1)
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, (rows[-1][5], rows[-1][0])
+
+    def get_exam(self, exam_id):
+        """读取一份考试的完整内容，不存在时返回None"""
+        with self._connect() as conn:
+            row = conn.execute('''
+                SELECT exam_id, course_id, exam_type, exam_content, chapters,
+                       difficulty, creator, created_at, status
+                FROM exams WHERE exam_id = ?
+            ''', (exam_id,)).fetchone()
+        if not row:
+            return None
+        return {
+            'exam_id': row[0],
+            'course_id': row[1],
+            'exam_type': row[2],
+            'exam_content': json.loads(row[3]),
+            'chapters': json.loads(row[4]) if row[4] else None,
+            'difficulty': row[5],
+            'creator': row[6],
+            'created_at': row[7],
+            'status': row[8]
+        }
+
+    def list_questions(self, course_id, question_type=None, limit=50, after=None):
+        """按题目ID倒序（最新的在前）分页列出题库中的题目，不含答案和解析
+
+        after 为上一页返回的游标，返回 (行列表, 下一页游标)，没有下一页时游标为None。
+        每行为 (question_id, question_type, question_content, difficulty, created_at)。
+        """
+        query = '''
+            SELECT question_id, question_type, question_content, difficulty, created_at
+            FROM questions
+            WHERE course_id = ?
+        '''
+        params = [course_id]
+        if question_type:
+            query += ' AND question_type = ?'
+            params.append(question_type)
+        if after is not None:
+            query += ' AND question_id < ?'
+            params.append(after)
+        query += ' ORDER BY question_id DESC LIMIT ?'
+        params.append(limit + 1)
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, rows[-1][0]
+
+    @staticmethod
+    def _search_terms(keywords):
+        """把搜索框内容拆分为关键词，空格、逗号、顿号分隔，各关键词之间为“或”的关系"""
+        return [term for term in re.split(r'[\s,，、;；]+', keywords or '') if term]
+
+    def search_questions(self, keywords, course_id=None, question_type=None, limit=20, offset=0):
+        """在题目内容、答案和解析中检索关键词，按相关度排序并分页
+
+        多个关键词之间为“或”的关系，命中越多、越集中的题目越靠前。
+        关键词都在3个字及以上时使用trigram全文索引；含两个字的关键词（如“回归”）时使用二元分词索引，
+        其中的英文关键词按单词前缀匹配；含单个字的关键词或没有全文索引时逐行匹配，按命中的关键词数排序。
+        返回 (question_id, question_type, question_content, difficulty, created_at, 摘要) 的列表，
+        摘要中命中的文字用**标出，二元分词索引和逐行匹配时摘要为None。
+        """
+        terms = self._search_terms(keywords)
+        if not terms:
+            return []
+
+        filters, filter_params = '', []
+        if course_id is not None:
+            filters += ' AND q.course_id = ?'
+            filter_params.append(course_id)
+        if question_type:
+            filters += ' AND q.question_type = ?'
+            filter_params.append(question_type)
+
+        with self._connect() as conn:
+            tables = self._search_tables(conn)
+            if 'questions_fts' in tables and all(len(term) >= 3 for term in terms):
+                match = ' OR '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+                return conn.execute(f'''
+                    SELECT q.question_id, q.question_type, q.question_content,
+                           q.difficulty, q.created_at,
+                           snippet(questions_fts, -1, '**', '**', '…', 24)
+                    FROM questions_fts
+                    JOIN questions q ON q.question_id = questions_fts.rowid
+                    WHERE questions_fts MATCH ?{filters}
+                    ORDER BY questions_fts.rank, q.question_id DESC
+                    LIMIT ? OFFSET ?
+                ''', [match, *filter_params, limit, offset]).fetchall()
+
+            if 'questions_bigram' in tables and all(len(term) >= 2 for term in terms):
+                # 每个关键词转换为相邻二字组成的短语，末尾按前缀匹配
+                match = ' OR '.join(
+                    '"{}" *'.format(cjk_bigrams(term).strip().replace('"', '""')) for term in terms
+                )
+                return conn.execute(f'''
+                    SELECT q.question_id, q.question_type, q.question_content,
+                           q.difficulty, q.created_at, NULL
+                    FROM questions_bigram
+                    JOIN questions q ON q.question_id = questions_bigram.rowid
+                    WHERE questions_bigram MATCH ?{filters}
+                    ORDER BY questions_bigram.rank, q.question_id DESC
+                    LIMIT ? OFFSET ?
+                ''', [match, *filter_params, limit, offset]).fetchall()
+
+            matched = ' + '.join(
+                '(q.question_content LIKE ? OR q.answer LIKE ? OR q.explanation LIKE ?)' for _ in terms
+            )
+            like_params = [f"%{term}%" for term in terms for _ in range(3)]
+            return conn.execute(f'''
+                SELECT question_id, question_type, question_content, difficulty, created_at, NULL
+                FROM (
+                    SELECT q.question_id, q.question_type, q.question_content,
+                           q.difficulty, q.created_at, {matched} AS matched
+                    FROM questions q
+                    WHERE 1 = 1{filters}
+                )
+                WHERE matched > 0
+                ORDER BY matched DESC, question_id DESC
+                LIMIT ? OFFSET ?
+            ''', [*like_params, *filter_params, limit, offset]).fetchall()
+
     def get_question_bank(self, course_id, question_type=None):
         """获取题目库中的题目"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             query = '''
                 SELECT question_id, question_type, question_content,
@@ -204,19 +881,32 @@ class ExamDatabase:
 
     def get_usage_statistics(self, course_id=None):
         """获取使用统计信息"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             query = '''
                 SELECT exam_type, COUNT(*) as count,
                        strftime('%Y-%m', created_at) as month
                 FROM usage_logs
+                WHERE stage IS NULL
             '''
             params = []
             
             if course_id:
-                query += ' WHERE course_id = ?'
+                query += ' AND course_id = ?'
                 params.append(course_id)
             
             query += ' GROUP BY exam_type, month'
             cursor.execute(query, params)
             return cursor.fetchall()
+
+# 数据库迁移：(版本号, 迁移函数)，版本号递增，已发布的迁移不要修改，只能追加
+MIGRATIONS = [
+    (1, ExamDatabase._create_base_schema),
+    (2, ExamDatabase._create_indexes),
+    (3, ExamDatabase._create_question_search),
+    (4, ExamDatabase._create_listing_indexes),
+    (5, ExamDatabase._create_bulk_load_state),
+    (6, ExamDatabase._create_question_bigram_search),
+    (7, ExamDatabase._drop_function_triggers),
+    (8, ExamDatabase._extend_exam_listing_index),
+]
@@ -16,6 +16,41 @@ def load_course_outline(uploaded_file):
         return json.load(uploaded_file)
     return None
 
+# DeepSeek价格（元/百万token），用于估算费用，价格调整时修改此处
+PRICE_INPUT_CACHE_HIT = 0.5
+PRICE_INPUT_CACHE_MISS = 2.0
+PRICE_OUTPUT = 8.0
+
+def estimate_cost(row):
+    """根据token用量估算一行统计数据的费用（元）"""
+    cache_hit = row['缓存token'] or 0
+    cache_miss = (row['输入token'] or 0) - cache_hit
+    return (
+        cache_hit * PRICE_INPUT_CACHE_HIT
+        + cache_miss * PRICE_INPUT_CACHE_MISS
+        + (row['输出token'] or 0) * PRICE_OUTPUT
+    ) / 1_000_000
+
+def paginate(state_key, fetch):
+    """按游标分页，fetch(after) 返回 (行列表, 下一页游标)，返回当前页的行
+
+    已访问页的游标保存在 session_state[state_key] 中，state_key 应包含筛选条件，条件变化时从第一页开始。
+    """
+    cursors = st.session_state.setdefault(state_key, [None])
+    rows, next_cursor = fetch(cursors[-1])
+    col_prev, col_page, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        if len(cursors) > 1 and st.button("上一页", key=f"{state_key}_prev"):
+            cursors.pop()
+            st.rerun()
+    with col_page:
+        st.caption(f"第{len(cursors)}页")
+    with col_next:
+        if next_cursor is not None and st.button("下一页", key=f"{state_key}_next"):
+            cursors.append(next_cursor)
+            st.rerun()
+    return rows
+
 def display_course_info(course_data):
     """显示课程信息"""
     st.subheader("课程基本信息")
@@ -83,11 +118,15 @@ def main():
             
             with tab1:
                 st.subheader("考试列表")
-                exams = db.get_course_exams(course_id)
-                if exams:
-                    for exam in exams:
-                        with st.expander(f"{exam[1]} - {exam[3]}"):
-                            st.json(exam[2])
+                # 列表只含摘要，展开后按需读取完整内容
+                exams = paginate(
+                    f"exam_pages_{course_id}",
+                    lambda after: db.list_course_exams(course_id, limit=20, after=after)
+                )
+                for exam in exams:
+                    with st.expander(f"{exam[1]} - {exam[5]}（{exam[6]}）"):
+                        if st.button("查看考试内容", key=f"show_exam_{exam[0]}"):
+                            st.json(db.get_exam(exam[0])['exam_content'])
             
             with tab2:
                 st.subheader("导入考试内容")
@@ -125,14 +164,39 @@ def main():
                     ["全部", "选择题", "判断题", "填空题", "简答题", "编程题"]
                 )
                 
-                # 获取题目
-                questions = db.get_question_bank(
-                    course_id,
-                    None if question_type == "全部" else question_type
+                # 关键词检索题目内容、答案和解析
+                keywords = st.text_input(
+                    "搜索题目",
+                    placeholder="如：决策树 过拟合（多个关键词用空格分隔，命中任一即可）"
                 )
                 
-                # 显示题目
-                if questions:
+                if keywords.strip():
+                    search_all = st.checkbox("搜索所有课程", value=False)
+                    page_size = 20
+                    page_number = st.number_input("页码", min_value=1, value=1, step=1)
+                    results = db.search_questions(
+                        keywords,
+                        course_id=None if search_all else course_id,
+                        question_type=None if question_type == "全部" else question_type,
+                        limit=page_size,
+                        offset=(page_number - 1) * page_size
+                    )
+                    if not results:
+                        st.info("没有找到相关题目")
+                    for q in results:
+                        with st.expander(f"{q[1]} - {q[3]}：{q[2][:40]}"):
+                            if q[5]:
+                                st.markdown(q[5])
+                            st.write(q[2])
+                else:
+                    # 分页获取题目
+                    selected_type = None if question_type == "全部" else question_type
+                    questions = paginate(
+                        f"question_pages_{course_id}_{question_type}",
+                        lambda after: db.list_questions(course_id, selected_type, limit=50, after=after)
+                    )
+                    
+                    # 显示题目
                     for q in questions:
                         with st.expander(f"{q[1]} - {q[3]}"):
                             st.write(q[2])
@@ -144,7 +208,7 @@ def main():
     elif page == "使用统计":
         st.header("使用统计")
         
-        tab1, tab2 = st.tabs(["总体统计", "详细记录"])
+        tab1, tab2, tab3 = st.tabs(["总体统计", "详细记录", "模型调用统计"])
         
         with tab1:
             # 获取使用统计数据
@@ -162,7 +226,44 @@ def main():
         
         with tab2:
             st.subheader("使用记录")
-            # TODO: 实现详细使用记录显示功能
+            calls = db.get_recent_llm_calls(limit=200)
+            if calls:
+                df = pd.DataFrame(calls, columns=[
+                    '时间', '阶段', '模型', '状态', '命中缓存',
+                    '输入token', '输出token', '缓存token',
+                    '耗时(ms)', '重试次数', '结束原因'
+                ])
+                st.dataframe(df, use_container_width=True)
+            else:
+                st.info("暂无调用记录")
+        
+        with tab3:
+            st.subheader("各阶段调用统计")
+            days = st.number_input("统计天数", min_value=1, max_value=365, value=30)
+            stage_stats = db.get_llm_usage_by_stage(days)
+            if stage_stats:
+                df = pd.DataFrame(stage_stats, columns=[
+                    '阶段', '调用次数', '缓存命中', '失败次数',
+                    '输入token', '输出token', '缓存token',
+                    '平均耗时(ms)', '最大耗时(ms)', '总耗时(ms)', '重试次数'
+                ])
+                df['估算费用(元)'] = df.apply(estimate_cost, axis=1).round(4)
+                df['平均耗时(ms)'] = df['平均耗时(ms)'].fillna(0).round(0)
+                
+                col1, col2, col3 = st.columns(3)
+                col1.metric("调用次数", int(df['调用次数'].sum()))
+                col2.metric("总token", int(df['输入token'].sum() + df['输出token'].sum()))
+                col3.metric("估算费用(元)", f"{df['估算费用(元)'].sum():.2f}")
+                
+                st.dataframe(df, use_container_width=True)
+                
+                st.subheader("各阶段总耗时")
+                st.bar_chart(df.set_index('阶段')['总耗时(ms)'])
+                
+                st.subheader("各阶段估算费用")
+                st.bar_chart(df.set_index('阶段')['估算费用(元)'])
+            else:
+                st.info("暂无模型调用统计数据")
 
 if __name__ == "__main__":
     main()
@@ -1,15 +1,47 @@
 import streamlit as st
 from docxtpl import DocxTemplate
 import os
-from openai import OpenAI
 import json
 import pandas as pd  # 添加pandas导入
-
-# DeepSeek客户端配置
-client = OpenAI(
-    api_key=st.secrets["DEEPSEEK_API_KEY"],  # 需要在Streamlit secrets中配置
-    base_url="https://api.deepseek.com/beta"
+from contextlib import contextmanager
+from llm import set_usage_recorder
+from ExamDB import ExamDatabase
+from st_context import attach_script_run_ctx, get_api_key, current_session_id
+from fair_scheduler import request_scope
+from deadline import CancelToken, deadline_scope
+from outline_generator import (
+    configure, build_outline_stages, generate_outline, build_document_context,
+    content_sections, OUTLINE_STAGE_LABELS, major_requirements
 )
+from outline_checkpoint import OutlineCheckpointStore
+from outline_prefetch import OutlinePrefetcher
+from job_queue import JobQueue, JOB_RUNNING, JOB_DONE, JOB_FAILED
+
+# 生成函数在outline_generator中，界面只负责配置API Key并把提示显示在页面上
+# 在Streamlit secrets或环境变量中配置DEEPSEEK_API_KEY
+configure(api_key=get_api_key(), reporter=lambda level, message: getattr(st, level)(message))
+
+# 每次大模型调用的token、耗时等统计写入usage_logs
+set_usage_recorder(ExamDatabase().log_llm_call)
+
+# 一键生成的整体时限（秒），超时的阶段退回到上次生成的结果
+OUTLINE_DEADLINE_SECONDS = float(os.environ.get("OUTLINE_DEADLINE_SECONDS", "900"))
+
+@contextmanager
+def outline_deadline(seconds=OUTLINE_DEADLINE_SECONDS):
+    """界面发起的生成：按交互请求调度并限定整体时限，页面重跑（用户再次点击或修改输入）时取消上一次未完成的生成"""
+    previous_token = st.session_state.get('outline_cancel_token')
+    if previous_token is not None:
+        previous_token.cancel("页面已重新运行")
+    token = st.session_state['outline_cancel_token'] = CancelToken()
+    try:
+        with request_scope(priority="interactive", user=current_session_id()), \
+                deadline_scope(seconds=seconds, token=token):
+            yield token
+    except BaseException:
+        token.cancel("页面已重新运行")
+        raise
+
 
 # 1. 首先是所有的显示函数定义
 def display_graduation_requirements(requirements):
@@ -326,1176 +358,6 @@ def display_assessment_explanation(assessment_data):
     except Exception as e:
         st.error(f"显示课程考核及成绩评定说明时出错：{str(e)}")
 
-def generate_aacsb_goals(course_name, course_type, department, major, graduation_requirements, extra_info):
-    system_prompt = """
-    你是一个AACSB认证专家，请为给定的课程生成合适的学习目标。
-    
-    请以JSON格式输出学习目标，格式如下：
-    {
-        "goals": [
-            "CG1 专业知识-L2 系统掌握核心理论与方法",
-            "CG2 实践能力-L2 能够应用专业工具解决问题",
-            "CG3 创新素养-L1 具备基本的创新意识和团队协作能力"
-        ]
-    }
-    """
-    
-    user_prompt = f"""
-    课程名称：{course_name}
-    课程性质：{course_type}
-    开课部门：{department}
-    适用专业：{major}
-    
-    毕业要求指标点：
-    知识类：
-    {chr(10).join([f"- {x}" for x in graduation_requirements['knowledge']])}
-    能力类：
-    {chr(10).join([f"- {x}" for x in graduation_requirements['ability']])}
-    素养类：
-    {chr(10).join([f"- {x}" for x in graduation_requirements['quality']])}
-    
-    额外信息：{extra_info}
-    
-    请基于以上信息生成AACSB学习目标，要求：
-    1. 目标数量和分布：
-       - 总数必须为3个目标（不多不少）
-       - 必须包含：知识类指标点、能力类指标点、素养类指标点各1个
-       - CG1、CG2、CG3序编号
-       - CG1必须是知识型，CG2必须是能力型，CG3必须是素养型
-       - 必须与毕业要求指标点相对应
-    
-    2. 能力水平标注规则：
-       L0（了解/知道）：
-       - 适用于基础概念的认知
-       - 用于通识类课程
-       - 动词：识别、列举、描述
-       
-       L1（理解/掌握）：
-       - 适用于专业基础知识
-       - 用于专业基础课程
-       - 动词：解释、总结、举例
-       
-       L2（应用/熟练）：
-       - 适用于专业核心能力
-       - 用于专业必修课程
-       - 动词：应用、实施、操作
-       
-       L3（分析/精通）：
-       - 适用于综合分析能力
-       - 用于高级专业课程
-       - 动词：分析、评估、设计
-       
-       L4（创新/引领）：
-       - 适用于创新创造能力
-       - 用于研究型课程
-       - 动词：创造、优化、革新
-    
-    3. 课程性质对应规则：
-       专业必修课：
-       - 知识目标：L2-L3
-       - 能力目标：L2-L3
-       - 素养目标：L1-L2
-       
-       专业选修课：
-       - 知识目标：L1-L2
-       - 能力目标：L1-L2
-       - 素养目标：L1-L2
-       
-       通识课程：
-       - 知识目标：L0-L1
-       - 能力目标：L0-L1
-       - 素养目标：L0-L1
-    
-    4. 专业特色要求：
-       - 体现开课部门的学科特点
-       - 反映专业的核心竞争力
-       - 对接行业发展需求
-       - 符合毕业要求指标点
-    
-    请以json格式输出学习目标。
-    """
-    
-    try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            response_format={'type': 'json_object'}
-        )
-        
-        # 解析返回的JSON
-        result = json.loads(response.choices[0].message.content)
-        
-        # 确保返回的数据格式正确
-        if isinstance(result, dict) and "goals" in result:
-            if isinstance(result["goals"], list):
-                # 确保所有目标都是字符串
-                goals = [str(goal) for goal in result["goals"]]
-                return "\n".join(goals)
-            else:
-                st.error("API返回的goals不是列表格式")
-                return None
-        else:
-            st.error("API返回的数据格式不正确")
-            return None
-            
-    except Exception as e:
-        st.error(f"生成学习目标时出错：{str(e)}")
-        return None
-
-def get_graduation_requirements(department, major, extra_info):
-    system_prompt = """
-    你是一个专业培养方案专家，请根据开课部门和适用专业生成合适的毕业要求指标点。
-    
-    请以JSON格式输出，格式如下：
-    {
-        "requirements": {
-            "knowledge": [
-                "K1 掌握数学与统计学基础知识",
-                "K2 掌握数据科学核心理论与方法",
-                "K3 了解人工智能前沿发展动态"
-            ],
-            "ability": [
-                "A1 具备数据采集与预处理能力",
-                "A2 具备数据分析与建模能力",
-                "A3 熟练使用主流分析工具",
-                "A4 能够解决实际数据问题"
-            ],
-            "quality": [
-                "Q1 具备良好的职业道德",
-                "Q2 具备团队协作能力"
-            ]
-        }
-    }
-    """
-    
-    user_prompt = f"""
-    开课部门：{department}
-    适用专业：{major}
-    额外重要信息：{extra_info}
-    
-    请生成该专业的毕业要求指标点，要求：
-    1. 指标点数量要求：
-       - 知识类指标点：3-4个
-       - 能力类指标点：4-5个
-       - 素养类指标点：2-3个
-    
-    2. 编号规则：
-       - 知识类(K)：K1-K4
-       - 能力类(A)：A1-A5
-       - 素养类(Q)：Q1-Q3
-    
-    3. 描述规则：
-       - 每个指标点20字以内
-       - 使用规范的表述动词
-       - 确保可测量可评价
-       - 体现专业特色
-    
-    请以json格式输出指标点。
-    """
-    
-    try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            response_format={'type': 'json_object'}
-        )
-        
-        result = json.loads(response.choices[0].message.content)
-        return result.get('requirements', None)
-        
-    except Exception as e:
-        st.error(f"生成毕业要求指标点时出错：{str(e)}")
-        return None
-
-def generate_course_content(course_name, course_type, department, major, aacsb_goals, extra_info, total_hours, theory_hours, practice_hours, graduation_requirements):
-    system_prompt = """
-    你是一个课程设计专家，请基于完整的课程信息生成课程内容。
-    
-    请以JSON格式输出，格式如下：
-    {
-        "introduction": {
-            "position": "课程定位说明（50字以内）",
-            "purpose": "课程目的说明（50字以内）",
-            "content": "课程内容说明（100字以内）",
-            "method": "教学方法说明（50字以内）",
-            "outcome": "预期成果说明（50字内）"
-        },
-        "objectives": [
-            "1. 知识目标：掌握xxx",
-            "2. 能力目标：能够xxx",
-            "3. 素养目标：具备xxx",
-            "4. 创新目标：能够xxx"
-        ],
-        "textbooks": {
-            "main": [
-                "1.《xxx》（英文）, 作者, 出版社, 2023年（第x版）- 主要用于xxx",
-                "2.《xxx》（中文）, 作者, 出版社, 2022年（第x- 主要用于xxx"
-            ],
-            "references": [
-                "1. 经典教材：《xxx》",
-                "2. 实践指南：《xxx》",
-                "3. 在线资源：xxx平台课程",
-                "4. 技术文档：xxx官方文档",
-                "5. 前沿资料：xxx会议/期刊论文"
-            ]
-        },
-        "objectives_mapping": [
-            {
-                "objective": "1. 知识目标：掌握xxx",
-                "requirements": ["K1 xxx", "K2 xxx"]
-            }
-        ]
-    }
-    """
-    
-    user_prompt = f"""
-    课程名称：{course_name}
-    课程性质：{course_type}
-    开课部门：{department}
-    适用专业：{major}
-    总学时：{total_hours}学时
-    理论学时：{theory_hours}学时
-    实学时{practice_hours}学时
-    
-    AACSB学目标：
-    {aacsb_goals}
-    
-    毕业要求指标点：
-    知识类：
-    {chr(10).join([f"- {x}" for x in graduation_requirements['knowledge']])}
-    能力类：
-    {chr(10).join([f"- {x}" for x in graduation_requirements['ability']])}
-    素养类：
-    {chr(10).join([f"- {x}" for x in graduation_requirements['quality']])}
-    
-    额外信息：
-    {extra_info}
-    
-    请生成课程内容，要求：
-    1. 课程简介要求（总字数300字左右）：
-       - 课程定位：说明在专业培养中的地位和作用
-       - 课程目的：明确培养目标和预期效果
-       - 课程内容：概述主要知识体系和技能要求
-       - 教学方法：说明理论课（{theory_hours}学时）和实践课（{practice_hours}学时）的实施方式
-       - 预期成果：描述学生通过本课程获得的能力提升
-    
-    2. 课程目标要求（必须4个）：
-       - 知识目标：对应AACSB的CG1，映射知识类指标点
-       - 能力目标：对应AACSB的CG2，映射能力类指标点
-       - 素养目标：对应AACSB的CG3，映射素养类指标点
-       - 创新目标：综合性目标，可映射多类指标点
-    
-    3. 教材要求：
-       - 主教材（2本）：
-         * 1本英文教材（近3年版）
-         * 1本中文教材（近3年版）
-         * 要说明适用的教学内容
-       
-       - 参考资料（5项）：
-         * 经典教材：系统性强的基础教材
-         * 实践指南：案例丰富的实践教材
-         * 在线资源：优质MOOC或在线课程
-         * 技术文档：相关工具或平台文档
-         * 前沿资料：学术会议/期刊论文
-    
-    4. 目标映要求：
-       - 每个课程目标映射1-2个指标点
-       - 知识目标必须映射知识类标
-       - 力标必须射能力类指标点
-       - 养目标必须映射养类指标点
-       - 创新目标可以跨类映
-    
-    5. 整体要求：
-       - 内容逻辑性强
-       - 目标可测量
-       - 资源可获得
-       - 映射有依据
-    
-    请以json格式输出课程内容。
-    """
-    
-    try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            response_format={'type': 'json_object'}
-        )
-        
-        result = json.loads(response.choices[0].message.content)
-        
-        # 验证返回的数据格式
-        if not all(key in result for key in ['introduction', 'objectives', 'textbooks', 'objectives_mapping']):
-            st.error("API返回的数据格式不正确")
-            return None
-        
-        # 验证课程目标的一致性
-        objectives_set = set(result['objectives'])
-        mapping_objectives = set(item['objective'] for item in result['objectives_mapping'])
-        
-        if objectives_set != mapping_objectives:
-            st.error("课程目标与映射关系表的目标不一致")
-            return None
-            
-        if not all(key in result['textbooks'] for key in ['main', 'references']):
-            st.error("API返回的教材数据格式不正确")
-            return None
-            
-        if not isinstance(result['objectives'], list):
-            st.error("课程目标必须是列表格式")
-            return None
-            
-        if not isinstance(result['textbooks']['main'], list):
-            st.error("主教材必须是列表格式")
-            return None
-            
-        if not isinstance(result['textbooks']['references'], list):
-            st.error("参考资料必须是列表格式")
-            return None
-            
-        return result
-        
-    except Exception as e:
-        st.error(f"生成课程内容时出错：{str(e)}")
-        return None
-
-def generate_aacsb_assessment(aacsb_goals, course_objectives, graduation_requirements):
-    """生成AACSB学习目标评估体系"""
-    system_prompt = """
-    你是一个AACSB认证专家，请为给定的学习目标生成评估体系。
-    
-    请以JSON格式输出评估体系，格式示例：
-    {
-        "assessments": [
-            {
-                "cg": "CG1 专业知识-L2 系统掌握核心理论与方法",
-                "og": [
-                    {
-                        "og": "OG1.1 掌握基础概念原理",
-                        "traits": [
-                            "能够准确解释核心概念",
-                            "能够描述基本原理和方法"
-                        ],
-                        "methods": [
-                            "课堂测验（20%）",
-                            "期末考试（30%）"
-                        ],
-                        "criteria": [
-                            "优秀(90-100分)：能够准确理解并灵活运用概念和原理，能够举一反三",
-                            "良好(80-89分)：能够正确理解并应用概念和原理，有一定延伸能力",
-                            "中等(70-79分)：基本理解概念和原理，能够进行简单应用",
-                            "及格(60-69分)：对概念和原理理解有限，应用能力较弱"
-                        ],
-                        "mapping": {
-                            "course_objectives": ["1", "2"],
-                            "graduation_requirements": ["K1", "K2"]
-                        }
-                    }
-                ]
-            }
-        ]
-    }
-    """
-    
-    user_prompt = f"""
-    AACSB学习目标：
-    {aacsb_goals}
-    
-    课程目标：
-    {course_objectives}
-    
-    毕业要求指标点：
-    {json.dumps(graduation_requirements, ensure_ascii=False)}
-    
-    请生成AACSB评估体系，要求：
-    1. CG与OG的对应规则：
-       - 每个CG必须对应2个OG（不多不少）
-       - OGx.1：基础能力目标（对应L0-L1级别）
-       - OGx.2：进阶能力目标（对应L2-L4级别）
-       - OG必须与课程目标和毕业要求指标点相对应
-    
-    2. 评估特征(Traits)设计规则：
-       基础能力特征（L0-L1）：
-       - "能够识别和描述xxx"
-       - "能够理解和解释xxx"
-       - "能够举例说明xxx"
-       
-       应用能力特征（L2）：
-       - "能够用xxx解决xxx"
-       - "能够实施xxx完成xxx"
-       - "能够操作xxx实现xxx"
-       
-       分析能力特征（L3）：
-       - "能够分析xxx提出xxx"
-       - "能够评估xxx优化xxx"
-       - "能够设计xxx改进xxx"
-       
-       创新能力特征（L4）：
-       - "能够创造xxx"
-       - "能够革新xxx"
-       - "能够引领xxx"
-    
-    3. 评估方式(Methods)设计规则：
-       过程性评估（30-40%）：
-       - 课堂表现（10-15%）
-       - 作业完成（10-15%）
-       - 实验报告（10-15%）
-       
-       阶段性评估（30-40%）：
-       - 单元测验（10-15%）
-       - 项目报告（15-20%）
-       - 期中考试（15-20%）
-       
-       终结性评估（30-40%）：
-       - 期末考试（30-40%）
-       - 课程设计（30-40%）
-       - 综合项目（30-40%）
-    
-    4. 评量标准(Criteria)设计规则：
-       必须包含4个等级，每个等级的要求如下：
-       
-       优秀(90-100分)：
-       - 完全/准确/深入理解核心知识
-       - 能够灵活运用和举一反三
-       - 具有创新性思维和解决方案
-       - 表现出很强的分析和综合能力
-       
-       良好(80-89分)：
-       - 正确/较好理解核心知识
-       - 能够正确运用和适当延伸
-       - 具有一定的创新思维
-       - 表现出较强的分析能力
-       
-       中等(70-79分)：
-       - 基本理解核心知识
-       - 能够进行简单应用
-       - 解决方案基本合理
-       - 具有基本的分析能力
-       
-       及格(60-69分)：
-       - 理解知识有限
-       - 应用能力较弱
-       - 解决方案不够完善
-       - 分析能力有待提高
-    
-    补充说明：
-    1. CG设计要求：
-       - 每个CG必须对应不同的能力层次
-       - 必须体现专业核心能力
-       - 要与课程目标紧密对应
-       - 描述必须具体且可测量
-    
-    2. OG设计要求：
-       - 必须是具体的、可操作的行为目标
-       - 必须包含可观察的学习成果
-       - 必须与评估方式直接关联
-       - 必须支持持续改进
-    
-    3. 评估方式要求：
-       - 必须包含直接评估和间接评估
-       - 直接评估：考试、项目、论文等
-       - 间接评估：问卷、访谈、反馈等
-       - 评估时间点要覆盖整个学期
-    
-    4. 评量标准要求：
-       - 每个等级必须有明确的区分特征
-       - 必须体现能力发展的递进关系
-       - 必须与专业认证要求对接
-       - 必须支持教学质量改进
-    
-    请以json格式输出评估体系。
-    """
-    
-    try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            response_format={'type': 'json_object'}
-        )
-        
-        result = json.loads(response.choices[0].message.content)
-        return result.get('assessments', None)
-        
-    except Exception as e:
-        st.error(f"生成AACSB评估体系时出错：{str(e)}")
-        return None
-
-def generate_course_schedule(course_intro, course_objectives, total_hours, theory_hours):
-    """生成课程内容与学时分配表"""
-    # 计算实践学时
-    practice_hours = total_hours - theory_hours
-    
-    system_prompt = """
-    你是一个课程设计专家，请根据课程信息生成课程内容与学时分配表。
-    
-    请以JSON格式输出，格式如下：
-    {
-        "schedule": [
-            {
-                "chapter": "1. 绪论",
-                "content": [
-                    "1.1 基本概念与理论体系",
-                    "1.2 发展历史与研究现状",
-                    "1.3 应用领域与发展趋势"
-                ],
-                "requirements": [
-                    "理解本课程的基本概念和理论体系",
-                    "掌握主要研究内容和应用领域",
-                    "了解学科发展趋势"
-                ],
-                "hours": "2/2",  # 理论/实践学时
-                "type": "讲授、案例分析、讨论"
-            }
-        ]
-    }
-    """
-    
-    user_prompt = f"""
-    课程简介：
-    {json.dumps(course_intro, ensure_ascii=False)}
-    
-    课程目标：
-    {course_objectives}
-    
-    总学时：{total_hours}
-    理论学时：{theory_hours}
-    实践学时：{practice_hours}
-    
-    请根据课程简介和课程目标生成课程内容与学时分配表，要求：
-    1. 内容组织原则：
-       - 知识体系完整，逻辑性强
-       - 难度循序渐进，由浅入深
-       - 理论联系实际，突出应用
-       - 反映学科前沿，体现创新
-       - 符合认知规律，便于学习
-    
-    2. 章节结构要求：
-       - 每章标题简明扼要，突出重点
-       - 每章必须包含3个主要小节
-       - 小节内容具体详实，可操作
-       - 章节之间有机衔接，避免重复
-       - 理论与实际紧密结合
-    
-    3. 学时分配规则：
-       理论课：
-       - 按2学时或4学时为单位安排
-       - 重要章节可安排4学时
-       - 基础章节安排2学时
-       - 总计必须为{theory_hours}学时
-       
-       实践课：
-       - 统一按2学时为单位安排
-       - 尽量安排在对应理论课后
-       - 总计必须为{practice_hours}学时
-       - 难度与理论课程同步
-    
-    4. 教学方式设计：
-       理论教学：
-       - 课堂讲授：系统讲解知识点
-       - 案例分析：加深理解应用
-       - 课堂研讨：促进思维碰撞
-       - 专题讲座：拓展前沿视野
-       
-       实践教学：
-       - 上机操作：培养实践技能
-       - 案例实践：解决实际问题
-       - 项目训练：提升综合能力
-       - 研讨交流：分享学习体会
-    
-    5. 学习要求设计：
-       知识要求：
-       - 明确重点难点
-       - 指明掌握程度
-       - 突出核心概念
-       - 强调应用价值
-       
-       能力要求：
-       - 具体可操作
-       - 可测量评价
-       - 注重实践性
-       - 体现创新性
-    
-    6. 考虑因素：
-       - 课程性质和定位
-       - 学生知识基础
-       - 教学资源条件
-       - 实践教学环境
-       - 课程考核要求
-       - 毕业要求指标点
-    
-    7. 时间分配建议：
-       - 导论与基础（约15%）：课程概述、基本概念、理论基础
-       - 核心内容（约50%）：重点理论、关键技术、主要方法
-       - 前沿拓展（约20%）：新理论、新技术、新应用
-       - 综合应用（约15%）：案例分析、实践创新、总结提升
-    
-    请以json格式输出课程内容与学时分配表。注意：
-    1. 内容要具体明确，避免空泛
-    2. 每章都要有清晰的教学目标
-    3. 理论与实践要紧密结合
-    4. 学时分配要准确合理
-    5. 教学方式要多样灵活
-    6. 学习要求量
-    """
-    
-    try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            response_format={'type': 'json_object'}
-        )
-        
-        result = json.loads(response.choices[0].message.content)
-        schedule_data = result.get('schedule', [])
-        
-        # 验证学时总和
-        theory_sum = sum(int(item['hours'].split('/')[0]) for item in schedule_data)
-        practice_sum = sum(int(item['hours'].split('/')[1]) for item in schedule_data)
-        
-        if theory_sum != theory_hours:
-            st.warning(f"⚠️ 理论学时总和不正确：当前{theory_sum}学时，应为{theory_hours}学时")
-            
-        if practice_sum != practice_hours:
-            st.warning(f"⚠️ 实践学时总和不正确：当前{practice_sum}学时，应为{practice_hours}学时")
-        
-        # 验证每章内容
-        for item in schedule_data:
-            if len(item.get('content', [])) != 3:
-                st.warning(f"⚠️ 章节{item['chapter']}的小节数量不正确")
-                
-            if not item.get('requirements', []):
-                st.warning(f"⚠️ 章节{item['chapter']}缺少学习要求")
-                
-            if not item.get('type', ''):
-                st.warning(f"⚠️ 章节{item['chapter']}缺少教学方式")
-        
-        return schedule_data if schedule_data else []
-        
-    except Exception as e:
-        st.warning(f"⚠️ 生成课程内容与学时分配表时出错：{str(e)}")
-        return []
-
-def generate_lab_schedule(course_schedule, practice_hours, course_objectives):
-    """生成实验教学内容与安排表"""
-    system_prompt = """
-    你是一个课程设计专家，请根据课程内容生成实验教学安排表。
-    
-    请以JSON格式输出，格式如下：
-    {
-        "labs": [
-            {
-                "number": "1",
-                "name": "基础环境搭建与工具使用",
-                "content": [
-                    "1. 开发环境配置",
-                    "2. 基本工具使用",
-                    "3. 示例程序运行"
-                ],
-                "requirements": [
-                    "掌握环境配置方法",
-                    "熟练使用基本工具",
-                    "理解工作流程"
-                ],
-                "hours": 2,
-                "group_size": 1,
-                "type": "基础性",  # 基础性/综合性/设计性
-                "required": "必修",   # 必修/选修
-                "objectives": ["2", "3"],  # 对应的课程目标编号
-                "chapter": "第1章"  # 对应的教学章节
-            }
-        ]
-    }
-    """
-    
-    user_prompt = f"""
-    课程实践总学时：{practice_hours}
-    
-    课程教学内容：
-    {json.dumps(course_schedule, ensure_ascii=False)}
-    
-    课程目标：
-    {course_objectives}
-    
-    请生成实验教学安排表，要求：
-    1. 实验类型及分布：
-       基础性实验（25-30%学时）：
-       - 基本技能训练
-       - 工具使用方法
-       - 单人完成
-       - 对应课程前期章节
-       
-       综合性实验（35-40%学时）：
-       - 综合应用能力
-       - 多知识点结合
-       - 2人协作
-       - 对应课程中期章节
-       
-       设计性实验（35-40%学时）：
-       - 创新设计能力
-       - 方案规划实施
-       - 2-3人团队
-       - 对应课程后期章
-    
-    2. 实验内容要求：
-       - 必须与教学进度同步
-       - 实验内容层次
-       - 难度循序渐进
-       - 体现能力培养
-       - 注重实际应用能力
-    
-    3. 学时分配规则：
-       - 总学时必须等于{practice_hours}
-       - 基础性实验：2-4学时/个
-       - 综合性实验：4学/个
-       - 设计性实验4-6学时/个
-       - 合理分配各类实验
-    
-    4. 分组要求：
-       - 基础性：单人（1人/组）
-       - 综合性：双人（2人/组）
-       - 设计性：团队（2-3人/组）
-       - 明确每个实验分组
-    
-    请以json格式输出实验教学安排表。
-    """
-    
-    try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            response_format={'type': 'json_object'}
-        )
-        
-        result = json.loads(response.choices[0].message.content)
-        labs_data = result.get('labs', [])
-        
-        # 验证实验数量
-        if len(labs_data) < 1:
-            st.warning("⚠️ 实验数量不能少于1个")
-            return None
-        
-        # 验证实验学时总和
-        total_lab_hours = sum(item['hours'] for item in labs_data)
-        if total_lab_hours != practice_hours:
-            st.warning(f"⚠️ 实验学时总和不正确：当前{total_lab_hours}学时，应为{practice_hours}学时")
-        
-        # 验证每个实验的内容和要求
-        for lab in labs_data:
-            if len(lab.get('content', [])) < 1:
-                st.warning(f"⚠️ 实验{lab['number']}缺少内容")
-            
-            if len(lab.get('requirements', [])) < 1:
-                st.warning(f"⚠️ 实验{lab['number']}缺少学习要求")
-        
-        return labs_data
-        
-    except Exception as e:
-        st.error(f"生成实验教学内容与安排表时出错：{str(e)}")
-        return None
-    
-
-def generate_assessment_scheme(course_objectives, assessment_data, labs_data, theory_hours, practice_hours, exam_type, exam_form, course_type):
-    """生成考核方案"""
-    
-    # 根据考核方式和是否有实验学时选择不同的提示词模板
-    if exam_type == "考试":
-        if exam_form == "闭卷笔试":
-            if practice_hours > 0:
-                assessment_template = """
-                请生成考核方案，要求：
-                1. 期末考试（闭卷笔试）（40-50%）：
-                   - 基础知识（40%）：概念理解、原理掌握
-                   - 应用能力（40%）：问题分析、算法设计
-                   - 综合创新（20%）：方案优化、拓展应用
-                
-                2. 平时成绩（30-40%）：
-                   课堂表现（10-15%）：
-                   - 出勤记录
-                   - 课堂互动
-                   - 学习态度
-                   
-                   课后作业（10-15%）：
-                   - 完成质量
-                   - 提交时效
-                   - 创新思维
-                   
-                   单元测验（10%）：
-                   - 知识掌握
-                   - 应用能力
-                   - 理解程度
-                
-                3. 实验成绩（20-30%）：
-                   实验操作（10-15%）：
-                   - 规范操作
-                   - 完成情况
-                   - 独立性
-                   
-                   实验报告（10-15%）：
-                   - 数据记录
-                   - 分析讨论
-                   - 报告规范
-                """
-            else:
-                assessment_template = """
-                请生成考核方案，要求：
-                1. 期末考试（闭卷笔试）（50-60%）：
-                   - 基础知识（40%）：概念理解、原理掌握
-                   - 应用能力（40%）：问题分析、算法设计
-                   - 综合创新（20%）：方案优化、拓展应用
-                
-                2. 平时成绩（40-50%）：
-                   课堂表现（15-20%）：
-                   - 出勤记录
-                   - 课堂互动
-                   - 学习态度
-                   
-                   课后作业（15-20%）：
-                   - 完成质量
-                   - 提交时效
-                   - 创新思维
-                   
-                   单元测验（10-15%）：
-                   - 知识掌握
-                   - 应用能力
-                   - 理解程度
-                """
-        else:  # 开卷笔试
-            if practice_hours > 0:
-                assessment_template = """
-                请生成考核方案，要求：
-                1. 期末考试（开卷笔试）（40-50%）：
-                   - 应用能力（50%）：问题分析、方案设计
-                   - 综合创新（30%）：方案优化、创新思维
-                   - 文献运用（20%）：资料查找、知识整合
-                
-                2. 平时成绩（30-40%）：
-                   课堂参与（15-20%）：
-                   - 讨论发言
-                   - 案例分析
-                   - 问题解答
-                   
-                   研究报告（15-20%）：
-                   - 文献综述
-                   - 方法应用
-                   - 创新见解
-                
-                3. 实验成绩（20-30%）：
-                   项目实现（10-15%）：
-                   - 功能完整
-                   - 技术水平
-                   - 创新性
-                   
-                   技术报告（10-15%）：
-                   - 方案设计
-                   - 实现过程
-                   - 结果分析
-                """
-            else:
-                assessment_template = """
-                请生成考核方案，要求：
-                1. 期末考试（开卷笔试）（50-60%）：
-                   - 应用能力（50%）：问题分析、方案设计
-                   - 综合创新（30%）：方案优化、创新思维
-                   - 文献运用（20%）：资料查找、知识整合
-                
-                2. 平时成绩（40-50%）：
-                   课堂参与（20-25%）：
-                   - 讨论发言
-                   - 案例分析
-                   - 问题解答
-                   
-                   研究报告（20-25%）：
-                   - 文献综述
-                   - 方法应用
-                   - 创新见解
-                """
-    else:  # 考查课程
-        if exam_form == "课程论文":
-            if practice_hours > 0:
-                assessment_template = """
-                请生成考核方案，要求：
-                1. 课程论文（35-40%）：
-                   - 选题价值（10%）：选题新颖性、研究意义
-                   - 内容水平（15%）：文献综述、研究方法
-                   - 创新程度（10%）：观点创新、方法创新
-                   - 写作规范（5%）：结构完整、格式规范
-                
-                2. 平时成绩（35-40%）：
-                   课堂表现（10-15%）：
-                   - 出勤记录
-                   - 课堂讨论
-                   - 学习态度
-                   
-                   文献研读（15-20%）：
-                   - 阅读笔记
-                   - 文献综述
-                   - 研究动态
-                   
-                   研究过程（10-15%）：
-                   - 选题报告
-                   - 开题答辩
-                   - 进度汇报
-                
-                3. 实验实践（20-30%）：
-                   研究实践（10-15%）：
-                   - 数据收集
-                   - 模型构建
-                   - 实验验证
-                   
-                   成果展示（10-15%）：
-                   - 论文答辩
-                   - 研究成果
-                   - 创新贡献
-                """
-            else:
-                assessment_template = """
-                请生成考核方案，要求：
-                1. 课程论文（50-60%）：
-                   - 选题价值（15%）：选题新颖性、研究意义
-                   - 内容水平（20%）：文献综述、研究方法
-                   - 创新程度（15%）：观点创新、方法创新
-                   - 写作规范（10%）：结构完整、格式规范
-                
-                2. 平时成绩（40-50%）：
-                   课堂表现（15-20%）：
-                   - 出勤记录
-                   - 课堂讨论
-                   - 学习态度
-                   
-                   文献研读（15-20%）：
-                   - 阅读笔记
-                   - 文献综述
-                   - 研究动态
-                   
-                   研究过程（10-15%）：
-                   - 选题报告
-                   - 开题答辩
-                   - 进度汇报
-                """
-        elif exam_form == "项目报告":
-            if practice_hours > 0:
-                assessment_template = """
-                请生成考核方案，要求：
-                1. 项目成果（35-40%）：
-                   - 需求分析（10%）：需求理解、问题定义
-                   - 设计方案（15%）：技术路线、创新点
-                   - 实现效果（10%）：功能完整、性能指标
-                   - 文档质量（5%）：文档规范、内容完整
-                
-                2. 平时成绩（35-40%）：
-                   课堂表现（10-15%）：
-                   - 出勤记录
-                   - 课堂讨论
-                   - 学习态度
-                   
-                   团队协作（15-20%）：
-                   - 任务分工
-                   - 进度管理
-                   - 团队贡献
-                   
-                   阶段评审（10-15%）：
-                   - 方案评审
-                   - 中期检查
-                   - 测试报告
-                
-                3. 技术实现（20-30%）：
-                   代码质量（10-15%）：
-                   - 代码规范
-                   - 功能实现
-                   - 性能优化
-                   
-                   部署运维（10-15%）：
-                   - 环境部署
-                   - 系统测试
-                   - 问题修复
-                """
-            else:
-                assessment_template = """
-                请生成考核方案，要求：
-                1. 项目成果（50-60%）：
-                   - 需求分析（15%）：需求理解、问题定义
-                   - 设计方案（20%）：技术路线、创新点
-                   - 实现效果（15%）：功能完整、性能指标
-                   - 文档质量（10%）：文档规范、内容完整
-                
-                2. 平时成绩（40-50%）：
-                   课堂表现（15-20%）：
-                   - 出勤记录
-                   - 课堂讨论
-                   - 学习态度
-                   
-                   团队协作（15-20%）：
-                   - 任务分工
-                   - 进度管理
-                   - 团队贡献
-                   
-                   阶段评审（10-15%）：
-                   - 方案评审
-                   - 中期检查
-                   - 测试报告
-                """
-        else:  # 课程设计
-            if practice_hours > 0:
-                assessment_template = """
-                请生成考核方案，要求：
-                1. 设计成果（35-40%）：
-                   - 设计方案（15%）：创新性、可行性
-                   - 实现质量（15%）：完整性、技术性
-                   - 答辩表现（10%）：表达、回答
-                
-                2. 平时成绩（35-40%）：
-                   课堂表现（10-15%）：
-                   - 出勤记录
-                   - 课堂讨论
-                   - 学习态度
-                   
-                   过程管理（15-20%）：
-                   - 进度计划
-                   - 文档管理
-                   - 版本控制
-                   
-                   阶段评审（10-15%）：
-                   - 方案评审
-                   - 中期检查
-                   - 验收测试
-                
-                3. 技术实现（20-30%）：
-                   实现质量（10-15%）：
-                   - 代码规范
-                   - 功能完整
-                   - 性能优化
-                   
-                   创新应用（10-15%）：
-                   - 技术创新
-                   - 应用价值
-                   - 实用效果
-                """
-            else:
-                assessment_template = """
-                请生成考核方案，要求：
-                1. 设计成果（50-60%）：
-                   - 设计方案（20%）：创新性、可行性
-                   - 实现质量（20%）：完整性、技术性
-                   - 答辩表现（10%）：表达、回答
-                
-                2. 平时成绩（40-50%）：
-                   课堂表现（15-20%）：
-                   - 出勤记录
-                   - 课堂讨论
-                   - 学习态度
-                   
-                   过程管理（15-20%）：
-                   - 进度计划
-                   - 文档管理
-                   - 版本控制
-                   
-                   阶段评审（10-15%）：
-                   - 方案评审
-                   - 中期检查
-                   - 验收测试
-                """
-    
-    system_prompt = """
-    你是一个课程设计专家，请根据课程信息生成考核方案。
-    
-    请严格按照以下JSON格式输出：
-    {
-        "assessment_items": [
-            {
-                "type": "期末考试（闭卷笔试）",
-                "percentage": 50,
-                "criteria": [
-                    "1. 基础知识（20%）：概念理解、原理掌握",
-                    "2. 应用能力（20%）：问题分析、方案设计",
-                    "3. 创新思维（10%）：方案优化、拓展思考"
-                ],
-                "objectives": ["1", "2"]
-            }
-        ]
-    }
-    """
-    
-    user_prompt = f"""
-    课程目标：
-    {course_objectives}
-    
-    AACSB评估体系：
-    {json.dumps(assessment_data, ensure_ascii=False)}
-    
-    实验安排：
-    {json.dumps(labs_data, ensure_ascii=False) if labs_data else "无实验环节"}
-    
-    考核方式：{exam_type}（{exam_form}）
-    课程性质：{course_type}
-    理论学时：{theory_hours}
-    实践学时：{practice_hours}
-    
-    {assessment_template}
-    
-    请注意：
-    1. 各部分考核比例必须在规定范围内
-    2. 所有考核项目必须对应课程目标
-    3. 考核标准必须具体且可操作
-    4. 总评成绩必须为100%
-    5. 评分标准应体现区分度
-    
-    请以json格式输出考核方案。
-    """
-    
-    try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            response_format={'type': 'json_object'}
-        )
-        
-        result = json.loads(response.choices[0].message.content)
-        assessment_items = result.get('assessment_items', [])
-        
-        # 验证考核比例总和
-        total_percentage = sum(item.get('percentage', 0) for item in assessment_items)
-        if total_percentage != 100:
-            st.warning(f"⚠️ 考核比例总和({total_percentage}%)不等于100%")
-        
-        # 验证考试课程的期末考试要求
-        if exam_type == "考试":
-            final_exam = next((item for item in assessment_items if '期末考试' in item['type']), None)
-            if not final_exam:
-                st.warning("⚠️ 考试课程必须包含期末考试")
-            elif final_exam['percentage'] < 40 or final_exam['percentage'] > 60:
-                st.warning(f"⚠️ 考试课程的期末考试比例({final_exam['percentage']}%)应在40-60%之间")
-        
-        # 验证每项考核都有对应的课程目标
-        for item in assessment_items:
-            if not item.get('objectives'):
-                st.warning(f"⚠️ {item['type']}缺少对应的课程目标")
-        
-        return assessment_items
-        
-    except Exception as e:
-        st.warning(f"⚠️ 生成考核方案时出错：{str(e)}")
-        return []
-
 def validate_data():
     """验证所有必要数据是否已生成"""
     required_data = {
@@ -1547,112 +409,16 @@ def show_generation_progress():
 
 def prepare_document_context():
     """准备文档上下文数据"""
-    context = {
-        # 基本信息
-        'course_name_cn': course_name_cn,
-        'course_name_en': course_name_en,
-        'course_code': course_code,
-        'course_type': course_type,
-        'credits': credits,
-        'total_hours': total_hours,
-        'theory_hours': theory_hours,
-        'practice_hours': practice_hours,
-        'exam_type': exam_type,
-        'exam_form': exam_form,
-        'department': department,
-        'major': major,
-        'prerequisites': prerequisites,
-        
-        # 业要求指标点
-        'graduation_requirements': st.session_state.get('graduation_requirements', {
-            'knowledge': [],
-            'ability': [],
-            'quality': []
-        }),
-        
-        # AACSB学习目标
-        'aacsb_goals': st.session_state.get('aacsb_goals', '').split('\n') if st.session_state.get('aacsb_goals') else [],
-        
-        # 课程简介
-        'course_intro': st.session_state.get('course_intro', {
-            'position': '',
-            'purpose': '',
-            'content': '',
-            'method': '',
-            'outcome': ''
-        }),
-        
-        # 课程目标
-        'course_objectives': st.session_state.get('course_objectives', '').split('\n') if st.session_state.get('course_objectives') else [],
-        
-        # 教材信息
-        'course_textbooks': st.session_state.get('course_textbooks', {
-            'main': [],
-            'references': []
-        }),
-        
-        # 课程目标与毕业要求指标点对应关系
-        'objectives_mapping': [
-            {
-                'number': item['number'],
-                'objective': item['objective'],
-                'requirements': item['requirements']
-            }
-            for item in st.session_state.get('objectives_mapping', [])
-        ],
-        
-        # AACSB评估体系
-        'aacsb_assessment': st.session_state.get('aacsb_assessment', []),
-        
-        # 课程内容与学时分配
-        'course_schedule': [
-            {
-                'chapter': item.get('chapter', ''),
-                'content': item.get('content', []),
-                'requirements': item.get('requirements', []),
-                'hours': item.get('hours', ''),
-                'type': item.get('type', '')
-            }
-            for item in st.session_state.get('course_schedule', [])
-        ],
-        
-        # 实验教学内容（如果有）
-        'labs_schedule': [
-            {
-                'number': lab.get('number', ''),
-                'name': lab.get('name', ''),
-                'content': lab.get('content', []),
-                'requirements': lab.get('requirements', []),
-                'hours': lab.get('hours', ''),
-                'group_size': lab.get('group_size', ''),
-                'required': lab.get('required', '必修'),
-                'type': lab.get('type', '')
-            }
-            for lab in st.session_state.get('labs_schedule', [])
-        ] if practice_hours > 0 else [],
-        
-        # 考核方式和评价标准
-        'assessment_table': [
-            {
-                'type': item.get('type', ''),
-                'percentage': item.get('percentage', 0),
-                'criteria': item.get('criteria', []),
-                'objectives': item.get('objectives', [])
-            }
-            for item in st.session_state.get('assessment_table', [])
-        ]
-    }
-    
-    # 添加总评成绩计算方式
-    context['total_assessment'] = sum(item.get('percentage', 0) for item in context['assessment_table'])
-    
-    # 添加实验课程标记
-    context['has_labs'] = practice_hours > 0
-    
-    # 添加试/考查课程标记
-    context['is_exam'] = exam_type == "考试"
-    
-    return context
+    outline = {'basic_info': current_basic_info()}
+    for key in [
+        'graduation_requirements', 'aacsb_goals', 'course_intro',
+        'course_objectives', 'course_textbooks', 'objectives_mapping',
+        'aacsb_assessment', 'course_schedule', 'assessment_table',
+        'labs_schedule'
+    ]:
+        if key in st.session_state:
+            outline[key] = st.session_state[key]
+    return build_document_context(outline)
 
 def provide_document_download(doc):
     """提供文档下载"""
@@ -1723,121 +489,129 @@ with col2:
         height=100
     )
 
+def current_basic_info():
+    """表单中的课程基本信息"""
+    return {
+        "course_name_cn": course_name_cn,
+        "course_name_en": course_name_en,
+        "course_code": course_code,
+        "course_type": course_type,
+        "credits": credits,
+        "total_hours": total_hours,
+        "theory_hours": theory_hours,
+        "practice_hours": practice_hours,
+        "exam_type": exam_type,
+        "exam_form": exam_form,
+        "department": department,
+        "major": major,
+        "prerequisites": prerequisites,
+        "extra_info": extra_info
+    }
+
+# 各阶段输出保存为检查点，失败或刷新页面后再次生成时从中断的阶段继续
+resume_generation = st.checkbox(
+    "从上次中断处继续",
+    value=True,
+    help="课程信息未变化的阶段直接使用上次生成的结果；取消勾选则全部重新生成"
+)
+
+# 预先生成：开课部门、专业等信息填好后，在后台提前生成指标点和AACSB目标
+prefetcher = st.session_state.setdefault('outline_prefetcher', OutlinePrefetcher())
+speculative_generation = st.checkbox(
+    "填写时预先生成",
+    value=False,
+    help="课程名称、性质、开课部门、专业和额外信息保持几秒不变后，在后台提前生成毕业要求指标点和AACSB目标，一键生成时直接使用"
+)
+if speculative_generation:
+    prefetcher.observe(current_basic_info())
+    prefetch_status = prefetcher.status(current_basic_info())
+    if prefetch_status == "done":
+        st.caption("已预先生成毕业要求指标点和AACSB目标")
+    elif prefetch_status == "failed":
+        reasons = "；".join(prefetcher.errors(current_basic_info()).values())
+        st.caption(f"预先生成失败（{reasons}），一键生成时将重新生成")
+else:
+    prefetcher.cancel()
+
 # 添加统一的生成按钮
 if st.button("🤖 一键生成所有内容", type="primary"):
-    with st.spinner("正在生成所有内容..."):
-        # 1. 获取毕业要求指标点
-        graduation_requirements = get_graduation_requirements(
-            department, 
-            major,
-            extra_info
-        )
-        if not graduation_requirements:
-            st.error("生成毕业要求指标点失败")
-            st.stop()
-        
-        # 保存到session_state
-        st.session_state.graduation_requirements = graduation_requirements
-        
-        # 2. 生成AACSB学习目标 - 修改这部分
-        suggested_goals = generate_aacsb_goals(
-            course_name_cn,
-            course_type,
-            department,
-            major,
-            graduation_requirements,  # 添加毕要求指标点作为参数
-            extra_info
+    basic_info = current_basic_info()
+    checkpoint = OutlineCheckpointStore()
+    if not resume_generation:
+        checkpoint.clear(basic_info['course_code'])
+    # 不从中断处继续时全部重新生成，同时跳过大模型响应缓存
+    stages = build_outline_stages(basic_info, use_cache=resume_generation)
+    if speculative_generation and resume_generation:
+        stages = prefetcher.wrap_stages(stages, basic_info)
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+    finished = []
+
+    def on_stage_done(name, value, error, elapsed):
+        finished.append(name)
+        progress_bar.progress(len(finished) / len(stages))
+        status_text.text(f"{OUTLINE_STAGE_LABELS[name]}已完成（{elapsed:.1f}秒）")
+
+    with st.spinner("正在生成所有内容..."), outline_deadline():
+        outline, failed = generate_outline(
+            basic_info,
+            stages=stages,
+            wrap=attach_script_run_ctx,
+            on_stage_done=on_stage_done,
+            checkpoint=checkpoint
         )
-        if suggested_goals:
-            st.session_state.aacsb_goals = suggested_goals
-            
-            # 3. 生成课程内容（包含课程目标）
-            content = generate_course_content(
-                course_name_cn, 
-                course_type, 
-                department, 
-                major, 
-                suggested_goals, 
-                extra_info,
-                total_hours,
-                theory_hours,
-                practice_hours,
-                graduation_requirements
-            )
-            
-            if content:
-                # 保存课程简介
-                st.session_state.course_intro = content.get('introduction', {})
-                
-                # 保存课程目标
-                st.session_state.course_objectives = "\n".join(content.get('objectives', []))
-                
-                # 保存教材信息
-                st.session_state.course_textbooks = {
-                    'main': content.get('textbooks', {}).get('main', []),
-                    'references': content.get('textbooks', {}).get('references', [])
-                }
-                
-                # 保存目标映射关系
-                if 'objectives_mapping' in content:
-                    mapping_data = []
-                    for i, mapping in enumerate(content['objectives_mapping'], 1):
-                        mapping_data.append({
-                            "number": i,
-                            "objective": mapping['objective'],
-                            "requirements": "；".join(mapping['requirements'])
-                        })
-                    st.session_state.objectives_mapping = mapping_data
-                
-                # 4. 生成AACSB评估体系
-                assessment_data = generate_aacsb_assessment(
-                    suggested_goals,
-                    content['objectives'],
-                    graduation_requirements
-                )
-                if assessment_data:
-                    st.session_state.aacsb_assessment = assessment_data
-                    
-                    # 5. 生成课程内容与学时分配
-                    schedule_data = generate_course_schedule(
-                        content['introduction'],
-                        content['objectives'],
-                        total_hours,
-                        theory_hours
-                    )
-                    st.session_state.course_schedule = schedule_data
-                    
-                    # 6. 生成实验教学内容（如果有实验学时）
-                    if practice_hours > 0:
-                        labs_data = generate_lab_schedule(
-                            schedule_data,
-                            practice_hours,
-                            content['objectives']
-                        )
-                        if labs_data:
-                            st.session_state.labs_schedule = labs_data
-                    
-                    # 7. 生成考核方式和标准
-                    assessment_scheme = generate_assessment_scheme(
-                        content['objectives'],
-                        assessment_data,
-                        labs_data if practice_hours > 0 else None,
-                        theory_hours,
-                        practice_hours,
-                        exam_type,
-                        exam_form,
-                        course_type
-                    )
-                    if assessment_scheme:
-                        st.session_state.assessment_table = assessment_scheme
-                        st.success("所有内容生成完成！")
-                        st.rerun()
-                else:
-                    st.error("生成AACSB评估体系失败")
-            else:
-                st.error("生成课程内容失败")
+
+    progress_bar.empty()
+    status_text.empty()
+
+    # 保存到session_state
+    for key, value in outline.items():
+        if key != "basic_info":
+            st.session_state[key] = value
+    st.session_state.pop('stale_stages', None)
+
+    if failed:
+        for name, reason in failed.items():
+            st.error(f"生成{OUTLINE_STAGE_LABELS[name]}失败：{reason}")
+    else:
+        st.success("所有内容生成完成！")
+        st.rerun()
+
+# 后台生成：只提交任务并查询状态，生成由工作进程（python job_queue.py）完成
+job_queue = JobQueue()
+if st.button("📨 提交到后台生成", help="关闭页面或刷新不会中断生成，完成后回到本页查看结果"):
+    basic_info = current_basic_info()
+    if not resume_generation:
+        OutlineCheckpointStore().clear(basic_info['course_code'])
+    st.session_state.outline_job_id = job_queue.enqueue("outline", {
+        "basic_info": basic_info,
+        "use_cache": resume_generation,
+        "user": current_session_id()
+    })
+
+if st.session_state.get('outline_job_id'):
+    job = job_queue.get(st.session_state.outline_job_id)
+    if job is None:
+        st.session_state.pop('outline_job_id')
+    elif job['status'] == JOB_DONE:
+        for key, value in job['result'].items():
+            if key != "basic_info":
+                st.session_state[key] = value
+        st.session_state.pop('outline_job_id')
+        st.success(f"后台任务{job['id']}已完成，内容已载入")
+    elif job['status'] == JOB_FAILED:
+        st.session_state.pop('outline_job_id')
+        st.error(f"后台任务{job['id']}失败：{job['error']}")
+    else:
+        if job['status'] == JOB_RUNNING:
+            status = f"执行中（第{job['attempts']}次）"
+        elif job['attempts']:
+            status = f"等待重试（上次失败原因：{job['error']}）"
         else:
-            st.error("生成AACSB学习目标失败")
+            status = "等待执行"
+        st.info(f"后台任务{job['id']}{status}，排队任务数：{job_queue.counts().get('queued', 0)}")
+        if st.button("🔄 刷新任务状态", key="refresh_outline_job"):
+            st.rerun()
 
 # 添加课程简介显示函数
 def display_course_intro(intro_data):
@@ -2005,6 +779,33 @@ def display_assessment_description(assessment_table):
 # 1. 显示毕业要求指标点
 display_graduation_requirements(st.session_state.get('graduation_requirements', {}))
 
+# 专业级指标点：同一专业的所有课程共用，修改后对本专业后续生成的大纲生效
+with st.expander(f"专业指标点库：{department} / {major}"):
+    stored_requirements = major_requirements.get(department, major)
+    if stored_requirements is None:
+        st.info("本专业尚未保存指标点，首次生成时将自动保存")
+    else:
+        edited_requirements = st.text_area(
+            "指标点（JSON）",
+            value=json.dumps(stored_requirements, ensure_ascii=False, indent=2),
+            height=300,
+            key="major_requirements_json"
+        )
+        col_save_major, col_reset_major = st.columns(2)
+        with col_save_major:
+            if st.button("💾 保存本专业指标点", key="save_major_requirements"):
+                try:
+                    requirements = json.loads(edited_requirements)
+                    major_requirements.set(department, major, requirements)
+                    st.session_state.graduation_requirements = requirements
+                    st.success("已保存，本专业后续生成的课程大纲将使用修改后的指标点")
+                except ValueError as e:
+                    st.error(f"指标点格式错误：{str(e)}")
+        with col_reset_major:
+            if st.button("🔄 下次生成时重新生成", key="reset_major_requirements"):
+                major_requirements.invalidate(department, major)
+                st.rerun()
+
 # 2. 显示AACSB学习目标
 display_aacsb_goals(st.session_state.get('aacsb_goals', ''))
 
@@ -2037,6 +838,93 @@ display_assessment_description(st.session_state.get('assessment_table', []))
 # 11. 显示考核方式和评价标准
 display_assessment_table(st.session_state.get('assessment_table', []))
 
+# 局部重新生成：只重做单个阶段，只携带该阶段需要的上下文
+def session_stage_value(name):
+    """页面上当前显示的阶段结果，课程内容阶段只还原后续阶段用到的简介和课程目标"""
+    if name == "content":
+        if not st.session_state.get('course_intro') or not st.session_state.get('course_objectives'):
+            return None
+        return {
+            'introduction': st.session_state.course_intro,
+            'objectives': st.session_state.course_objectives.split('\n')
+        }
+    return st.session_state.get(name)
+
+def stage_inputs(stage, basic_info, checkpoint):
+    """单个阶段的输入，缺少上游结果时返回None
+
+    检查点中的上游输出与页面显示一致时使用检查点，使输入哈希与一键生成时相同；
+    页面内容来自导入的文件等情况时使用页面上的结果。
+    """
+    inputs = {}
+    for key in stage.inputs:
+        if key == "labs_schedule" and basic_info['practice_hours'] <= 0:
+            inputs[key] = None
+            continue
+        current = session_stage_value(key)
+        if not current:
+            return None
+        saved = checkpoint.load_last(basic_info['course_code'], key)
+        if key == "content" and saved is not None:
+            sections = content_sections(saved)
+            matches = (sections['course_intro'], sections['course_objectives']) == \
+                (st.session_state.course_intro, st.session_state.course_objectives)
+        else:
+            matches = saved == current
+        inputs[key] = saved if matches else current
+    return inputs
+
+def downstream_stages(stages, name):
+    """直接或间接依赖 name 的阶段"""
+    found = set()
+    changed = True
+    while changed:
+        changed = False
+        for stage in stages:
+            if stage.name not in found and (name in stage.inputs or found & set(stage.inputs)):
+                found.add(stage.name)
+                changed = True
+    return found
+
+def regenerate_stage(name, spinner_text):
+    """重新生成单个阶段，结果按一键生成时的输入哈希保存为检查点，并把下游阶段标记为需要重新生成"""
+    basic_info = current_basic_info()
+    stages = build_outline_stages(basic_info, use_cache=False)
+    stage = next(s for s in stages if s.name == name)
+    checkpoint = OutlineCheckpointStore()
+    inputs = stage_inputs(stage, basic_info, checkpoint)
+    if inputs is None:
+        missing = [OUTLINE_STAGE_LABELS[key] for key in stage.inputs if not session_stage_value(key)]
+        st.error("请先生成" + "、".join(missing))
+        return
+    with st.spinner(spinner_text), outline_deadline():
+        value = stage.func(**inputs)
+    if not value:
+        return
+    checkpoint.save(basic_info['course_code'], name, checkpoint.input_hash(name, basic_info, inputs), value)
+    st.session_state[name] = value
+    stale = set(st.session_state.get('stale_stages', ())) - {name}
+    st.session_state.stale_stages = stale | downstream_stages(stages, name)
+    st.rerun()
+
+st.subheader("局部重新生成")
+if st.session_state.get('stale_stages'):
+    stale_labels = [OUTLINE_STAGE_LABELS[name] for name in OUTLINE_STAGE_LABELS if name in st.session_state.stale_stages]
+    st.warning("⚠️ 以下内容基于修改前的上游结果，建议重新生成：" + "、".join(stale_labels))
+col_regen_schedule, col_regen_labs, col_regen_assessment = st.columns(3)
+
+with col_regen_schedule:
+    if st.button("🔄 仅重新生成学时分配", key="regen_schedule"):
+        regenerate_stage("course_schedule", "正在重新生成课程内容与学时分配...")
+
+with col_regen_labs:
+    if st.button("🔄 仅重新生成实验安排", key="regen_labs", disabled=practice_hours <= 0):
+        regenerate_stage("labs_schedule", "正在重新生成实验教学内容...")
+
+with col_regen_assessment:
+    if st.button("🔄 仅重新生成考核方案", key="regen_assessment"):
+        regenerate_stage("assessment_table", "正在重新生成考核方式和标准...")
+
 # 在生成文档按钮旁边添加下载数据按钮
 col_doc, col_data = st.columns(2)
 
@@ -2074,22 +962,7 @@ with col_data:
             # 准备所有数据
             all_data = {
                 # 基本信息
-                "basic_info": {
-                    "course_name_cn": course_name_cn,
-                    "course_name_en": course_name_en,
-                    "course_code": course_code,
-                    "course_type": course_type,
-                    "credits": credits,
-                    "total_hours": total_hours,
-                    "theory_hours": theory_hours,
-                    "practice_hours": practice_hours,
-                    "exam_type": exam_type,
-                    "exam_form": exam_form,  # 添加考核具体形式
-                    "department": department,
-                    "major": major,
-                    "prerequisites": prerequisites,
-                    "extra_info": extra_info
-                },
+                "basic_info": current_basic_info(),
                 
                 # 从session_state获取已生成的数据
                 "graduation_requirements": st.session_state.get('graduation_requirements', {}),
@@ -0,0 +1,117 @@
+"""SQLite 连接池
+
+每个数据库文件在进程内共用一个连接池，连接在线程之间复用（同一时刻只被一个线程使用），
+以 WAL 模式打开，读写互不阻塞。进程退出时自动关闭所有连接。
+"""
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# 连接参数，可用环境变量调整
+DEFAULT_POOL_SIZE = int(os.environ.get("SQLITE_POOL_SIZE", "8"))
+DEFAULT_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+DEFAULT_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+# 负数表示以KiB为单位
+DEFAULT_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", "-16000"))
+DEFAULT_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(64 * 1024 * 1024)))
+
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+class ConnectionPool:
+    def __init__(self, db_path, max_size=DEFAULT_POOL_SIZE, busy_timeout_ms=DEFAULT_BUSY_TIMEOUT_MS,
+                 synchronous=DEFAULT_SYNCHRONOUS, cache_size=DEFAULT_CACHE_SIZE, mmap_size=DEFAULT_MMAP_SIZE):
+        """SQLite连接池
+
+        max_size 为保留的空闲连接数上限，并发超过时临时创建连接，用完即关闭。
+        synchronous 在 WAL 模式下取 NORMAL 即可保证数据库不损坏，最近的提交可能在断电时丢失。
+        """
+        synchronous = str(synchronous).upper()
+        if synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f"synchronous 必须是 {', '.join(SYNCHRONOUS_MODES)} 之一")
+        self.db_path = db_path
+        self.max_size = max_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.synchronous = synchronous
+        self.cache_size = cache_size
+        self.mmap_size = mmap_size
+        self._idle = queue.LifoQueue()
+        self._closed = False
+        self._lock = threading.Lock()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False
+        )
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout_ms)}')
+        conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        conn.execute(f'PRAGMA cache_size={int(self.cache_size)}')
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        return conn
+
+    def _acquire(self):
+        if self._closed:
+            raise sqlite3.ProgrammingError("连接池已关闭")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._open()
+
+    def _release(self, conn):
+        with self._lock:
+            keep = not self._closed and self._idle.qsize() < self.max_size
+            if keep:
+                self._idle.put(conn)
+        if not keep:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        """取出一个连接，代码块正常结束时提交，出现异常时回滚，之后归还连接池"""
+        conn = self._acquire()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._release(conn)
+
+    def close(self):
+        """关闭空闲连接，正在使用的连接归还时关闭"""
+        with self._lock:
+            self._closed = True
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(db_path, **options):
+    """获取数据库文件对应的连接池，同一路径和参数在进程内共用"""
+    key = (os.path.abspath(db_path), tuple(sorted(options.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.closed:
+            pool = _pools[key] = ConnectionPool(db_path, **options)
+        return pool
+
+def close_all():
+    """关闭所有连接池，进程退出时自动调用"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+atexit.register(close_all)
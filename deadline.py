@@ -0,0 +1,110 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+class Cancelled(Exception):
+    """任务已被取消"""
+
+class DeadlineExceeded(Cancelled):
+    """任务超过截止时间"""
+
+class CancelToken:
+    def __init__(self):
+        """取消令牌：cancel() 后，所有持有该令牌（及其子令牌）的阶段和模型调用尽快停止"""
+        self._event = threading.Event()
+        self._children = []
+        self._lock = threading.Lock()
+        self.reason = None
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason="已取消"):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            children = list(self._children)
+        for child in children:
+            child.cancel(reason)
+
+    def child(self):
+        """创建子令牌：父令牌取消时子令牌随之取消，子令牌取消不影响父令牌"""
+        return self.link(CancelToken())
+
+    def link(self, token):
+        """让token在本令牌取消时一并取消，返回token"""
+        with self._lock:
+            self._children.append(token)
+            cancelled = self._event.is_set()
+        if cancelled:
+            token.cancel(self.reason)
+        return token
+
+    def wait(self, timeout):
+        """最多等待timeout秒，期间被取消时立即返回True"""
+        return self._event.wait(timeout)
+
+# 当前的 (截止时间, 取消令牌)，截止时间为 time.monotonic() 的值
+_scope = contextvars.ContextVar("deadline_scope", default=(None, None))
+
+@contextmanager
+def deadline_scope(seconds=None, token=None):
+    """在此范围内执行的阶段和模型调用受截止时间和取消令牌约束
+
+    嵌套时截止时间取内外两者中较早的一个；未指定 token 时沿用外层令牌，
+    指定时与外层令牌关联（外层取消时一并取消）。线程池中执行的函数需复制当前上下文。
+    """
+    outer_deadline, outer_token = _scope.get()
+    deadline = outer_deadline
+    if seconds is not None:
+        deadline = time.monotonic() + seconds if deadline is None else min(deadline, time.monotonic() + seconds)
+    if token is None:
+        token = outer_token
+    elif outer_token is not None:
+        # 外层令牌或指定的令牌取消，都应停止本范围内的工作
+        token = token.link(outer_token.child())
+    reset = _scope.set((deadline, token))
+    try:
+        yield token
+    finally:
+        _scope.reset(reset)
+
+def remaining():
+    """距截止时间的剩余秒数，没有截止时间时返回None"""
+    deadline, _ = _scope.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+def current_token():
+    return _scope.get()[1]
+
+def check():
+    """已取消时抛出Cancelled，已超时时抛出DeadlineExceeded"""
+    deadline, token = _scope.get()
+    if token is not None and token.cancelled:
+        raise Cancelled(token.reason)
+    if deadline is not None and time.monotonic() >= deadline:
+        raise DeadlineExceeded("超过截止时间")
+
+def missed():
+    """是否已取消或已超时"""
+    try:
+        check()
+        return False
+    except Cancelled:
+        return True
+
+def sleep(seconds):
+    """等待seconds秒；等待期间被取消或剩余时间不足时立即抛出异常"""
+    left = remaining()
+    if left is not None and left < seconds:
+        raise DeadlineExceeded("剩余时间不足以等待重试")
+    token = current_token()
+    if token is not None:
+        token.wait(seconds)
+    else:
+        time.sleep(seconds)
+    check()
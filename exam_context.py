@@ -0,0 +1,214 @@
+import re
+import copy
+import json
+import hashlib
+from types import MappingProxyType
+
+def _leading_number(text):
+    """提取文本中的第一个整数，如“1. 绪论”“第3章”“2. 能力目标”"""
+    match = re.search(r'\d+', str(text))
+    return int(match.group()) if match else None
+
+def _requirement_code(text):
+    """提取毕业要求指标点编号，如“K1 掌握xxx”中的K1"""
+    match = re.match(r'\s*([A-Za-z]+\d+)', str(text))
+    return match.group(1).upper() if match else None
+
+def _goal_code(text):
+    """提取AACSB目标编号，如“CG1 专业知识-L2 xxx”中的CG1"""
+    match = re.match(r'\s*(CG\d+)', str(text))
+    return match.group(1) if match else None
+
+def _split_lines(value):
+    if isinstance(value, list):
+        return [str(item) for item in value if str(item).strip()]
+    return [line for line in str(value or '').split('\n') if line.strip()]
+
+def find_chapter(schedule, chapter):
+    """按章节标题或章节序号查找课程安排中的章节"""
+    for item in schedule:
+        if item.get('chapter') == chapter:
+            return item
+    number = _leading_number(chapter)
+    for item in schedule:
+        if number is not None and _leading_number(item.get('chapter', '')) == number:
+            return item
+    return None
+
+def chapter_objective_map(outline_data):
+    """根据实验安排得到 {章节序号: 关联的课程目标序号集合}"""
+    mapping = {}
+    for lab in outline_data.get('labs_schedule') or []:
+        number = _leading_number(lab.get('chapter', ''))
+        if number is None:
+            continue
+        mapping.setdefault(number, set()).update(
+            n for n in map(_leading_number, lab.get('objectives', [])) if n is not None
+        )
+    return mapping
+
+def related_objective_numbers(outline_data, chapter_numbers):
+    """根据实验安排中的章节与课程目标对应关系，找出选定章节关联的课程目标序号
+
+    大纲中没有可用的对应关系时返回None，表示无法缩小范围。
+    """
+    related = set()
+    for number, objectives in chapter_objective_map(outline_data).items():
+        if number in chapter_numbers:
+            related.update(objectives)
+    return related or None
+
+def related_aacsb_goals(outline_data, objective_numbers):
+    """根据AACSB评估体系中OG与课程目标的映射，找出关联的CG编号（如CG1）"""
+    related = set()
+    for assessment in outline_data.get('aacsb_assessment') or []:
+        og_list = assessment.get('og', [])
+        if not isinstance(og_list, list):
+            continue
+        for og in og_list:
+            if not isinstance(og, dict):
+                continue
+            mapped = og.get('mapping', {}).get('course_objectives', [])
+            if any(_leading_number(n) in objective_numbers for n in mapped):
+                code = _goal_code(assessment.get('cg', ''))
+                if code:
+                    related.add(code)
+    return related or None
+
+def related_requirement_codes(outline_data, objective_numbers):
+    """根据课程目标与毕业要求指标点对应关系，找出关联的指标点编号"""
+    related = set()
+    for mapping in outline_data.get('objectives_mapping') or []:
+        number = mapping.get('number') or _leading_number(mapping.get('objective', ''))
+        if _leading_number(number) not in objective_numbers:
+            continue
+        requirements = mapping.get('requirements', [])
+        if isinstance(requirements, str):
+            requirements = re.split(r'[；;\n]', requirements)
+        related.update(code for code in map(_requirement_code, requirements) if code)
+    return related or None
+
+def _filter_lines(lines, keep, summary_label):
+    """只保留keep判断为相关的行，其余行汇总为一句说明"""
+    kept = [line for line in lines if keep(line)]
+    omitted = len(lines) - len(kept)
+    if omitted:
+        kept.append(f"（其余{omitted}项{summary_label}与所选章节无直接关联，已省略）")
+    return kept
+
+def build_exam_context(outline_data, chapters=None, compress=True):
+    """构建考试提示中的大纲上下文
+
+    compress=True 且选定了章节时，只保留选定章节关联的课程目标、AACSB目标和毕业要求指标点，
+    前置/后续章节只给出标题；无法确定关联关系的部分保持完整。
+    返回包含 aacsb_goals、course_objectives、graduation_requirements、chapters 文本的字典。
+    """
+    schedule = outline_data.get('course_schedule') or []
+    goals = _split_lines(outline_data.get('aacsb_goals', ''))
+    objectives = _split_lines(outline_data.get('course_objectives', ''))
+    requirements = outline_data.get('graduation_requirements') or {}
+    requirement_lines = {key: list(requirements.get(key, [])) for key in ('knowledge', 'ability', 'quality')}
+
+    selected = [find_chapter(schedule, chapter) for chapter in chapters or []]
+    selected = [item for item in selected if item]
+
+    if compress and selected:
+        chapter_numbers = {_leading_number(item.get('chapter', '')) for item in selected}
+        objective_numbers = related_objective_numbers(outline_data, chapter_numbers)
+        if objective_numbers:
+            objectives = _filter_lines(objectives, lambda line: _leading_number(line) in objective_numbers, "课程目标")
+
+            goal_codes = related_aacsb_goals(outline_data, objective_numbers)
+            if goal_codes:
+                goals = _filter_lines(goals, lambda line: _goal_code(line) in goal_codes, "AACSB目标")
+
+            codes = related_requirement_codes(outline_data, objective_numbers)
+            if codes:
+                for key, label in (('knowledge', '知识要求'), ('ability', '能力要求'), ('quality', '素质要求')):
+                    requirement_lines[key] = _filter_lines(
+                        requirement_lines[key], lambda line: _requirement_code(line) in codes, label
+                    )
+
+    chapter_blocks = []
+    for item in selected:
+        number = _leading_number(item.get('chapter', ''))
+        prev_chapter = next((ch for ch in schedule if number is not None and _leading_number(ch.get('chapter', '')) == number - 1), None)
+        next_chapter = next((ch for ch in schedule if number is not None and _leading_number(ch.get('chapter', '')) == number + 1), None)
+
+        def describe(neighbour):
+            if not neighbour:
+                return '无'
+            if compress:
+                return neighbour['chapter']
+            return neighbour['chapter'] + ': ' + ', '.join(neighbour.get('content', []))
+
+        chapter_blocks.append(f"""
+                {item['chapter']}
+                - 内容：{', '.join(item.get('content', []))}
+                - 要求：{', '.join(item.get('requirements', []))}
+                - 类型：{item.get('type', '')}
+                - 知识关联：
+                  * 前置知识：{describe(prev_chapter)}
+                  * 后续应用：{describe(next_chapter)}
+                  * 重点关联：{item.get('key_connections', '本章重点知识点的内在联系')}
+                  * 实践应用：{item.get('practical_applications', '本章知识的实际应用场景')}
+                """)
+
+    return {
+        'aacsb_goals': '\n'.join(goals),
+        'course_objectives': '\n'.join(objectives),
+        'graduation_requirements': f"""知识要求：
+    {chr(10).join(requirement_lines['knowledge'])}
+
+    能力要求：
+    {chr(10).join(requirement_lines['ability'])}
+
+    素质要求：
+    {chr(10).join(requirement_lines['quality'])}""",
+        'chapters': ''.join(chapter_blocks)
+    }
+
+class ParsedOutline:
+    """解析后的课程大纲及预先计算的索引
+
+    同一文件内容只解析一次，并通过 st.cache_resource 在所有会话之间共享，因此对外不可修改：
+    索引为元组和只读映射；data 每次返回原始大纲字典的深拷贝，调用方修改它不会影响其他会话。
+    digest 为文件内容的SHA-256。
+    """
+    __slots__ = ('_data', 'digest', 'chapters', 'aacsb_goals', 'course_objectives', 'chapter_objectives')
+
+    def __init__(self, data, digest):
+        schedule = data.get('course_schedule') or []
+        fields = {
+            '_data': data,
+            'digest': digest,
+            'chapters': tuple(str(item['chapter']) for item in schedule if item.get('chapter')),
+            'aacsb_goals': tuple(_split_lines(data.get('aacsb_goals', ''))),
+            'course_objectives': tuple(_split_lines(data.get('course_objectives', ''))),
+            'chapter_objectives': MappingProxyType({
+                number: frozenset(objectives) for number, objectives in chapter_objective_map(data).items()
+            })
+        }
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ParsedOutline 创建后不可修改")
+
+    @property
+    def data(self):
+        """原始大纲字典的副本，生成考试时照常传入"""
+        return copy.deepcopy(self._data)
+
+    def related_objectives(self, chapters):
+        """选定章节关联的课程目标序号（升序），没有对应关系时返回空列表"""
+        related = set()
+        for chapter in chapters:
+            related.update(self.chapter_objectives.get(_leading_number(chapter), ()))
+        return sorted(related)
+
+def parse_outline(raw, digest=None):
+    """解析大纲JSON（bytes或str），返回 ParsedOutline"""
+    if isinstance(raw, str):
+        raw = raw.encode('utf-8')
+    return ParsedOutline(json.loads(raw), digest or hashlib.sha256(raw).hexdigest())
@@ -0,0 +1,1316 @@
+"""考试内容生成（不依赖 Streamlit）
+
+界面（Exam.py）和后台任务进程（job_queue.py）共用这里的提示构建与生成函数。
+"""
+import os
+import json
+import logging
+from llm import chat_completion, stream_chat_completion, get_client, estimate_tokens
+from json_stream import JsonArrayStreamParser
+from exam_context import build_exam_context
+from fair_scheduler import request_scope
+from deadline import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+# API Key与消息输出函数，界面通过 configure 设置，后台任务进程使用环境变量和日志
+_api_key = os.environ.get("DEEPSEEK_API_KEY", "")
+_reporter = None
+
+def configure(api_key=None, reporter=None):
+    """设置生成时使用的API Key和消息输出函数
+
+    reporter(level, message) 接收生成过程中的提示，level 为 error、warning 或 info；
+    未设置时写入日志。
+    """
+    global _api_key, _reporter
+    if api_key is not None:
+        _api_key = api_key
+    if reporter is not None:
+        _reporter = reporter
+
+def _client():
+    return get_client(_api_key)
+
+def _report(level, message):
+    if _reporter is not None:
+        _reporter(level, message)
+    else:
+        getattr(logger, level)(message)
+
+def get_project_score_standards(project_requirements):
+    """生成项目评分标准文本"""
+    standards = {
+        "需求分析": {
+            "score": 20,
+            "items": [
+                {"name": "需求完整性", "score": 5, "criteria": "需求覆盖度和准确性"},
+                {"name": "分析深度", "score": 5, "criteria": "问题分析的深度和合理性"},
+                {"name": "文档质量", "score": 5, "criteria": "文档的规范性和完整性"},
+                {"name": "创新性", "score": 5, "criteria": "解决方案的创新程度"}
+            ]
+        },
+        "概要设计": {
+            "score": 25,
+            "items": [
+                {"name": "架构设计", "score": 8, "criteria": "系构的合理性和可扩展性"},
+                {"name": "技术方案", "score": 7, "criteria": "技术选型的适当性"},
+                {"name": "模块划分", "score": 5, "criteria": "模块划分的清晰度和耦合度"},
+                {"name": "创新性", "score": 5, "criteria": "设计方案的创新性"}
+            ]
+        },
+        "详细设计": {
+            "score": 20,
+            "items": [
+                {"name": "设计完整性", "score": 6, "criteria": "设计文档的完整性"},
+                {"name": "设计合理性", "score": 6, "criteria": "设计方案的可行性"},
+                {"name": "规范性", "score": 4, "criteria": "设计规范的遵循程度"},
+                {"name": "创新性", "score": 4, "criteria": "设计细节的创新点"}
+            ]
+        },
+        "代码实现": {
+            "score": 25,
+            "items": [
+                {"name": "功能实现", "score": 8, "criteria": "功能的完整性和正确性"},
+                {"name": "代码质量", "score": 7, "criteria": "代码规范性和可维护性"},
+                {"name": "性能优化", "score": 5, "criteria": "代码执行效率"},
+                {"name": "新实现", "score": 5, "criteria": "技术实现的创新性"}
+            ]
+        },
+        "测试报告": {
+            "score": 10,
+            "items": [
+                {"name": "测试覆盖", "score": 3, "criteria": "测试用例的覆盖度"},
+                {"name": "测试执行", "score": 3, "criteria": "测试执行的完整性"},
+                {"name": "问题修复", "score": 2, "criteria": "问题跟踪和解决情况"},
+                {"name": "报告质量", "score": 2, "criteria": "测试报告的规范性"}
+            ]
+        }
+    }
+    
+    result = []
+    total_score = 0
+    
+    for req in project_requirements:
+        if req in standards:
+            std = standards[req]
+            total_score += std['score']
+            result.append(f"\n{req}（{std['score']}分）：")
+            for item in std['items']:
+                result.append(f"- {item['name']}（{item['score']}分）：{item['criteria']}")
+    
+    # 添加总分说明
+    if result:
+        result.insert(0, f"总分：{total_score}分")
+    
+    return "\n".join(result)
+
+def create_exam_prompt(outline_data, exam_type, chapters=None, additional_requirements=None, config=None, compress=True):
+    """创建考试提示
+
+    compress=True 时按所选章节压缩大纲上下文，见 exam_context.build_exam_context。
+    """
+    # 获取课程基本信息
+    course_type = outline_data['basic_info']['course_type']
+    department = outline_data['basic_info']['department']
+    major = outline_data['basic_info']['major']
+    
+    # 处理章节文本
+    if chapters and isinstance(chapters, list):
+        chapters_text = ', '.join(chapters)
+    else:
+        chapters_text = "全部章节"
+    
+    # 根据考试类型选择JSON格式
+    if exam_type == "实验":
+        json_format = get_experiment_json_format()
+    elif exam_type == "大作业":
+        json_format = get_project_json_format()
+    else:
+        json_format = '''{
+            "questions": [
+                {
+                    "type": "选择题/判断题/简答题/编程题",
+                    "question": "题目内容",
+                    "options": ["A. 选项1", "B. 选项2", "C. 选项3", "D. 选项4"],
+                    "answer": "标准答案",
+                    "explanation": "解题思路和解析",
+                    "course_objectives": ["对应的课程目标"],
+                    "aacsb_goals": ["对应的AACSB目标"],
+                    "difficulty": "基础/中等/困",
+                    "score": "分值"
+                }
+            ]
+        }'''
+    
+    system_prompt = f"""
+    你一位专业的教育考试出题专家，门负责{department}{major}专业的{course_type}考试命题工作
+    请于提供的课程信息生成高质量的考试题目，并以JSON格式输出，要求如下：
+
+    1. 考试目标：
+       - 准确评学生对课程知识点的掌握程度
+       - 考核学生的实践应用能力
+       - 符合AACSB认证标准的要求
+       - 体现专业特色和课程定位
+    
+    2. 题目要求：
+       - 每道题目必须对应具体的课程目标和AACSB目标
+       - 题目难度要合理分布，并明确标注难度级别
+       - 实践类题目必须符合专业特点
+       - 所有题都要提供详细的解析和评分标准
+       - 确保题目符合{department}{major}专业的特点和要求
+    
+    3. 知识点关联要求：
+       - 体现知识点间的逻辑关系和递进性
+       - 注重前后章节知识的连贯性
+       - 强调知识点的实际应用场景
+       - 突出重点和难点知识的关联
+       - 体现知识体系的完整性
+    
+    4. 能力递进要求：
+       - 基础能力：概念理解和基本应用
+       - 进阶能力：知识综合和问题分析
+       - 高阶能力：创新设计和优化改进
+       - 实践能力：工程实践和项目开发
+    
+    5. JSON输出格式：
+    {json_format}
+    
+    请确保输出严格遵循上述JSON格式。
+    """
+    
+    # 根据不同考试类型调整提示内容
+    exam_type_prompts = {
+        "练习": f"""
+        {course_type}练习题要求：
+        
+        练习难度要求（{config.get('difficulty', '中等')}）：
+        {
+            '''
+            基础难度（Remember & Understand）：
+            1. 题型分布：
+               - 基础概念题（40%）：考察核心概念理解
+               - 简单应用题（40%）：考察基本原理应用
+               - 基础分析题（20%）：考察简单问题分析
+            
+            2. 知识覆盖：
+               - 核心概念准确理解
+               - 基本原理正确应用
+               - 标准流程熟练掌握
+               - 基础编程技能运用
+            
+            3. 答题要求：
+               - 概念定义准确清晰
+               - 基本步骤完整规范
+               - 代码实现基本正确
+               - 结果计算准确无误
+            
+            4. 评分标准：
+               - 概念理解（40%）：术语确、原理清晰
+               - 应用能力（40%）：步骤正确、结果准确
+               - 表达能力（20%）：条理清晰、书写规范
+            ''' if config.get('difficulty') == '基础' else
+            '''
+            中等难度（Apply & Analyze）：
+            1. 题型分布：
+               - 概念应用题（30%）：考察知识综合运用
+               - 综合分析题（40%）：考察问题分析能力
+               - 实践应用题（30%）：考察实际问题解决
+            
+            2. 知识覆盖：
+               - 多知识点综合运用
+               - 实际问题分析能力
+               - 算法设计与优化
+               - 代码实现与调试
+            
+            3. 答题要求：
+               - 分析过程逻辑完整
+               - 解决方案合理可行
+               - 代码实现规范高效
+               - 结果分析深入准确
+            
+            4. 评分标准：
+               - 分析能力（35%）：思路清晰、逻辑严谨
+               - 解决方案（35%）：方案合理、实现正确
+               - 创新思维（30%）：方法创新、优化改进
+            ''' if config.get('difficulty') == '中等' else
+            '''
+            提高难度（Evaluate & Create）：
+            1. 题型分布：
+               - 综合应用题（30%）：考察系统性思维
+               - 方案设计题（40%）：考察创新设计能力
+               - 优化改进题（30%）：考察问题优化能力
+            
+            2. 知识覆盖：
+               - 系统架构设计能力
+               - 性能优化分析能力
+               - 创新解决方案能力
+               - 工程实践应用能力
+            
+            3. 答题要求：
+               - 方案设计完整创新
+               - 性能分析深入全面
+               - 代码实现高效优雅
+               - 优化思路清晰可行
+            
+            4. 评分标准：
+               - 设计能力（30%）：方案创新、架构合理
+               - 实现能力（30%）：代码优秀、性能优化
+               - 创新能力（40%）：思路创新、解决方案优秀
+            '''
+        }
+        
+        通用评分标准：
+        1. 答题完整性（20%）：
+           - 问题理解准确
+           - 解答步骤完整
+           - 结果表达清晰
+        
+        2. 专业规范性（30%）：
+           - 专业术语使用准确
+           - 解题思路专业规范
+           - 代码编写符合规范
+        
+        3. 创新思维（20%）：
+           - 解题思路创新
+           - 方法选择合理
+           - 优化改进意识
+        
+        4. 实践应用（30%）：
+           - 理论联系实际
+           - 解决实际问题
+           - 考虑实际约束
+        
+        要求说明：
+        1. 题型要求（必须严格按照以下数量生成）：
+        {chr(10).join([
+            f"   - {q_type}：必须生成{details['count']}题（{details['description']}）"
+            for q_type, details in config.get('practice_types', {}).items()
+        ])}
+        
+        2. 知识点覆盖：
+           - 重点章节内容占比70%
+           - 基础知识考察30%
+           - 确保知识点分布合理
+        
+        3. 题目要求：
+           - 每道题目必须标注对应的课程目标和AACSB目标
+           - 每道题目必须包含详细的答案和解析
+           - 题目描述必须清晰准确
+           - 答案和评分标准必须明确
+        
+        4. 实施要求：
+           - 题目数量必须严格按照要求生成
+           - 每道题的分值必须与设定一致
+           - 各种题型的总分必须符合设定
+           - 必须覆盖选定的所有章节内容
+           - 确保题目难度分布合理
+        
+        5. 特殊说明：
+           - 选择题必须包含4个选项
+           - 判断题必须明确是非
+           - 简答题必须提供详细评分点
+           - 编程题必须包含测试用例
+        """,
+        
+        "实验": f"""
+        请生成一个完整的{course_type}实验指导方案，类型为{config.get('lab_type', '综合性')}实验。
+        
+        实验难度要求（{config.get('difficulty', '中等')}）：
+        {
+            '''
+            基础难度（Remember & Understand）：
+            1. 实验内容：
+               - 聚焦单个核心知识点
+               - 步骤清晰，流程明确
+               - 提供完整的代码框架
+               - 详细的操作指导
+            
+            2. 实验要求：
+               - 基本功能的实现
+               - 代码规范性要求
+               - 简单的功能测试
+               - 基础实验报告
+            
+            3. 评分标准：
+               - 功能完整性（40%）
+               - 代码规范性（30%）
+               - 实验报告（30%）
+            ''' if config.get('difficulty') == '基础' else
+            '''
+            中等难度（Apply & Analyze）：
+            1. 实验内容：
+               - 组合多个知识点
+               - 部分步骤需自主设计
+               - 提供部分代码框架
+               - 关键步骤有指导
+            
+            2. 实验要求：
+               - 完整功能实现
+               - 代码优化要求
+               - 完整的测试方案
+               - 详细的分析报告
+            
+            3. 评分标准：
+               - 功能实现（35%）
+               - 代码质量（35%）
+               - 实验报告（30%）
+            ''' if config.get('difficulty') == '中等' else
+            '''
+            提高难度（Evaluate & Create）：
+            1. 实验内容：
+               - 综合性问题解决
+               - 完全自主设计
+               - 仅提供基本框架
+               - 鼓励创新设计
+            
+            2. 实验要求：
+               - 创新性解决方案
+               - 性能优化要求
+               - 完整的测试体系
+               - 深入的分析报告
+            
+            3. 评分标准：
+               - 方案创新性（30%）
+               - 实现质量（40%）
+               - 分析报告（30%）
+            '''
+        }
+        
+        实验设计要求：
+        1. 实验定位：
+           {config.get('lab_type', '综合性')}实验的特点：
+           {
+               '''
+               基础性实验：
+               - 针对单个知识点的掌握和应用
+               - 提供详细的操作指导
+               - 给出完整的代码框架
+               - 设置明确的检查点
+               - 预期结果清晰具体
+               ''' if config.get('lab_type') == '基础性' else
+               '''
+               综合性实验：
+               - 涉及多个知识点的综合应用
+               - 提供关键步骤的指导
+               - 给出部分代码框架
+               - 需要自主设计部分内容
+               - 有一定的探索空间
+               ''' if config.get('lab_type') == '综合性' else
+               '''
+               设计性实验：
+               - 提供开放性问题
+               - 需要自主设计解决方案
+               - 只提基本框或不提供
+               - 鼓励创新和多样化
+               - 重视方案的可行性
+               '''
+           }
+
+        2. 识要求：
+           - 应章节：{chapters_text}
+           - 涉及知识点：请根章节内容列
+           - 前置知识要求：请明确指出
+        
+        3. 实验内容：
+           - 实验名称：应明确反映实验内容和类型
+           - 实验目标：应对应课程目标和AACSB目标
+           - 实验步骤：应符合实验型特点
+           - 预期结果：应明确可验证
+        
+        4. 实验指导：
+           - 环境准备：详细的环境配置说明
+           - 操作步骤：符合实验类型的详细程度
+           - 代码模板：根据实验类型提供相应的代码
+           - 注意事项：可能遇到的问题和解决方案
+        
+        5. 考核要求：
+           - 实验准备（20分）：
+             * 环境配置完整性
+             * 预习报告质量
+           - 实验实现（50分）：
+             * 功能完成度
+             * 代码质量
+             * 实现效果
+           - 实验报告（30分）：
+             * 文档规范性
+             * 结果分析
+             * 总结反思
+        
+        6. 创新与拓展：
+           - 提供选做内容
+           - 鼓励创新维
+           - 指出扩展方向
+        
+        请确保生成的实验内容：
+        1. 符合{major}专业特点
+        2. 难度适合{course_type}水平
+        3. 符合{config.get('lab_type', '综合性')}实的特点
+        4. 与所选章节内容紧密相关
+        5. 实验步骤清晰可执行
+        6. 分标准客观可量化
+        
+        请严格按照提供的JSON格式生成实验内容。
+        """,
+        
+        "大作业": f"""
+        {course_type}大作业要求：
+        
+        项目难度要求（{config.get('difficulty', '中等')}）：
+        {
+            '''
+            基础难度（Remember & Understand）：
+            1. 项目范围：
+               - 单一主题研究
+               - 明确的研究目标
+               - 基础理论应用
+               - 标准研究方法
+            
+            2. 内容要求：
+               - 基本概念运用
+               - 规范的研究过程
+               - 基础数据分析
+               - 简单的结论总结
+            
+            3. 文档要求：
+               - 基础研究报告
+               - 简单文献综述
+               - 基本数据说明
+               - 研究过程描述
+            ''' if config.get('difficulty') == '基础' else
+            '''
+            中等难度（Apply & Analyze）：
+            1. 项目范围：
+               - 多维度研究主题
+               - 完整的研究体系
+               - 多种方法应用
+               - 规范的研究管理
+            
+            2. 内容要求：
+               - 深入的理论分析
+               - 合理的方法应用
+               - 完整的数据处理
+               - 有价值的研究发现
+            
+            3. 文档要求：
+               - 详细研究报告
+               - 完整文献综述
+               - 深入分析说明
+               - 研究价值论证
+            ''' if config.get('difficulty') == '中等' else
+            '''
+            提高难度（Evaluate & Create）：
+            1. 项目范围：
+               - 创新性研究主题
+               - 跨学科研究方向
+               - 前沿理论应用
+               - 系统性研究设计
+            
+            2. 内容要求：
+               - 创新性研究方法
+               - 深度理论探讨
+               - 系统数据分析
+               - 有创见的结论
+            
+            3. 文档要求：
+               - 学术性研究报告
+               - 系统文献综述
+               - 创新点分析
+               - 研究展望讨论
+            '''
+        }
+        
+        项目类型（根据{course_type}特点）：
+        {
+            '''
+            编程开发类：
+            - 软件系统开发
+            - 算法实现与优化
+            - 数据处理分析
+            - 应用系统集成
+            ''' if "程序设计" in course_type or "编程" in course_type else
+            '''
+            数据分析类：
+            - 数据收集与处理
+            - 统计分析研究
+            - 数据可视化
+            - 预测模型构建
+            ''' if "统计" in course_type or "数据" in course_type else
+            '''
+            理论研究类：
+            - 文献综述研究
+            - 理论模型构建
+            - 案例分析研究
+            - 对比研究分析
+            ''' if "理论" in course_type or "研究" in course_type else
+            '''
+            实验研究类：
+            - 实验设计与实施
+            - 数据采集分析
+            - 实验结果验证
+            - 实验报告撰写
+            ''' if "实验" in course_type else
+            '''
+            综合研究类：
+            - 主题研究设计
+            - 资料收集整理
+            - 分析与总结
+            - 研究报告撰写
+            '''
+        }
+        
+        项目要求：
+           选定的项目要求：{', '.join(config.get('project_requirements', ['研究分析']))}
+           
+           具体要求：
+           {chr(10).join([
+               f"- {req}：" + (
+                   '''
+                   研究分析：
+                   * 研究背景调研
+                   * 研究目标确定
+                   * 研究方法选择
+                   * 研究框架设计
+                   * 研究计划制定
+                   * 可行性分析
+                   ''' if req == "研究分析" else
+                   '''
+                   理论基础：
+                   * 文献资料收集
+                   * 理论框架构建
+                   * 研究假设提出
+                   * 变量关系分析
+                   * 理论模型设计
+                   * 研究方法确定
+                   ''' if req == "理论基础" else
+                   '''
+                   方案设计：
+                   * 研究方案设计
+                   * 技术路线规划
+                   * 研究步骤安排
+                   * 数据采集计划
+                   * 分析方法选择
+                   * 预期成果设定
+                   ''' if req == "方案设计" else
+                   '''
+                   实施过程：
+                   * 数据收集整理
+                   * 分析过程实施
+                   * 结果记录整理
+                   * 过程质量控制
+                   * 问题解决记录
+                   * 阶段成果总结
+                   ''' if req == "实施过程" else
+                   '''
+                   总结报告：
+                   * 研究报告撰写
+                   * 研究结果分析
+                   * 研究结论提炼
+                   * 研究价值论证
+                   * 研究局限讨论
+                   * 未来展望建议
+                   '''
+               ) for req in config.get('project_requirements', ['研究分析'])
+           ])}
+        
+        评分标准（总分100分）：
+           {get_project_score_standards(config.get('project_requirements', ['研究分析']))}
+        
+        提交要求：
+           - 提交时间：严格遵守截止日期
+           - 提交格式：
+             * 研究报告（PDF格式）
+             * 支撑材料（根据项目类型提供）
+             * 演示文稿（PPT格式）
+             * 研究成果展示（视频或现场）
+        
+        加分项（总分基础上最多加10分）：
+           - 创新性：研究视角或方法创新（+3分）
+           - 实用性：研究成果具有实际应用价值（+3分）
+           - 完整性：资料完整、结构清晰（+2分）
+           - 表现：成果展示和答辩表现优秀（+2分）
+        
+        扣分项：
+           - 迟交：每迟交一天扣总分5分
+           - 抄袭：发现抄袭直接记0分
+           - 资料缺失：缺少关键资料扣5-10分
+           - 内容缺陷：重要内容缺失每项扣3-5分
+        
+        时间安排：
+           - 前期准备：建议用时20%
+           - 实施阶段：建议用时50%
+           - 总结分析：建议用时30%
+        
+        团队协作要求（如果是团队项目）：
+           - 明确的分工安排
+           - 定期的进度汇报
+           - 规范的资料管理
+           - 完整的协作记录
+        
+        请确保生成的大作业内容：
+        1. 符合{course_type}课程特点
+        2. 难度适合{major}专业水平
+        3. 与所选章节内容紧密相关
+        4. 研究要求清晰可执行
+        5. 评分标准客观可量化
+        6. 体现学术研究规范
+        
+        请严格按照提供的JSON格式生成大作业内容。
+        """,
+        
+        "期末试题": f"""
+        {course_type}期末试题要求：
+        
+        特别强调：
+        1. 题型数量严格要求：
+           - 必须严格按照以下配置生成题目，不能多也不能少：
+           {chr(10).join([
+               f"   * {q_type}：必须精确生成{details['count']}题，每题{details['score']}分，总计{details['total']}分"
+               for q_type, details in config.get('question_types', {}).items()
+           ])}
+           - 禁止生成未指定的题型
+           - 禁止更改题目数量
+           - 禁止更改分值设置
+
+        2. 分值合计检查：
+           - 总分必须严格等于{config.get('total_score', 100)}分
+           - 每种题型的总分必须与设定值完全一致
+           - 每道题的分值必须与设定一致
+        
+        试题难度要求（{config.get('difficulty', '中等')}）：
+        {
+            '''
+            基础难度（Remember & Understand）：
+            1. 题型分布：
+               - 基础概念题（40%）：考察核心概念理解
+               - 简单应用题（40%）：考察基本原理应用
+               - 基础分析题（20%）：考察简单问题分析
+            
+            2. 知识覆盖：
+               - 核心概念准确理解
+               - 基本原理正确应用
+               - 标准流程熟练掌握
+               - 基础编程技能运用
+            
+            3. 答题要求：
+               - 概念定义准确清晰
+               - 基本步骤完整规范
+               - 代码实现基本正确
+               - 结果计算准确无误
+            
+            4. 评分标准：
+               - 概念理解（40%）：术语确、原理清晰
+               - 应用能力（40%）：步骤正确、结果准确
+               - 表达能力（20%）：条理清晰、书写规范
+            ''' if config.get('difficulty') == '基础' else
+            '''
+            中等难度（Apply & Analyze）：
+            1. 题型分布：
+               - 概念应用题（30%）：考察知识综合运用
+               - 综合分析题（40%）：考察问题分析能力
+               - 实践应用题（30%）：考察实际问题解决
+            
+            2. 知识覆盖：
+               - 多知识点综合运用
+               - 实际问题分析能力
+               - 算法设计与优化
+               - 代码实现与调试
+            
+            3. 答题要求：
+               - 分析过程逻辑完整
+               - 解决方案合理可行
+               - 代码实现规范高效
+               - 结果分析深入准确
+            
+            4. 评分标准：
+               - 分析能力（35%）：思路清晰、逻辑严谨
+               - 解决方案（35%）：方案合理、实现正确
+               - 创新思维（30%）：方法创新、优化改进
+            ''' if config.get('difficulty') == '中等' else
+            '''
+            提高难度（Evaluate & Create）：
+            1. 题型分布：
+               - 综合应用题（30%）：考察系统性思维
+               - 方案设计题（40%）：考察创新设计能力
+               - 优化改进题（30%）：考察问题优化能力
+            
+            2. 知识覆盖：
+               - 系统架构设计能力
+               - 性能优化分析能力
+               - 创新解决方案能力
+               - 工程实践应用能力
+            
+            3. 答题要求：
+               - 方案设计完整创新
+               - 性能分析深入全面
+               - 代码实现高效优雅
+               - 优化思路清晰可行
+            
+            4. 评分标准：
+               - 设计能力（30%）：方案创新、架构合理
+               - 实现能力（30%）：代码优秀、性能优化
+               - 创新能力（40%）：思路创新、解决方案优秀
+            '''
+        }
+        
+        考试基本要求：
+        1. 考试时长：{config.get('duration', 120)}分钟
+        2. 总分：{config.get('total_score', 100)}分
+        
+        题型结构要求：
+        1. 选择题要求（如有）：
+           - 必须包含4个选项(A/B/C/D)
+           - 选项内容互斥且完整
+           - 答案唯一且明确
+
+        2. 判断题要求（如有）：
+           - 判断内容必须明确
+           - 答案必须是明确的"正确"或"错误"
+           - 避免模棱两可的表述
+
+        3. 填空题要求（如有）：
+           - 空格数量适当
+           - 答案必须唯一明确
+           - 填写内容长度合理
+
+        4. 简答题要求（如有）：
+           - 题目表述清晰
+           - 答题要点明确
+           - 提供详细的评分标准
+
+        5. 编程题要求（如有）：
+           - 问题描述完整
+           - 包含输入输出示例
+           - 提供测试用例
+           - 说明性能要求
+        
+        通用评分标准：
+        1. 答题完整性（20%）：
+           - 问题理解准确
+           - 解答步骤完整
+           - 结果表达清晰
+        
+        2. 专业规范性（30%）：
+           - 专业术语使用准确
+           - 解题思路专业规范
+           - 代码编写符合规范
+        
+        3. 创新思维（20%）：
+           - 解题思路创新
+           - 方法选择合理
+           - 优化改进意识
+        
+        4. 实践应用（30%）：
+           - 理论联系实际
+           - 解决实际问题
+           - 考虑实际约束
+        
+        要求说明：
+        1. 知识点覆盖：
+           - 重点章节内容占比70%
+           - 基础知识考察30%
+           - 确保知识点分布合理
+        
+        2. 题目要求：
+           - 每道题目必须标注对应的课程目标和AACSB目标
+           - 每道题目必须包含详细的答案和解析
+           - 题目描述必须清晰准确
+           - 答案和评分标准必须明确
+        
+        3. 实施要求：
+           - 题目数量必须严格按照要求生成
+           - 每道题的分值必须与设定一致
+           - 各种题型的总分必须符合设定
+           - 必须覆盖选定的所有章节内容
+           - 确保题目难度分布合理
+        
+        4. 特殊说明：
+           - 选择题必须包含4个选项
+           - 判断题必须明确是非
+           - 简答题必须提供详细评分点
+           - 编程题必须包含测试用例
+        
+        生成规范：
+        1. 每道题目必须包含：
+           - 题目类型
+           - 题目内容
+           - 标准答案
+           - 详细解析
+           - 评分标准
+           - 对应的课程目标
+           - 对应的AACSB目标
+        
+        2. 格式检查：
+           - 确保JSON格式完整正确
+           - 确保所有必填字段都有值
+           - 确保分值计算准确
+        
+        3. 质量要求：
+           - 题目表述专业规范
+           - 答案准确无误
+           - 解析详细充分
+           - 难度分布合理
+        
+        请严格遵循以上要求生成试题，确保题型数量和分值与配置完全一致。
+        """
+    }
+    
+    # 构建用户提示，选定章节时只携带与这些章节关联的目标和指标点
+    context = build_exam_context(outline_data, chapters, compress=compress)
+    user_prompt = f"""
+    课程基本信息：
+    - 课程名称：{outline_data['basic_info']['course_name_cn']}
+    - 课程代码：{outline_data['basic_info']['course_code']}
+    - 课程类型：{course_type}
+    - 开设院系：{department}
+    - 专业：{major}
+    - 考试类型：{exam_type}
+    
+    AACSB学习目标：
+    {context['aacsb_goals']}
+    
+    课程目标：
+    {context['course_objectives']}
+    
+    毕业要求：
+    {context['graduation_requirements']}
+    
+    考核范围：
+    """
+    
+    if chapters:
+        user_prompt += "\n选定章节及关联：\n"
+        user_prompt += context['chapters']
+    else:
+        user_prompt += """
+        覆盖全部章节：要求：
+        1. 知识体系完整性：
+           - 基础知识到高阶应用的递进
+           - 理论知识到实践应用的转化
+           - 不同���节知识点的有机结合
+        
+        2. 重点知识关联：
+           - 核心概念的内在联系
+           - 重点知识的应用场景
+           - 难点知识的突破路径
+        
+        3. 能力培养路径：
+           - 从基础理解到综合应用
+           - 从简单实践到复杂项目
+           - 从标准应用到创新设计
+        """
+    
+    # 添加考试类型特定的提示
+    exam_type_prompt = exam_type_prompts.get(exam_type, "")
+    if exam_type_prompt:
+        user_prompt += f"\n{exam_type}具体要求：\n{exam_type_prompt}"
+    
+    # 添加额外要求
+    if additional_requirements:
+        user_prompt += f"\n额外要求：\n{additional_requirements}"
+    
+    if exam_type == "实验":
+        lab_type = config.get('lab_type', '综合性')
+        lab_requirements = get_lab_type_requirements(lab_type, course_type, major)
+        user_prompt += f"\n{lab_requirements}"
+    
+    return system_prompt, user_prompt
+
+def estimate_exam_prompt_tokens(outline_data, exam_type, chapters=None, additional_requirements=None, config=None):
+    """估算压缩前后考试提示的token数，返回 (压缩前, 压缩后)"""
+    before = sum(map(estimate_tokens, create_exam_prompt(outline_data, exam_type, chapters, additional_requirements, config, compress=False)))
+    after = sum(map(estimate_tokens, create_exam_prompt(outline_data, exam_type, chapters, additional_requirements, config, compress=True)))
+    return before, after
+
+def generate_exam(outline_data, exam_type, chapters=None, additional_requirements=None, config=None, temperature=0.7, use_cache=True, on_question=None, priority="interactive", user=""):
+    """调用DeepSeek API生成考试内容，失败时抛出异常
+
+    传入 on_question 时使用流式生成，questions 数组中的每道题一生成完就回调 on_question(q)。
+    priority 为调度类别（interactive/batch），与开课部门、用户一起决定排队顺序。
+    """
+    system_prompt, user_prompt = create_exam_prompt(outline_data, exam_type, chapters, additional_requirements, config)
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+    usage_metadata = {
+        "exam_type": exam_type,
+        "course_code": outline_data['basic_info']['course_code'],
+        "stream": on_question is not None
+    }
+
+    # 调度器按优先级及部门/用户公平分配并发名额
+    with request_scope(
+        priority=priority,
+        department=outline_data['basic_info'].get('department', ''),
+        user=user
+    ):
+        if on_question is None:
+            content = chat_completion(
+                _client(),
+                model="deepseek-chat",
+                messages=messages,
+                response_format={"type": "json_object"},
+                temperature=temperature,  # 使用传入的temperature参数
+                use_cache=use_cache,
+                stage="generate_exam",
+                metadata=usage_metadata
+            )
+            return json.loads(content)
+
+        parser = JsonArrayStreamParser("questions")
+        try:
+            for chunk in stream_chat_completion(
+                _client(),
+                model="deepseek-chat",
+                messages=messages,
+                response_format={"type": "json_object"},
+                temperature=temperature,
+                use_cache=use_cache,
+                stage="generate_exam",
+                metadata=usage_metadata
+            ):
+                for q in parser.feed(chunk):
+                    on_question(q)
+        except DeadlineExceeded:
+            if not parser.items:
+                raise
+            _report("warning", "⚠️ 生成超时，仅保留已完整生成的题目")
+            return {"questions": parser.items}
+
+        try:
+            return json.loads(parser.raw)
+        except ValueError:
+            # 输出被截断时保留已经完整生成的题目
+            if parser.items:
+                _report("warning", "⚠️ 生成内容不完整，仅保留已完整生成的题目")
+                return {"questions": parser.items}
+            raise
+
+def get_project_json_format():
+    """获取大作业的JSON格式"""
+    return '''{
+        "project": {
+            "title": "项目标题",
+            "type": "项目类型",
+            "duration": "建议完成时间",
+            "objectives": [
+                "项目目标1",
+                "项目目标2"
+            ],
+            "requirements": {
+                "需求分析": {
+                    "说明": "需求分析的详细描述",
+                    "交付物": [
+                        "需求规格说明书",
+                        "用例文档"
+                    ],
+                    "具体要求": [
+                        "具体要求1",
+                        "具体要求2"
+                    ]
+                }
+            },
+            "grading_criteria": {
+                "文档质量": {
+                    "分值": 30,
+                    "评分项": [
+                        {"名称": "完整性", "分数": 10, "评分标准": "分标准描述"},
+                        {"名称": "规范性", "分数": 10, "评分标准": "评分标准描述"},
+                        {"名称": "质量", "分数": 10, "评分标准": "评分标准描述"}
+                    ]
+                }
+            },
+            "submission_requirements": {
+                "文档要求": [
+                    "PDF格式的文档",
+                    "Word格式的源文件"
+                ],
+                "代码要求": [
+                    "源代码",
+                    "可执行文件"
+                ]
+            },
+            "timeline": {
+                "第一周": [
+                    "需求分析",
+                    "概要设计"
+                ],
+                "第二周": [
+                    "详细设计",
+                    "始编码"
+                ]
+            },
+            "team_requirements": [
+                "团队规模：2-3人",
+                "明确的分工"
+            ]
+        }
+    }'''
+
+def get_lab_type_requirements(lab_type, course_type, major):
+    """获取不同类型实验的具体要求"""
+    lab_types = {
+        "基础": {
+            "characteristics": [
+                "针对单个知识点的掌握和应用",
+                "提供详细的操作指导",
+                "给出完整的代码框架",
+                "设置明确的检查点",
+                "预期结果清晰具体"
+            ],
+            "guidance_level": [
+                "提供完整的实验步骤",
+                "包含详细的代码示例",
+                "给出具体的验证方法",
+                "明确的完成标准"
+            ],
+            "evaluation_focus": [
+                "基本概念的理解",
+                "基本技能的掌握",
+                "操作的规范性",
+                "结果的正确"
+            ],
+            "report_requirements": [
+                "详细记录实验步骤",
+                "展示关键操作截图",
+                "说明实验结果",
+                "总结实验要点"
+            ]
+        },
+        "综合性": {
+            "characteristics": [
+                "涉及多个知识点的综合应用",
+                "需要综合运用多种技术",
+                "包含一定的设计环节",
+                "有一定的探索空间"
+            ],
+            "guidance_level": [
+                "提供实",
+                "给出关键步骤指导",
+                "部分内容需要自主设计",
+                "预期结果有一定弹性"
+            ],
+            "evaluation_focus": [
+                "知识点的综合运用",
+                "问题分析能力",
+                "方案设计能力",
+                "实现的完整性"
+            ],
+            "report_requirements": [
+                "方案设计说明",
+                "实现过程描述",
+                "结果分析讨论",
+                "创新点说明"
+            ]
+        },
+        "设计性": {
+            "characteristics": [
+                "提供开放性问题",
+                "需自主设计解决方案",
+                "强调创新思维",
+                "注重方案可行性"
+            ],
+            "guidance_level": [
+                "只提供基本要",
+                "生自主设计方案",
+                "鼓励多样化解决方案",
+                "重视创新性思维"
+            ],
+            "evaluation_focus": [
+                "方案的创新性",
+                "设计的合理性",
+                "实现的可行性",
+                "文档的专业性"
+            ],
+            "report_requirements": [
+                "完整的设计文档",
+                "详细的实现说明",
+                "创新点分析",
+                "改进方向建议"
+            ]
+        }
+    }
+    
+    lab_type_info = lab_types.get(lab_type, lab_types["综合性"])
+    
+    return f"""
+    {course_type}{lab_type}实验要求
+    
+    1. 实验特：
+    {chr(10).join(f"   - {char}" for char in lab_type_info["characteristics"])}
+    
+    2. 指导方式：
+    {chr(10).join(f"   - {guide}" for guide in lab_type_info["guidance_level"])}
+    
+    3. 评价重点：
+    {chr(10).join(f"   - {eval}" for eval in lab_type_info["evaluation_focus"])}
+    
+    4. 报告求：
+    {chr(10).join(f"   - {req}" for req in lab_type_info["report_requirements"])}
+    
+    5. 专业特色：
+    - 结合{major}专业特点设计实验内容
+    - 注重专业技能的培养
+    - 符合行业实践要求
+    """
+
+def get_experiment_json_format():
+    """获取实验内容的JSON格式"""
+    return '''
+    {
+        "experiment": {
+            "title": "实验标题",
+            "type": "实验类型（基础性/综合性/设计性）",
+            "duration": "建议实验时长",
+            "objectives": {
+                "knowledge": ["知识目标1", "知识目标2"],
+                "skill": ["技能目标1", "技能目标2"],
+                "course_objectives": ["对应的课程目标"],
+                "aacsb_goals": ["对应的AACSB目标"]
+            },
+            "prerequisites": {
+                "knowledge": ["前置知识要求"],
+                "environment": {
+                    "hardware": ["硬件要求"],
+                    "software": ["软件要求"],
+                    "packages": ["需要的包或库"]
+                },
+                "references": ["参考资料"]
+            },
+            "content": {
+                "description": "实验内容概述",
+                "steps": [
+                    {
+                        "step_number": "1",
+                        "title": "步骤标题",
+                        "description": "详细步骤说明",
+                        "code_template": "相关代码模板",
+                        "expected_output": "预期输出结果",
+                        "notes": "注意事项"
+                    }
+                ]
+            },
+            "requirements": {
+                "basic": ["基本要求（60分标准）"],
+                "good": ["良好要求（80分标准）"],
+                "excellent": ["优秀要求（90分标准）"],
+                "innovative": ["创新要求（加分项）"]
+            },
+            "grading_criteria": {
+                "preparation": {
+                    "weight": 20,
+                    "items": [
+                        {"name": "环境配置", "score": 5, "criteria": "评分标准"},
+                        {"name": "预习报告", "score": 15, "criteria": "评分标准"}
+                    ]
+                },
+                "implementation": {
+                    "weight": 50,
+                    "items": [
+                        {"name": "功能完成度", "score": 20, "criteria": "评分标准"},
+                        {"name": "代码质量", "score": 15, "criteria": "评分标准"},
+                        {"name": "实现效果", "score": 15, "criteria": "评分标准"}
+                    ]
+                },
+                "report": {
+                    "weight": 30,
+                    "items": [
+                        {"name": "实验报告", "score": 20, "criteria": "评分标准"},
+                        {"name": "总结反思", "score": 10, "criteria": "评分标准"}
+                    ]
+                }
+            },
+            "report_template": {
+                "sections": [
+                    {
+                        "title": "1. 实验目的",
+                        "description": "明确说明本次实验要达到的目标，包括：",
+                        "requirements": [
+                            "理论知识点：需要掌握的核心概念和原理",
+                            "实践技能点：需要培养的具体技能",
+                            "创新目标：鼓励探索和创新的方向"
+                        ]
+                    },
+                    {
+                        "title": "2. 实验环境",
+                        "description": "详细描述实验环境的配置情况，包括：",
+                        "requirements": [
+                            "硬件环境：计算机配置、特殊设备等",
+                            "软件环境：操作系统、开发工具、版本信息等",
+                            "相关依赖：需要安装的包、库、插件等",
+                            "环境配置：具体的配置步骤和注意事项"
+                        ]
+                    },
+                    {
+                        "title": "3. 实验步骤",
+                        "description": "按照时间顺序记录实验的完整过程，要求：",
+                        "requirements": [
+                            "前期准备：实验前的准备工作",
+                            "操作过程：详细的操作步骤，配图说明",
+                            "关键代码：核心代码片段及其说明",
+                            "结果验证：每个步骤的验证方法和结果",
+                            "注意事项：操作中的重点和难点"
+                        ]
+                    },
+                    {
+                        "title": "4. 实验结果",
+                        "description": "展示和分析实验的最终结果，包括：",
+                        "requirements": [
+                            "结果展示：运行结果截图或输出",
+                            "数据分析：相关数据的分析和说明",
+                            "结果验证：验证结果的正确性",
+                            "性能分析：程序性能相关数据（如有）",
+                            "对比分析：与预期结果的对比"
+                        ]
+                    },
+                    {
+                        "title": "5. 问题与解决",
+                        "description": "记录实验过程中遇到的问题及解决方案：",
+                        "requirements": [
+                            "问题描述：清晰描述遇到的问题",
+                            "原因分析：分析问题产生的原因",
+                            "解决过程：解决问题的具体步骤",
+                            "解决方案：最终采用的解决方案",
+                            "经验总结：解决问题的心得体会"
+                        ]
+                    },
+                    {
+                        "title": "6. 总结反思",
+                        "description": "对本次实验进行总结和反思：",
+                        "requirements": [
+                            "知识总结：本次实验学到的主要知识点",
+                            "技能提升��提升的具体技能",
+                            "创新点：实验中的创新或改进之处",
+                            "不足分析：实验中的不足之处",
+                            "改进建议：对实验的改进建议",
+                            "心得体会：个人感悟和建议"
+                        ]
+                    }
+                ],
+                "format_requirements": {
+                    "general": [
+                        "文档格式：PDF或Word格式",
+                        "字体要求：正文宋体四，标题黑体三号",
+                        "页边距：上下2.54cm，左右3.17cm",
+                        "行间距：1.5倍行距",
+                        "页码：页面底部居中"
+                    ],
+                    "content": [
+                        "文字描述：清晰、准确、专业",
+                        "图片要求：清晰、大小适中、有序号和说明",
+                        "代码格式：统一的代码风格，有注释",
+                        "引用标注：引用需注明来源",
+                        "专业术语：准确使用专业术语"
+                    ],
+                    "submission": [
+                        "文件命名：学号_姓名_实验X",
+                        "提交方式：通过指定平台提交",
+                        "提交时间：在规定截止日期前提交",
+                        "相关材料：源代码等相关文件一并提交"
+                    ]
+                }
+            }
+        }
+    }
+    '''
@@ -0,0 +1,192 @@
+import contextvars
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+# 当前请求的调度信息（优先级、部门、用户），由 request_scope 设置
+_scope = contextvars.ContextVar("llm_request_scope", default=None)
+
+DEFAULT_PRIORITY = "interactive"
+
+# 排队等待时调用check的间隔（秒）
+CHECK_INTERVAL = 0.5
+
+@contextmanager
+def request_scope(priority=None, department=None, user=None):
+    """在此范围内发起的大模型调用使用指定的优先级和所属部门/用户
+
+    未指定的字段沿用外层范围的设置。线程池中执行的函数需复制当前上下文
+    （contextvars.copy_context().run）才能继承该设置，pipeline.run_stages 已自动处理。
+    """
+    outer = _scope.get() or {}
+    token = _scope.set({
+        'priority': priority or outer.get('priority') or DEFAULT_PRIORITY,
+        'department': department if department is not None else outer.get('department', ''),
+        'user': user if user is not None else outer.get('user', '')
+    })
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+def current_scope():
+    """当前请求的 (优先级, 部门, 用户)"""
+    scope = _scope.get() or {}
+    return scope.get('priority', DEFAULT_PRIORITY), scope.get('department', ''), scope.get('user', '')
+
+class FairScheduler:
+    def __init__(self, class_limits=None, total_limit=None, department_weights=None, reserved=1):
+        """大模型调用的公平调度器
+
+        class_limits 为各优先级类别的并发上限，字典顺序即优先级顺序（靠前的优先）；
+        total_limit 为所有类别合计的并发上限，默认为各类别上限之和，也可以是返回当前上限的函数
+        （如自适应限流器的上限）。合计上限大于1时，最后 reserved 个名额只分配给最高优先级的类别，
+        低优先级请求占满时高优先级请求也不必等待其完成。
+        同一类别内先在部门之间、再在部门内的用户之间按加权公平分配（SFQ），
+        department_weights 为部门权重，默认为1。
+        """
+        self.class_limits = dict(class_limits or {"interactive": 8, "batch": 4})
+        self.total_limit = total_limit or sum(self.class_limits.values())
+        self.reserved = reserved
+        self.department_weights = department_weights or {}
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._running = {name: 0 for name in self.class_limits}
+        self._waiting = {name: [] for name in self.class_limits}
+        self._vtime = {}
+        self._clock = {}
+        self._wait_seconds = {name: 0.0 for name in self.class_limits}
+        self._granted = {name: 0 for name in self.class_limits}
+
+    def _fair_pick(self, cls, group, keys, weight):
+        """在 keys 中选出虚拟开始时间最小的一个，并推进其虚拟时间"""
+        clock = self._clock.get((cls, group), 0.0)
+        starts = {key: max(self._vtime.get((cls, group, key), 0.0), clock) for key in keys}
+        key = min(keys, key=lambda k: (starts[k], k))
+        self._clock[(cls, group)] = starts[key]
+        self._vtime[(cls, group, key)] = starts[key] + 1.0 / weight(key)
+        return key
+
+    def _pick(self, cls):
+        waiting = self._waiting[cls]
+        departments = sorted({t['department'] for t in waiting})
+        department = self._fair_pick(
+            cls, None, departments,
+            lambda d: self.department_weights.get(d, 1.0)
+        )
+        users = sorted({t['user'] for t in waiting if t['department'] == department})
+        user = self._fair_pick(cls, department, users, lambda u: 1.0)
+        # 同一用户的请求按提交顺序执行
+        ticket = min(
+            (t for t in waiting if t['department'] == department and t['user'] == user),
+            key=lambda t: t['seq']
+        )
+        waiting.remove(ticket)
+        return ticket
+
+    def _prune(self, cls):
+        """清理不再影响调度的虚拟时间，避免部门和用户的记录无限增长
+
+        没有排队请求、且虚拟时间不超过所在组虚拟时钟的记录与不存在等价，可以删除；
+        组内没有记录也没有排队请求时删除该组的虚拟时钟。
+        类别完全空闲（没有运行和排队的请求）时清空该类别的全部记录，之后的请求重新开始公平分配。
+        """
+        waiting = self._waiting[cls]
+        if not waiting and not self._running[cls]:
+            for key in [k for k in self._vtime if k[0] == cls]:
+                del self._vtime[key]
+            for key in [k for k in self._clock if k[0] == cls]:
+                del self._clock[key]
+            return
+        departments = {t['department'] for t in waiting}
+        users = {(t['department'], t['user']) for t in waiting}
+        for key, vtime in list(self._vtime.items()):
+            c, group, member = key
+            if c != cls:
+                continue
+            queued = member in departments if group is None else (group, member) in users
+            if not queued and vtime <= self._clock.get((c, group), 0.0):
+                del self._vtime[key]
+        groups = {group for c, group, _ in self._vtime if c == cls}
+        if waiting:
+            groups |= {None} | departments
+        for key in list(self._clock):
+            if key[0] == cls and key[1] not in groups:
+                del self._clock[key]
+
+    def _total(self):
+        total = self.total_limit() if callable(self.total_limit) else self.total_limit
+        return max(1, int(total))
+
+    def _dispatch(self):
+        total = self._total()
+        for index, cls in enumerate(self.class_limits):
+            # 低优先级类别不能占用为最高优先级类别预留的名额
+            cap = total if index == 0 else max(1, total - self.reserved)
+            while (self._waiting[cls]
+                    and self._running[cls] < self.class_limits[cls]
+                    and sum(self._running.values()) < cap):
+                ticket = self._pick(cls)
+                ticket['granted'] = True
+                self._running[cls] += 1
+                self._granted[cls] += 1
+                self._wait_seconds[cls] += time.perf_counter() - ticket['enqueued']
+            self._prune(cls)
+        self._cond.notify_all()
+
+    def acquire(self, priority=None, department="", user="", check=None):
+        """等待获得一个并发名额，返回等待秒数
+
+        check 为等待期间定期调用的函数（如检查超时和取消），抛出异常时放弃排队。
+        """
+        cls = priority if priority in self.class_limits else next(iter(self.class_limits))
+        ticket = {
+            'cls': cls,
+            'department': department or "",
+            'user': user or "",
+            'seq': next(self._seq),
+            'enqueued': time.perf_counter(),
+            'granted': False
+        }
+        with self._cond:
+            self._waiting[cls].append(ticket)
+            self._dispatch()
+            while not ticket['granted']:
+                self._cond.wait(timeout=CHECK_INTERVAL if check else None)
+                if check and not ticket['granted']:
+                    try:
+                        check()
+                    except BaseException:
+                        self._waiting[cls].remove(ticket)
+                        raise
+        return time.perf_counter() - ticket['enqueued']
+
+    def release(self, priority=None):
+        """释放并发名额"""
+        cls = priority if priority in self.class_limits else next(iter(self.class_limits))
+        with self._cond:
+            self._running[cls] -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority=None, department="", user="", check=None):
+        """占用一个并发名额执行代码块"""
+        self.acquire(priority, department, user, check)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    def stats(self):
+        """各类别的运行数、排队数和平均等待时间"""
+        with self._cond:
+            return {
+                cls: {
+                    'running': self._running[cls],
+                    'waiting': len(self._waiting[cls]),
+                    'limit': self.class_limits[cls],
+                    'avg_wait': self._wait_seconds[cls] / self._granted[cls] if self._granted[cls] else 0.0
+                }
+                for cls in self.class_limits
+            }
@@ -0,0 +1,119 @@
+import copy
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 各类实验每个项目的学时范围，与生成实验安排时的提示词保持一致
+LAB_HOUR_BOUNDS = {
+    "基础性": (2, 4),
+    "综合性": (4, 4),
+    "设计性": (4, 6)
+}
+DEFAULT_LAB_HOUR_BOUNDS = (2, 6)
+
+def _distribute(values, target, step, lower, upper):
+    """按固定步长调整各项数值，使总和等于target
+
+    增加时优先补给当前数值最小且未达上限的项，减少时优先扣减数值最大且高于下限的项，
+    同值按顺序取第一个，保证结果确定。返回 (新数值列表, 是否达到目标)。
+    """
+    values = list(values)
+    total = sum(values)
+
+    while total < target:
+        candidates = [i for i, v in enumerate(values) if upper[i] is None or v < upper[i]]
+        if not candidates:
+            return values, False
+        i = min(candidates, key=lambda k: (values[k], k))
+        room = target - total if upper[i] is None else min(target - total, upper[i] - values[i])
+        delta = min(step, room)
+        values[i] += delta
+        total += delta
+
+    while total > target:
+        candidates = [i for i, v in enumerate(values) if v > lower[i]]
+        if not candidates:
+            return values, False
+        i = max(candidates, key=lambda k: (values[k], -k))
+        delta = min(step, total - target, values[i] - lower[i])
+        values[i] -= delta
+        total -= delta
+
+    return values, True
+
+def _parse_hours(value):
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        return 0
+
+def rebalance_schedule_hours(schedule_data, theory_hours, practice_hours):
+    """调整各章节的“理论/实践”学时，使总和分别等于theory_hours和practice_hours
+
+    理论学时按2学时为单位、每章2-4学时优先调整，确实无法满足时再突破该范围，
+    原本没有理论学时的章节保持为0；实践学时按2学时为单位调整。返回 (调整后的章节列表, 调整说明列表, 是否成功)。
+    """
+    schedule = copy.deepcopy(schedule_data)
+    if not schedule:
+        return schedule, [], theory_hours == 0 and practice_hours == 0
+
+    theory, practice = [], []
+    for item in schedule:
+        parts = str(item.get('hours', '')).split('/')
+        theory.append(_parse_hours(parts[0]) if parts else 0)
+        practice.append(_parse_hours(parts[1]) if len(parts) > 1 else 0)
+
+    count = len(schedule)
+    # 原本没有理论学时的章节（纯实践章节）不参与理论学时调整；全部章节都没有理论学时时才都参与
+    theory_chapters = [t > 0 for t in theory] if any(theory) else [True] * count
+    new_theory, ok = _distribute(
+        theory, theory_hours, 2,
+        [2 if c else 0 for c in theory_chapters],
+        [4 if c else 0 for c in theory_chapters]
+    )
+    if not ok:
+        new_theory, ok = _distribute(
+            theory, theory_hours, 2,
+            [0] * count,
+            [None if c else 0 for c in theory_chapters]
+        )
+    new_practice, practice_ok = _distribute(practice, practice_hours, 2, [0] * count, [None] * count)
+
+    adjustments = []
+    for item, old_t, old_p, t, p in zip(schedule, theory, practice, new_theory, new_practice):
+        if (old_t, old_p) != (t, p):
+            adjustments.append(f"{item.get('chapter', '')}：{old_t}/{old_p} → {t}/{p}")
+        item['hours'] = f"{t}/{p}"
+
+    for adjustment in adjustments:
+        logger.info("课程学时调整 %s", adjustment)
+
+    return schedule, adjustments, ok and practice_ok
+
+def rebalance_lab_hours(labs_data, practice_hours):
+    """调整各实验学时，使总和等于practice_hours，且不超出各实验类型的学时范围
+
+    返回 (调整后的实验列表, 调整说明列表, 是否成功)。
+    """
+    labs = copy.deepcopy(labs_data)
+    hours = [_parse_hours(lab.get('hours', 0)) for lab in labs]
+    bounds = [LAB_HOUR_BOUNDS.get(lab.get('type', ''), DEFAULT_LAB_HOUR_BOUNDS) for lab in labs]
+
+    # 原始学时本身越界的先收回到范围内
+    start = [min(max(h, low), high) for h, (low, high) in zip(hours, bounds)]
+    new_hours, ok = _distribute(
+        start, practice_hours, 2,
+        [low for low, _ in bounds],
+        [high for _, high in bounds]
+    )
+
+    adjustments = []
+    for lab, old, new in zip(labs, hours, new_hours):
+        if old != new:
+            adjustments.append(f"实验{lab.get('number', '')} {lab.get('name', '')}：{old} → {new}学时")
+        lab['hours'] = new
+
+    for adjustment in adjustments:
+        logger.info("实验学时调整 %s", adjustment)
+
+    return labs, adjustments, ok
@@ -0,0 +1,260 @@
+"""本地持久化任务队列与后台工作进程
+
+界面只负责提交任务和查询状态，生成工作由独立的工作进程执行，
+浏览器断开或页面重跑不会丢失进行中的任务。使用方式：
+
+    # 启动4个工作进程
+    python job_queue.py --workers 4
+
+任务保存在 SQLite（默认 jobs.db，可用 JOB_QUEUE_PATH 指定）中，不依赖外部消息队列。
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+# 界面与工作进程共用的队列数据库
+DEFAULT_DB_PATH = os.environ.get("JOB_QUEUE_PATH", "jobs.db")
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+class JobQueue:
+    def __init__(self, db_path=DEFAULT_DB_PATH, max_attempts=3, stale_seconds=3600):
+        """SQLite任务队列
+
+        max_attempts 为单个任务的最大执行次数；运行超过 stale_seconds 仍未结束的任务
+        视为工作进程已退出，重新排队。
+        """
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.stale_seconds = stale_seconds
+        self.init_database()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def init_database(self):
+        """初始化任务表结构"""
+        with self._connect() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER DEFAULT 0,
+                    worker TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_jobs_status
+                ON jobs (status, id)
+            ''')
+
+    def enqueue(self, kind, payload):
+        """提交任务，返回任务ID"""
+        with self._connect() as conn:
+            cursor = conn.execute('''
+                INSERT INTO jobs (kind, payload, status, created_at)
+                VALUES (?, ?, ?, ?)
+            ''', (kind, json.dumps(payload, ensure_ascii=False), JOB_QUEUED, time.time()))
+            return cursor.lastrowid
+
+    def claim(self, worker):
+        """领取最早排队的任务并标记为运行中，没有任务时返回None"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            # BEGIN IMMEDIATE 先取得写锁，保证同一任务只被一个工作进程领取
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('''
+                SELECT id, kind, payload FROM jobs
+                WHERE status = ?
+                ORDER BY id
+                LIMIT 1
+            ''', (JOB_QUEUED,)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            conn.execute('''
+                UPDATE jobs
+                SET status = ?, worker = ?, started_at = ?, attempts = attempts + 1
+                WHERE id = ?
+            ''', (JOB_RUNNING, worker, time.time(), row[0]))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return {'id': row[0], 'kind': row[1], 'payload': json.loads(row[2])}
+
+    def complete(self, job_id, result):
+        """标记任务完成并保存结果"""
+        with self._connect() as conn:
+            conn.execute('''
+                UPDATE jobs SET status = ?, result = ?, error = NULL, finished_at = ?
+                WHERE id = ?
+            ''', (JOB_DONE, json.dumps(result, ensure_ascii=False), time.time(), job_id))
+
+    def fail(self, job_id, error, result=None):
+        """标记任务失败，未达到最大执行次数时重新排队"""
+        with self._connect() as conn:
+            attempts = conn.execute('SELECT attempts FROM jobs WHERE id = ?', (job_id,)).fetchone()[0]
+            status = JOB_QUEUED if attempts < self.max_attempts else JOB_FAILED
+            conn.execute('''
+                UPDATE jobs SET status = ?, error = ?, result = ?, finished_at = ?
+                WHERE id = ?
+            ''', (
+                status, str(error),
+                json.dumps(result, ensure_ascii=False) if result is not None else None,
+                time.time(), job_id
+            ))
+
+    def requeue_stale(self):
+        """把运行超时的任务重新排队，超过最大执行次数的标记为失败"""
+        cutoff = time.time() - self.stale_seconds
+        with self._connect() as conn:
+            conn.execute('''
+                UPDATE jobs SET status = ?, error = '工作进程超时'
+                WHERE status = ? AND started_at < ? AND attempts >= ?
+            ''', (JOB_FAILED, JOB_RUNNING, cutoff, self.max_attempts))
+            cursor = conn.execute('''
+                UPDATE jobs SET status = ?
+                WHERE status = ? AND started_at < ?
+            ''', (JOB_QUEUED, JOB_RUNNING, cutoff))
+            return cursor.rowcount
+
+    def get(self, job_id):
+        """查询任务状态，result 已解析为Python对象"""
+        with self._connect() as conn:
+            row = conn.execute('''
+                SELECT id, kind, status, result, error, attempts, created_at, started_at, finished_at
+                FROM jobs WHERE id = ?
+            ''', (job_id,)).fetchone()
+        if not row:
+            return None
+        return {
+            'id': row[0],
+            'kind': row[1],
+            'status': row[2],
+            'result': json.loads(row[3]) if row[3] else None,
+            'error': row[4],
+            'attempts': row[5],
+            'created_at': row[6],
+            'started_at': row[7],
+            'finished_at': row[8]
+        }
+
+    def counts(self):
+        """各状态的任务数"""
+        with self._connect() as conn:
+            rows = conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return dict(rows)
+
+def run_outline_job(payload):
+    """生成课程大纲，返回 (大纲数据, 失败的阶段)"""
+    from outline_generator import generate_outline
+    from outline_checkpoint import OutlineCheckpointStore
+    from fair_scheduler import request_scope
+    # 使用阶段检查点，任务重试时从失败的阶段继续
+    with request_scope(priority="batch", user=payload.get('user', '')):
+        return generate_outline(
+            payload['basic_info'],
+            checkpoint=OutlineCheckpointStore(),
+            use_cache=payload.get('use_cache', True)
+        )
+
+def run_exam_job(payload):
+    """生成考试内容，返回 (考试内容, 失败原因)；调用出错时异常原样抛出，由任务记录失败原因"""
+    # exam_generator 不依赖 Streamlit，可在后台任务进程中直接导入
+    from exam_generator import generate_exam
+    exam_content = generate_exam(
+        payload['outline_data'],
+        payload['exam_type'],
+        payload.get('chapters'),
+        payload.get('additional_requirements'),
+        payload.get('config'),
+        payload.get('temperature', 0.7),
+        payload.get('use_cache', True),
+        priority="batch",
+        user=payload.get('user', '')
+    )
+    return exam_content, None if exam_content else "未能成功生成内容"
+
+# 任务类型与执行函数，执行函数返回 (结果, 失败原因)
+JOB_HANDLERS = {
+    "outline": run_outline_job,
+    "exam": run_exam_job
+}
+
+def run_worker(db_path=DEFAULT_DB_PATH, poll_interval=1.0, max_jobs=None):
+    """工作进程主循环：领取任务、执行并写回结果
+
+    max_jobs 为处理的任务数上限，None表示一直运行。
+    """
+    from llm import set_usage_recorder
+    from ExamDB import ExamDatabase
+    set_usage_recorder(ExamDatabase().log_llm_call)
+
+    queue = JobQueue(db_path)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        queue.requeue_stale()
+        job = queue.claim(worker)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+
+        logger.info("%s 开始执行任务%d（%s）", worker, job['id'], job['kind'])
+        try:
+            result, error = JOB_HANDLERS[job['kind']](job['payload'])
+        except Exception as e:
+            result, error = None, str(e)
+        if error:
+            logger.error("任务%d失败：%s", job['id'], error)
+            queue.fail(job['id'], error, result)
+        else:
+            logger.info("任务%d完成", job['id'])
+            queue.complete(job['id'], result)
+        processed += 1
+
+def main():
+    parser = argparse.ArgumentParser(description="大纲与考试生成的后台工作进程")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="任务队列数据库路径")
+    parser.add_argument("-w", "--workers", type=int, default=2, help="工作进程数")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="没有任务时的轮询间隔（秒）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(processName)s %(message)s")
+    JobQueue(args.db)
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(args.db, args.poll_interval), name=f"worker-{i + 1}")
+        for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    logger.info("已启动%d个工作进程，队列：%s", len(processes), args.db)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+if __name__ == "__main__":
+    main()
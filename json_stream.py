@@ -0,0 +1,91 @@
+import json
+
+class JsonArrayStreamParser:
+    def __init__(self, key="questions"):
+        """增量JSON解析器
+
+        逐段输入模型流式返回的JSON文本，顶层对象中 key 对应数组的每个元素
+        一旦闭合就立即解析并返回，不必等待整个JSON生成完毕。
+        """
+        self.key = key
+        self.raw = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.last_string = None
+        self.pending_key = None
+        self.array_depth = None
+        self.item_start = None
+        self.finished = False
+        self.items = []
+
+    def feed(self, chunk):
+        """输入一段文本，返回本次新闭合的数组元素列表"""
+        self.raw += chunk
+        text = self.raw
+        completed = []
+
+        for i in range(self.pos, len(text)):
+            c = text[i]
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == '\\':
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+                    if self.depth == 1:
+                        self.last_string = text[self.string_start + 1:i]
+                continue
+
+            if c == '"':
+                self.in_string = True
+                self.string_start = i
+                self._start_item(i)
+            elif c in '{[':
+                if (c == '[' and self.array_depth is None and not self.finished
+                        and self.depth == 1 and self.pending_key == self.key):
+                    self.array_depth = self.depth + 1
+                else:
+                    self._start_item(i)
+                self.depth += 1
+            elif c in '}]':
+                self.depth -= 1
+                if self.array_depth is not None:
+                    if self.depth == self.array_depth and self.item_start is not None:
+                        self._emit(text[self.item_start:i + 1], completed)
+                    elif self.depth == self.array_depth - 1:
+                        if self.item_start is not None:
+                            self._emit(text[self.item_start:i], completed)
+                        self.array_depth = None
+                        self.finished = True
+            elif c == ',':
+                if self.array_depth is not None and self.depth == self.array_depth and self.item_start is not None:
+                    self._emit(text[self.item_start:i], completed)
+            elif c == ':':
+                if self.depth == 1:
+                    self.pending_key = self.last_string
+            elif not c.isspace():
+                self._start_item(i)
+
+        self.pos = len(text)
+        return completed
+
+    def _start_item(self, i):
+        if self.array_depth is not None and self.depth == self.array_depth and self.item_start is None:
+            self.item_start = i
+
+    def _emit(self, raw, completed):
+        self.item_start = None
+        raw = raw.strip()
+        if not raw:
+            return
+        try:
+            item = json.loads(raw)
+        except ValueError:
+            return
+        self.items.append(item)
+        completed.append(item)
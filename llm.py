@@ -0,0 +1,453 @@
+import os
+import json
+import random
+import socket
+import threading
+import time
+import httpx
+from openai import OpenAI, APIConnectionError, APITimeoutError
+from llm_cache import LLMCache
+from rate_limit import TokenBucketLimiter, AdaptiveConcurrencyLimiter
+from fair_scheduler import FairScheduler, current_scope
+import deadline
+
+# 设置LLM_BASE_URL可指向本地模拟服务（见mock_llm_server.py）
+DEFAULT_BASE_URL = os.environ.get("LLM_BASE_URL", "https://api.deepseek.com/beta")
+
+# 连接池与超时配置，可通过环境变量调整
+CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", 10))
+READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", 300))
+MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", 20))
+MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("LLM_MAX_KEEPALIVE_CONNECTIONS", 10))
+KEEPALIVE_EXPIRY = float(os.environ.get("LLM_KEEPALIVE_EXPIRY", 60))
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+# 调用统计的记录函数，由各应用通过 set_usage_recorder 设置
+_usage_recorder = None
+
+# 全局共享的响应缓存，设置 LLM_CACHE_DISABLED=1 可整体关闭
+response_cache = LLMCache(
+    db_path=os.environ.get("LLM_CACHE_PATH", "llm_cache.db"),
+    ttl_seconds=int(os.environ.get("LLM_CACHE_TTL", 7 * 24 * 3600)),
+    max_entries=int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 5000)),
+    enabled=os.environ.get("LLM_CACHE_DISABLED", "0") != "1"
+)
+
+# 全局共享的限流器（每分钟请求数/token数），默认不限制
+EXPECTED_COMPLETION_TOKENS = int(os.environ.get("LLM_EXPECTED_COMPLETION_TOKENS", 4000))
+rate_limiter = TokenBucketLimiter(
+    requests_per_minute=int(os.environ.get("LLM_REQUESTS_PER_MINUTE", 0)),
+    tokens_per_minute=int(os.environ.get("LLM_TOKENS_PER_MINUTE", 0))
+)
+
+# 按接口延迟和429/5xx反馈自动调整的全局并发上限，过载错误按指数退避重试
+MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 4))
+RETRY_BASE_DELAY = float(os.environ.get("LLM_RETRY_BASE_DELAY", 1))
+RETRY_MAX_DELAY = float(os.environ.get("LLM_RETRY_MAX_DELAY", 30))
+# 调度器为交互类请求预留的名额数，批量类请求用满其余名额时自适应上限即可增加
+RESERVED_INTERACTIVE = 1
+adaptive_limiter = AdaptiveConcurrencyLimiter(
+    initial_limit=int(os.environ.get("LLM_ADAPTIVE_INITIAL_CONCURRENCY", 4)),
+    min_limit=int(os.environ.get("LLM_ADAPTIVE_MIN_CONCURRENCY", 1)),
+    max_limit=int(os.environ.get("LLM_ADAPTIVE_MAX_CONCURRENCY", 32)),
+    reserved=RESERVED_INTERACTIVE
+)
+
+# 全局共享的公平调度器：交互类请求（单题替换、页面生成）与批量类请求（多套试卷、后台任务）
+# 分别限制并发，同类请求在部门和用户之间公平分配；调度信息通过 fair_scheduler.request_scope 设置。
+# 合计并发上限即自适应限流器的当前上限，由调度器按类别分配，不再另设一道关卡
+TOTAL_CONCURRENCY = int(os.environ.get("LLM_TOTAL_CONCURRENCY", 0)) or None
+scheduler = FairScheduler(
+    class_limits={
+        "interactive": int(os.environ.get("LLM_INTERACTIVE_CONCURRENCY", 8)),
+        "batch": int(os.environ.get("LLM_BATCH_CONCURRENCY", 4))
+    },
+    total_limit=lambda: min(TOTAL_CONCURRENCY or adaptive_limiter.max_limit, adaptive_limiter.current_limit()),
+    reserved=RESERVED_INTERACTIVE
+)
+
+# 相同请求的合并：进程内共享同一次调用，跨进程通过缓存库中的登记等待结果
+SINGLE_FLIGHT_TIMEOUT = float(os.environ.get("LLM_SINGLE_FLIGHT_TIMEOUT", 600))
+SINGLE_FLIGHT_POLL_INTERVAL = float(os.environ.get("LLM_SINGLE_FLIGHT_POLL_INTERVAL", 0.5))
+_flights = {}
+_flights_lock = threading.Lock()
+_flight_owner = f"{socket.gethostname()}:{os.getpid()}"
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.content = None
+
+def estimate_tokens(text):
+    """粗略估算文本的token数：中文字符约0.6个token，其他字符约0.3个token"""
+    cjk = sum(1 for c in text if '\u4e00' <= c <= '\u9fff')
+    return int(cjk * 0.6 + (len(text) - cjk) * 0.3) + 1
+
+def _estimate_request_tokens(messages):
+    return sum(estimate_tokens(m.get("content") or "") for m in messages) + EXPECTED_COMPLETION_TOKENS
+
+def _timeout():
+    return httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+
+def _limits():
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY
+    )
+
+def get_client(api_key, base_url=DEFAULT_BASE_URL):
+    """获取进程内共享的OpenAI客户端，复用keep-alive连接池"""
+    key = (api_key, base_url)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            # 重试由 _call_with_retries 统一处理，以便并发上限感知到每次过载
+            client = OpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                timeout=_timeout(),
+                max_retries=0,
+                http_client=httpx.Client(timeout=_timeout(), limits=_limits())
+            )
+            _clients[key] = client
+        return client
+
+def close_clients():
+    """关闭所有共享的客户端"""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+def _request_kwargs(model, messages, temperature, response_format):
+    kwargs = {"model": model, "messages": messages}
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    if response_format is not None:
+        kwargs["response_format"] = response_format
+    return kwargs
+
+# 超时发生时距截止时间不超过该秒数，视为请求超时被截止时间缩短所致
+DEADLINE_TIMEOUT_MARGIN = 0.5
+
+def _deadline_timeout():
+    """在截止时间范围内调用时，单次请求的超时不超过剩余时间"""
+    left = deadline.remaining()
+    if left is None:
+        return {}
+    left = max(left, 0.1)
+    return {"timeout": httpx.Timeout(min(READ_TIMEOUT, left), connect=min(CONNECT_TIMEOUT, left))}
+
+def _store(key, model, content, finish_reason, response_format):
+    """只缓存完整且格式正确的结果，避免把截断或损坏的JSON长期保留"""
+    if not content or finish_reason not in (None, "stop"):
+        return
+    try:
+        if response_format and response_format.get("type") == "json_object":
+            json.loads(content)
+        response_cache.set(key, model, content)
+    except ValueError:
+        pass
+
+def _is_overload(error):
+    """429、5xx、超时和连接错误视为接口过载，可以重试"""
+    status = getattr(error, "status_code", None)
+    return status == 429 or (status is not None and status >= 500) or isinstance(error, APIConnectionError)
+
+def _deadline_cut(error):
+    """超时是否由调用方的截止时间造成：这类超时不代表接口过载，不调整并发上限也不重试"""
+    if not isinstance(error, (APITimeoutError, httpx.TimeoutException)):
+        return False
+    left = deadline.remaining()
+    return left is not None and left <= DEADLINE_TIMEOUT_MARGIN
+
+def _retry_delay(error, attempt):
+    """重试前的等待秒数：服务端给出Retry-After时以其为准，否则为带随机抖动的指数退避"""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(RETRY_MAX_DELAY, float(retry_after)) + random.uniform(0, RETRY_BASE_DELAY)
+        except ValueError:
+            pass
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+def _acquire_rate(messages):
+    """等待每分钟请求数/token数额度，等待期间响应超时和取消"""
+    rate_limiter.acquire(_estimate_request_tokens(messages), check=deadline.check)
+
+def _call_with_retries(create, state, messages):
+    """调用 create()，过载错误按退避重试；须在 scheduler.slot 内调用
+
+    首次调用的限流额度由调用方在占用并发名额之前取得，重试时在这里重新取得。
+    并发名额由调度器按自适应上限分配，这里只向限流器登记每次尝试并反馈结果。
+    成功时返回 (结果, 本次请求发出的时间)，限流等待不计入延迟；调用方须调用
+    adaptive_limiter.release；state["retries"] 记录重试次数。
+    """
+    attempt = 0
+    while True:
+        deadline.check()
+        if attempt:
+            _acquire_rate(messages)
+        adaptive_limiter.enter()
+        started = time.perf_counter()
+        try:
+            return create(), started
+        except Exception as e:
+            if _deadline_cut(e):
+                adaptive_limiter.release("error")
+                raise deadline.DeadlineExceeded("超过截止时间") from e
+            overloaded = _is_overload(e)
+            adaptive_limiter.release("overload" if overloaded else "error")
+            if not overloaded or attempt >= MAX_RETRIES:
+                raise
+            delay = _retry_delay(e, attempt)
+            attempt += 1
+            state["retries"] = attempt
+            adaptive_limiter.record_retry()
+            # 等待期间被取消或剩余时间不足时直接放弃
+            deadline.sleep(delay)
+
+def llm_metrics():
+    """自适应限流器、公平调度器和响应缓存的当前状态"""
+    return {
+        "adaptive": adaptive_limiter.metrics(),
+        "scheduler": scheduler.stats(),
+        "cache": response_cache.stats()
+    }
+
+def _begin_flight(key):
+    """开始一次可合并的请求，返回 (共享结果, flight)
+
+    共享结果不为None时直接使用（来自同时进行的相同请求）；否则若 flight 不为None，
+    调用方负责实际调用，结束后必须调用 _end_flight。相同请求失败时两者都为None，
+    调用方自行调用。
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        while not flight.done.wait(SINGLE_FLIGHT_POLL_INTERVAL):
+            deadline.check()
+        return flight.content, None
+
+    # 其他进程正在执行相同请求时，等待其结果写入缓存
+    give_up_at = time.monotonic() + SINGLE_FLIGHT_TIMEOUT
+    while not response_cache.acquire_lease(key, _flight_owner, SINGLE_FLIGHT_TIMEOUT):
+        content = response_cache.peek(key)
+        if content is not None or time.monotonic() > give_up_at:
+            _end_flight(key, flight, content, release=False)
+            return content, None
+        try:
+            deadline.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+        except deadline.Cancelled:
+            _end_flight(key, flight, None, release=False)
+            raise
+
+    content = response_cache.peek(key)
+    if content is not None:
+        _end_flight(key, flight, content)
+        return content, None
+    return None, flight
+
+def _end_flight(key, flight, content, release=True):
+    """结束请求并把结果交给等待的相同请求（content为None表示失败）"""
+    if release:
+        response_cache.release_lease(key, _flight_owner)
+    flight.content = content
+    with _flights_lock:
+        _flights.pop(key, None)
+    flight.done.set()
+
+def set_usage_recorder(recorder):
+    """设置调用统计的记录函数，recorder(record) 接收一次调用的统计字典"""
+    global _usage_recorder
+    _usage_recorder = recorder
+
+def _usage_fields(usage):
+    """从接口返回的usage中提取token统计（兼容DeepSeek与OpenAI的缓存字段）"""
+    if usage is None:
+        return {}
+    cached = getattr(usage, "prompt_cache_hit_tokens", None)
+    if cached is None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) if details else None
+    return {
+        "prompt_tokens": usage.prompt_tokens or 0,
+        "completion_tokens": usage.completion_tokens or 0,
+        "cached_tokens": cached or 0
+    }
+
+def _record(stage, model, metadata, start, result_status, cache_hit=False, finish_reason=None, usage=None, retries=0):
+    if _usage_recorder is None:
+        return
+    record = {
+        "stage": stage,
+        "model": model,
+        "params": metadata,
+        "result_status": result_status,
+        "cache_hit": cache_hit,
+        "finish_reason": finish_reason,
+        "latency_ms": int((time.perf_counter() - start) * 1000),
+        "retries": retries
+    }
+    record.update(_usage_fields(usage))
+    try:
+        _usage_recorder(record)
+    except Exception:
+        # 统计失败不能影响生成结果
+        pass
+
+def chat_completion(client, messages, model="deepseek-chat", temperature=None, response_format=None, use_cache=True, stage=None, metadata=None):
+    """调用chat completion接口并返回消息内容，相同请求优先读取缓存
+
+    stage 和 metadata 用于调用统计，记录到 set_usage_recorder 设置的记录函数。
+    """
+    start = time.perf_counter()
+    key = LLMCache.make_key(model, messages, temperature, response_format)
+
+    flight = None
+    if use_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            _record(stage, model, metadata, start, "success", cache_hit=True, finish_reason="stop")
+            return cached
+
+        # 相同请求正在进行时共享其结果
+        shared, flight = _begin_flight(key)
+        if shared is not None:
+            _record(stage, model, metadata, start, "coalesced", cache_hit=True, finish_reason="stop")
+            return shared
+
+    def create():
+        return client.chat.completions.create(
+            **_request_kwargs(model, messages, temperature, response_format),
+            **_deadline_timeout()
+        )
+
+    content = None
+    state = {"retries": 0}
+    priority, department, user = current_scope()
+    try:
+        try:
+            # 先等限流额度再排队占用并发名额，限流等待不占名额
+            _acquire_rate(messages)
+            with scheduler.slot(priority, department, user, check=deadline.check):
+                response, started = _call_with_retries(create, state, messages)
+        except deadline.DeadlineExceeded:
+            # 超时时退回到缓存中已有的结果（例如跳过缓存重新生成的请求）
+            content = response_cache.peek(key)
+            _record(stage, model, metadata, start, "fallback" if content else "timeout", retries=state["retries"])
+            if content is None:
+                raise
+            return content
+        except Exception:
+            _record(stage, model, metadata, start, "error", retries=state["retries"])
+            raise
+        # 延迟随输出长度变化，按每千个输出token的耗时反馈给限流器
+        completion_tokens = getattr(response.usage, "completion_tokens", None) or 0
+        adaptive_limiter.release(
+            "success",
+            latency=(time.perf_counter() - started) * 1000 / max(completion_tokens, 100),
+            kind="per_1k_tokens"
+        )
+        choice = response.choices[0]
+        content = choice.message.content
+        _record(stage, model, metadata, start, "success", finish_reason=choice.finish_reason, usage=response.usage, retries=state["retries"])
+
+        if use_cache:
+            _store(key, model, content, choice.finish_reason, response_format)
+    finally:
+        if flight is not None:
+            _end_flight(key, flight, content)
+
+    return content
+
+def stream_chat_completion(client, messages, model="deepseek-chat", temperature=None, response_format=None, use_cache=True, stage=None, metadata=None):
+    """以stream=True调用chat completion接口，逐段返回生成的文本
+
+    命中缓存时一次性返回完整内容；流结束后完整结果写入缓存。
+    """
+    start = time.perf_counter()
+    key = LLMCache.make_key(model, messages, temperature, response_format)
+
+    flight = None
+    if use_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            _record(stage, model, metadata, start, "success", cache_hit=True, finish_reason="stop")
+            yield cached
+            return
+
+        # 相同请求正在进行时等待其完成，一次性返回完整内容
+        shared, flight = _begin_flight(key)
+        if shared is not None:
+            _record(stage, model, metadata, start, "coalesced", cache_hit=True, finish_reason="stop")
+            yield shared
+            return
+
+    def create():
+        return client.chat.completions.create(
+            stream=True,
+            stream_options={"include_usage": True},
+            **_request_kwargs(model, messages, temperature, response_format),
+            **_deadline_timeout()
+        )
+
+    priority, department, user = current_scope()
+    parts = []
+    finish_reason = None
+    usage = None
+    completed = False
+    state = {"retries": 0}
+    try:
+        # 流式响应在整个读取过程中占用并发名额；开始返回内容后出错不再重试
+        _acquire_rate(messages)
+        with scheduler.slot(priority, department, user, check=deadline.check):
+            stream, started = _call_with_retries(create, state, messages)
+            first_token = None
+            outcome = "error"
+            try:
+                for chunk in stream:
+                    # 每个分块检查一次超时和取消，停止时关闭连接
+                    deadline.check()
+                    if first_token is None:
+                        first_token = time.perf_counter() - started
+                    # 开启include_usage后，最后一个chunk只携带usage
+                    if getattr(chunk, "usage", None):
+                        usage = chunk.usage
+                    if not chunk.choices:
+                        continue
+                    choice = chunk.choices[0]
+                    if choice.delta and choice.delta.content:
+                        parts.append(choice.delta.content)
+                        yield choice.delta.content
+                    if choice.finish_reason:
+                        finish_reason = choice.finish_reason
+                outcome = "success"
+            except Exception as e:
+                if _deadline_cut(e):
+                    outcome = "error"
+                    raise deadline.DeadlineExceeded("超过截止时间") from e
+                outcome = "overload" if _is_overload(e) else "error"
+                raise
+            finally:
+                stream.close()
+                # 首个分块的等待时间反映接口的排队情况
+                adaptive_limiter.release(outcome, latency=first_token, kind="first_token")
+        completed = True
+    except Exception:
+        _record(stage, model, metadata, start, "error", usage=usage, retries=state["retries"])
+        raise
+    finally:
+        if use_cache and completed:
+            _store(key, model, "".join(parts), finish_reason, response_format)
+        if flight is not None:
+            _end_flight(key, flight, ("".join(parts) or None) if completed else None)
+    _record(stage, model, metadata, start, "success", finish_reason=finish_reason, usage=usage, retries=state["retries"])
@@ -0,0 +1,221 @@
+import sqlite3
+import json
+import hashlib
+import logging
+import threading
+import time
+from db_pool import get_pool
+
+logger = logging.getLogger(__name__)
+
+class LLMCache:
+    def __init__(self, db_path="llm_cache.db", ttl_seconds=7 * 24 * 3600, max_entries=5000, enabled=True):
+        """初始化大模型响应缓存
+
+        以 model、messages、temperature、response_format 的规范化哈希为键，
+        在本地 SQLite 中保存 chat completion 的返回内容。连接取自 db_pool（WAL 模式、带忙等待），
+        缓存只是优化：读写缓存出错时记录日志，按未命中或跳过写入处理，不影响模型调用。
+        """
+        self.db_path = db_path
+        self._pool = get_pool(db_path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.init_database()
+
+    def init_database(self):
+        """初始化缓存表结构"""
+        with self._pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    cache_key TEXT PRIMARY KEY,
+                    model TEXT,
+                    content TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL,
+                    hit_count INTEGER DEFAULT 0
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_responses_last_accessed
+                ON responses (last_accessed)
+            ''')
+            # 正在执行的请求，供多个进程合并相同的并发请求
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS inflight (
+                    cache_key TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+            conn.commit()
+
+    @staticmethod
+    def make_key(model, messages, temperature=None, response_format=None):
+        """生成请求的规范化哈希键"""
+        payload = json.dumps({
+            'model': model,
+            'messages': messages,
+            'temperature': temperature,
+            'response_format': response_format
+        }, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """读取缓存，未命中、已过期或读取出错时返回None"""
+        if not self.enabled:
+            return None
+
+        try:
+            row = self._get(key)
+        except sqlite3.Error as e:
+            logger.warning("读取大模型响应缓存失败，按未命中处理：%s", e)
+            row = None
+
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        return row[0] if row else None
+
+    def _get(self, key):
+        now = time.time()
+        with self._pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'SELECT content, created_at FROM responses WHERE cache_key = ?',
+                (key,)
+            )
+            row = cursor.fetchone()
+
+            if row and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                cursor.execute('DELETE FROM responses WHERE cache_key = ?', (key,))
+                row = None
+
+            if row:
+                cursor.execute('''
+                    UPDATE responses
+                    SET last_accessed = ?, hit_count = hit_count + 1
+                    WHERE cache_key = ?
+                ''', (now, key))
+        return row
+
+    def peek(self, key):
+        """读取缓存内容，不计入命中统计也不更新访问时间；读取出错时返回None"""
+        if not self.enabled:
+            return None
+        try:
+            with self._pool.connection() as conn:
+                row = conn.execute(
+                    'SELECT content, created_at FROM responses WHERE cache_key = ?',
+                    (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("读取大模型响应缓存失败：%s", e)
+            return None
+        if not row or (self.ttl_seconds and time.time() - row[1] > self.ttl_seconds):
+            return None
+        return row[0]
+
+    def acquire_lease(self, key, owner, ttl_seconds=600):
+        """登记正在执行该请求，其他进程已登记且未过期时返回False
+
+        登记出错时返回True：只在进程内合并相同请求，照常发起调用。
+        """
+        if not self.enabled:
+            return True
+        now = time.time()
+        try:
+            with self._pool.connection() as conn:
+                conn.execute(
+                    'DELETE FROM inflight WHERE cache_key = ? AND expires_at < ?',
+                    (key, now)
+                )
+                cursor = conn.execute('''
+                    INSERT OR IGNORE INTO inflight (cache_key, owner, expires_at)
+                    VALUES (?, ?, ?)
+                ''', (key, owner, now + ttl_seconds))
+                return cursor.rowcount == 1
+        except sqlite3.Error as e:
+            logger.warning("登记进行中的请求失败，不再跨进程合并：%s", e)
+            return True
+
+    def release_lease(self, key, owner):
+        """结束登记；出错时登记在过期后自动失效"""
+        if not self.enabled:
+            return
+        try:
+            with self._pool.connection() as conn:
+                conn.execute(
+                    'DELETE FROM inflight WHERE cache_key = ? AND owner = ?',
+                    (key, owner)
+                )
+        except sqlite3.Error as e:
+            logger.warning("结束进行中请求的登记失败：%s", e)
+
+    def set(self, key, model, content):
+        """写入缓存，写入出错时跳过"""
+        if not self.enabled:
+            return
+
+        now = time.time()
+        try:
+            with self._pool.connection() as conn:
+                conn.execute('''
+                    INSERT OR REPLACE INTO responses (
+                        cache_key, model, content, created_at, last_accessed, hit_count
+                    ) VALUES (?, ?, ?, ?, ?, 0)
+                ''', (key, model, content, now, now))
+            self.evict()
+        except sqlite3.Error as e:
+            logger.warning("写入大模型响应缓存失败，已跳过：%s", e)
+
+    def evict(self):
+        """清理过期条目，并按最近访问时间淘汰超出容量的条目"""
+        with self._pool.connection() as conn:
+            cursor = conn.cursor()
+            if self.ttl_seconds:
+                cursor.execute(
+                    'DELETE FROM responses WHERE created_at < ?',
+                    (time.time() - self.ttl_seconds,)
+                )
+            if self.max_entries:
+                cursor.execute('''
+                    DELETE FROM responses WHERE cache_key IN (
+                        SELECT cache_key FROM responses
+                        ORDER BY last_accessed DESC
+                        LIMIT -1 OFFSET ?
+                    )
+                ''', (self.max_entries,))
+
+    def invalidate(self, key):
+        """删除指定缓存条目"""
+        with self._pool.connection() as conn:
+            conn.execute('DELETE FROM responses WHERE cache_key = ?', (key,))
+
+    def clear(self):
+        """清空缓存"""
+        with self._pool.connection() as conn:
+            conn.execute('DELETE FROM responses')
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """获取缓存统计信息"""
+        with self._pool.connection() as conn:
+            entries = conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'entries': entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
@@ -0,0 +1,88 @@
+import sqlite3
+import json
+import threading
+import time
+
+class MajorRequirementStore:
+    def __init__(self, db_path="major_requirements.db"):
+        """专业级毕业要求指标点库
+
+        毕业要求指标点只取决于开课部门和专业，按 (department, major) 保存一份，
+        同一专业的所有课程大纲共用，界面和批量生成共享同一数据库。
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.init_database()
+
+    def init_database(self):
+        """初始化指标点表结构"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS major_requirements (
+                    department TEXT NOT NULL,
+                    major TEXT NOT NULL,
+                    requirements TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (department, major)
+                )
+            ''')
+
+    def get(self, department, major):
+        """读取专业的毕业要求指标点，不存在时返回None"""
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute(
+                'SELECT requirements FROM major_requirements WHERE department = ? AND major = ?',
+                (department, major)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, department, major, requirements, source="edited"):
+        """保存专业的毕业要求指标点，source 为 generated（模型生成）或 edited（人工修改）"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO major_requirements (
+                    department, major, requirements, source, updated_at
+                ) VALUES (?, ?, ?, ?, ?)
+            ''', (department, major, json.dumps(requirements, ensure_ascii=False), source, time.time()))
+
+    def invalidate(self, department, major):
+        """删除专业的指标点，下次生成时重新调用模型"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(
+                'DELETE FROM major_requirements WHERE department = ? AND major = ?',
+                (department, major)
+            )
+
+    def list_majors(self):
+        """列出已保存的专业"""
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute('''
+                SELECT department, major, source, updated_at
+                FROM major_requirements
+                ORDER BY department, major
+            ''').fetchall()
+        return [
+            {'department': row[0], 'major': row[1], 'source': row[2], 'updated_at': row[3]}
+            for row in rows
+        ]
+
+    def get_or_create(self, department, major, generate):
+        """读取专业的指标点，不存在时调用 generate() 生成并保存
+
+        同一专业的并发请求只生成一次，其余等待并复用结果；生成失败（返回None）时不保存。
+        """
+        requirements = self.get(department, major)
+        if requirements is not None:
+            return requirements
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault((department, major), threading.Lock())
+        with key_lock:
+            requirements = self.get(department, major)
+            if requirements is None:
+                requirements = generate()
+                if requirements is not None:
+                    self.set(department, major, requirements, source="generated")
+        return requirements
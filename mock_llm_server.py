@@ -0,0 +1,236 @@
+"""本地OpenAI兼容的模拟服务，用于离线运行和压测生成流程
+
+录制模式把真实API的请求/响应保存为fixture，回放模式按请求内容返回录制的响应，
+并可注入延迟和错误。使用方式：
+
+    # 录制
+    python mock_llm_server.py --record --upstream https://api.deepseek.com/beta --api-key sk-xxx
+    # 回放，平均延迟2秒，10%的请求返回429
+    python mock_llm_server.py --latency 2 --error-rate 0.1 --error-status 429
+
+然后以 LLM_BASE_URL=http://127.0.0.1:8001 DEEPSEEK_API_KEY=dummy 启动应用。
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import urllib.request
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from llm_cache import LLMCache
+
+class FixtureStore:
+    def __init__(self, fixtures_dir="fixtures"):
+        """以请求的规范化哈希为文件名保存录制的请求/响应"""
+        self.fixtures_dir = fixtures_dir
+        os.makedirs(fixtures_dir, exist_ok=True)
+
+    @staticmethod
+    def key(request):
+        return LLMCache.make_key(
+            request.get('model'),
+            request.get('messages'),
+            request.get('temperature'),
+            request.get('response_format')
+        )
+
+    def path(self, request):
+        return os.path.join(self.fixtures_dir, f"{self.key(request)}.json")
+
+    def load(self, request):
+        try:
+            with open(self.path(request), 'r', encoding='utf-8') as f:
+                return json.load(f)['response']
+        except FileNotFoundError:
+            return None
+
+    def save(self, request, response):
+        with open(self.path(request), 'w', encoding='utf-8') as f:
+            json.dump({'request': request, 'response': response}, f, ensure_ascii=False, indent=2)
+
+class MockLLMServer:
+    def __init__(self, host="127.0.0.1", port=8001, fixtures_dir="fixtures", record=False,
+                 upstream=None, api_key=None, latency=0.0, latency_jitter=0.0,
+                 error_rate=0.0, error_status=500, stream_chunk_size=20, seed=None):
+        """OpenAI兼容的模拟服务
+
+        latency/latency_jitter 控制每个请求的延迟（秒），error_rate 为注入错误的概率，
+        error_status 为注入错误时返回的HTTP状态码（如429、500、503）。
+        """
+        self.store = FixtureStore(fixtures_dir)
+        self.record = record
+        self.upstream = upstream.rstrip('/') if upstream else None
+        self.api_key = api_key
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.stream_chunk_size = stream_chunk_size
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                server.handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """在后台线程中启动服务"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def _fetch_upstream(self, request, authorization):
+        """录制模式下向真实API发送非流式请求"""
+        body = dict(request)
+        body.pop('stream', None)
+        body.pop('stream_options', None)
+        req = urllib.request.Request(
+            f"{self.upstream}/chat/completions",
+            data=json.dumps(body, ensure_ascii=False).encode('utf-8'),
+            headers={
+                'Content-Type': 'application/json',
+                'Authorization': f"Bearer {self.api_key}" if self.api_key else authorization
+            }
+        )
+        with urllib.request.urlopen(req, timeout=600) as resp:
+            return json.loads(resp.read().decode('utf-8'))
+
+    def handle(self, handler):
+        if not handler.path.rstrip('/').endswith('/chat/completions'):
+            return self._send_error(handler, 404, "not_found", f"未知路径：{handler.path}")
+
+        length = int(handler.headers.get('Content-Length', 0))
+        request = json.loads(handler.rfile.read(length).decode('utf-8'))
+
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self.random.uniform(-self.latency_jitter, self.latency_jitter))
+            inject_error = self.random.random() < self.error_rate
+            if inject_error:
+                self.errors += 1
+
+        if delay:
+            time.sleep(delay)
+        if inject_error:
+            return self._send_error(handler, self.error_status, "injected_error", "模拟服务注入的错误")
+
+        response = self.store.load(request)
+        if response is None:
+            if not (self.record and self.upstream):
+                return self._send_error(handler, 404, "fixture_not_found", f"未找到录制的响应：{self.store.key(request)}")
+            try:
+                response = self._fetch_upstream(request, handler.headers.get('Authorization', ''))
+            except urllib.error.HTTPError as e:
+                return self._send_error(handler, e.code, "upstream_error", e.read().decode('utf-8', 'replace'))
+            self.store.save(request, response)
+
+        if request.get('stream'):
+            include_usage = (request.get('stream_options') or {}).get('include_usage', False)
+            return self._send_stream(handler, response, include_usage)
+        return self._send_json(handler, 200, response)
+
+    def _send_json(self, handler, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        if status == 429:
+            handler.send_header('Retry-After', '1')
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _send_error(self, handler, status, code, message):
+        self._send_json(handler, status, {'error': {'message': message, 'type': code, 'code': code}})
+
+    def _send_stream(self, handler, response, include_usage):
+        """把完整响应拆成SSE分块返回，模拟stream=True"""
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'text/event-stream')
+        handler.send_header('Cache-Control', 'no-cache')
+        handler.end_headers()
+
+        choice = response['choices'][0]
+        content = choice['message'].get('content') or ''
+        base = {
+            'id': response.get('id', 'mock'),
+            'object': 'chat.completion.chunk',
+            'created': response.get('created', int(time.time())),
+            'model': response.get('model', 'mock')
+        }
+
+        def send(payload):
+            handler.wfile.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode('utf-8'))
+            handler.wfile.flush()
+
+        for i in range(0, len(content), self.stream_chunk_size):
+            send(dict(base, choices=[{
+                'index': 0,
+                'delta': {'content': content[i:i + self.stream_chunk_size]},
+                'finish_reason': None
+            }]))
+        send(dict(base, choices=[{'index': 0, 'delta': {}, 'finish_reason': choice.get('finish_reason', 'stop')}]))
+        if include_usage and response.get('usage'):
+            send(dict(base, choices=[], usage=response['usage']))
+        handler.wfile.write(b"data: [DONE]\n\n")
+        handler.wfile.flush()
+
+def main():
+    parser = argparse.ArgumentParser(description="本地OpenAI兼容的模拟服务（录制/回放）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--fixtures", default="fixtures", help="fixture保存目录")
+    parser.add_argument("--record", action="store_true", help="未录制的请求转发到上游并保存")
+    parser.add_argument("--upstream", default="https://api.deepseek.com/beta", help="录制模式的上游API地址")
+    parser.add_argument("--api-key", default=os.environ.get("DEEPSEEK_API_KEY"), help="录制模式使用的API Key")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的平均延迟（秒）")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="延迟的随机波动范围（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="注入错误的概率")
+    parser.add_argument("--error-status", type=int, default=500, help="注入错误的HTTP状态码")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子，便于复现")
+    args = parser.parse_args()
+
+    server = MockLLMServer(
+        host=args.host,
+        port=args.port,
+        fixtures_dir=args.fixtures,
+        record=args.record,
+        upstream=args.upstream,
+        api_key=args.api_key,
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed
+    )
+    print(f"模拟服务已启动：{server.url}（{'录制' if args.record else '回放'}模式）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import sqlite3
+import json
+import hashlib
+import time
+import deadline
+from pipeline import Stage
+
+class OutlineCheckpointStore:
+    def __init__(self, db_path="outline_checkpoints.db"):
+        """大纲生成的阶段检查点
+
+        每个阶段成功后把输出按 课程代码+阶段名 保存到本地 SQLite，并记录输入哈希；
+        重新运行时输入哈希一致的阶段直接读取检查点，只重做缺失或输入已变化的阶段。
+        """
+        self.db_path = db_path
+        self.init_database()
+
+    def init_database(self):
+        """初始化检查点表结构"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    course_code TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    input_hash TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (course_code, stage)
+                )
+            ''')
+
+    @staticmethod
+    def input_hash(stage, basic_info, inputs):
+        """阶段输入的规范化哈希：课程基本信息与上游阶段的输出共同决定"""
+        payload = json.dumps({
+            'stage': stage,
+            'basic_info': basic_info,
+            'inputs': inputs
+        }, ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def load(self, course_code, stage, input_hash):
+        """读取检查点，不存在、输入已变化、内容损坏或为空时返回None"""
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute(
+                'SELECT input_hash, value FROM checkpoints WHERE course_code = ? AND stage = ?',
+                (course_code, stage)
+            ).fetchone()
+        if not row or row[0] != input_hash:
+            return None
+        try:
+            # 空结果（如出错时返回的[]）视为失败，不能用于恢复
+            return json.loads(row[1]) or None
+        except ValueError:
+            return None
+
+    def load_last(self, course_code, stage):
+        """读取该阶段最近一次成功的输出，不论输入是否变化"""
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute(
+                'SELECT value FROM checkpoints WHERE course_code = ? AND stage = ?',
+                (course_code, stage)
+            ).fetchone()
+        try:
+            return (json.loads(row[0]) or None) if row else None
+        except ValueError:
+            return None
+
+    def save(self, course_code, stage, input_hash, value):
+        """保存阶段输出；None或空结果（部分生成函数出错时返回[]）表示失败，不保存"""
+        if not value:
+            return
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO checkpoints (
+                    course_code, stage, input_hash, value, created_at
+                ) VALUES (?, ?, ?, ?, ?)
+            ''', (course_code, stage, input_hash, json.dumps(value, ensure_ascii=False), time.time()))
+
+    def stages(self, course_code):
+        """列出课程已保存检查点的阶段名"""
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute(
+                'SELECT stage FROM checkpoints WHERE course_code = ?', (course_code,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def clear(self, course_code=None):
+        """删除指定课程（不指定时为全部课程）的检查点"""
+        with sqlite3.connect(self.db_path) as conn:
+            if course_code is None:
+                conn.execute('DELETE FROM checkpoints')
+            else:
+                conn.execute('DELETE FROM checkpoints WHERE course_code = ?', (course_code,))
+
+    def wrap_stages(self, stages, basic_info, on_restore=None, skip=(), on_fallback=None):
+        """为各阶段加上检查点：输入未变化时直接返回保存的输出，否则执行并保存结果
+
+        on_restore(name) 在某阶段从检查点恢复时调用（在工作线程中）；
+        skip 中的阶段不加检查点，每次照常执行。
+        阶段因超时没有结果时，退回到该阶段最近一次成功的输出，并调用 on_fallback(name)。
+        """
+        course_code = basic_info['course_code']
+
+        def checkpointed(stage):
+            def func(**inputs):
+                key = self.input_hash(stage.name, basic_info, inputs)
+                value = self.load(course_code, stage.name, key)
+                if value is not None:
+                    if on_restore:
+                        on_restore(stage.name)
+                    return value
+                try:
+                    value = stage.func(**inputs)
+                except deadline.DeadlineExceeded:
+                    value = None
+                if not value and deadline.missed():
+                    value = self.load_last(course_code, stage.name)
+                    if value is not None and on_fallback:
+                        on_fallback(stage.name)
+                    return value
+                self.save(course_code, stage.name, key, value)
+                return value
+            return func
+
+        return [
+            s if s.name in skip else Stage(s.name, checkpointed(s), s.inputs, s.optional)
+            for s in stages
+        ]
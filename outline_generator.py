@@ -0,0 +1,1642 @@
+import os
+import csv
+import json
+import logging
+import argparse
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from docxtpl import DocxTemplate
+from llm import chat_completion, get_client
+from pipeline import Stage, run_stages
+from hours_rebalance import rebalance_schedule_hours, rebalance_lab_hours
+from outline_checkpoint import OutlineCheckpointStore
+from major_store import MajorRequirementStore
+from fair_scheduler import request_scope
+from deadline import deadline_scope
+
+logger = logging.getLogger(__name__)
+
+# API Key与消息输出函数，界面和命令行分别通过 configure 设置
+_api_key = os.environ.get("DEEPSEEK_API_KEY", "")
+_reporter = None
+# 在 log_reports 范围内生成时提示只写入日志（如没有页面上下文的后台线程）
+_log_only = contextvars.ContextVar("outline_log_only", default=False)
+
+# 专业级毕业要求指标点库，同一专业的课程共用一份指标点
+major_requirements = MajorRequirementStore(os.environ.get("MAJOR_REQUIREMENTS_PATH", "major_requirements.db"))
+
+def configure(api_key=None, reporter=None):
+    """设置生成时使用的API Key和消息输出函数
+
+    reporter(level, message) 接收生成过程中的提示，level 为 error、warning 或 info；
+    未设置时写入日志。
+    """
+    global _api_key, _reporter
+    if api_key is not None:
+        _api_key = api_key
+    if reporter is not None:
+        _reporter = reporter
+
+def _client():
+    return get_client(_api_key)
+
+@contextmanager
+def log_reports():
+    """在此范围内生成时提示写入日志而不交给 configure 设置的输出函数"""
+    token = _log_only.set(True)
+    try:
+        yield
+    finally:
+        _log_only.reset(token)
+
+def _report(level, message):
+    if _reporter is not None and not _log_only.get():
+        _reporter(level, message)
+    else:
+        getattr(logger, level)(message)
+
+def generate_aacsb_goals(course_name, course_type, department, major, graduation_requirements, extra_info, use_cache=True):
+    system_prompt = """
+    你是一个AACSB认证专家，请为给定的课程生成合适的学习目标。
+    
+    请以JSON格式输出学习目标，格式如下：
+    {
+        "goals": [
+            "CG1 专业知识-L2 系统掌握核心理论与方法",
+            "CG2 实践能力-L2 能够应用专业工具解决问题",
+            "CG3 创新素养-L1 具备基本的创新意识和团队协作能力"
+        ]
+    }
+    """
+    
+    user_prompt = f"""
+    课程名称：{course_name}
+    课程性质：{course_type}
+    开课部门：{department}
+    适用专业：{major}
+    
+    毕业要求指标点：
+    知识类：
+    {chr(10).join([f"- {x}" for x in graduation_requirements['knowledge']])}
+    能力类：
+    {chr(10).join([f"- {x}" for x in graduation_requirements['ability']])}
+    素养类：
+    {chr(10).join([f"- {x}" for x in graduation_requirements['quality']])}
+    
+    额外信息：{extra_info}
+    
+    请基于以上信息生成AACSB学习目标，要求：
+    1. 目标数量和分布：
+       - 总数必须为3个目标（不多不少）
+       - 必须包含：知识类指标点、能力类指标点、素养类指标点各1个
+       - CG1、CG2、CG3序编号
+       - CG1必须是知识型，CG2必须是能力型，CG3必须是素养型
+       - 必须与毕业要求指标点相对应
+    
+    2. 能力水平标注规则：
+       L0（了解/知道）：
+       - 适用于基础概念的认知
+       - 用于通识类课程
+       - 动词：识别、列举、描述
+       
+       L1（理解/掌握）：
+       - 适用于专业基础知识
+       - 用于专业基础课程
+       - 动词：解释、总结、举例
+       
+       L2（应用/熟练）：
+       - 适用于专业核心能力
+       - 用于专业必修课程
+       - 动词：应用、实施、操作
+       
+       L3（分析/精通）：
+       - 适用于综合分析能力
+       - 用于高级专业课程
+       - 动词：分析、评估、设计
+       
+       L4（创新/引领）：
+       - 适用于创新创造能力
+       - 用于研究型课程
+       - 动词：创造、优化、革新
+    
+    3. 课程性质对应规则：
+       专业必修课：
+       - 知识目标：L2-L3
+       - 能力目标：L2-L3
+       - 素养目标：L1-L2
+       
+       专业选修课：
+       - 知识目标：L1-L2
+       - 能力目标：L1-L2
+       - 素养目标：L1-L2
+       
+       通识课程：
+       - 知识目标：L0-L1
+       - 能力目标：L0-L1
+       - 素养目标：L0-L1
+    
+    4. 专业特色要求：
+       - 体现开课部门的学科特点
+       - 反映专业的核心竞争力
+       - 对接行业发展需求
+       - 符合毕业要求指标点
+    
+    请以json格式输出学习目标。
+    """
+    
+    try:
+        content = chat_completion(
+            _client(),
+            model="deepseek-chat",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            response_format={'type': 'json_object'},
+            use_cache=use_cache,
+            stage="generate_aacsb_goals"
+        )
+        
+        # 解析返回的JSON
+        result = json.loads(content)
+        
+        # 确保返回的数据格式正确
+        if isinstance(result, dict) and "goals" in result:
+            if isinstance(result["goals"], list):
+                # 确保所有目标都是字符串
+                goals = [str(goal) for goal in result["goals"]]
+                return "\n".join(goals)
+            else:
+                _report("error", "API返回的goals不是列表格式")
+                return None
+        else:
+            _report("error", "API返回的数据格式不正确")
+            return None
+            
+    except Exception as e:
+        _report("error", f"生成学习目标时出错：{str(e)}")
+        return None
+
+def get_graduation_requirements(department, major, extra_info):
+    system_prompt = """
+    你是一个专业培养方案专家，请根据开课部门和适用专业生成合适的毕业要求指标点。
+    
+    请以JSON格式输出，格式如下：
+    {
+        "requirements": {
+            "knowledge": [
+                "K1 掌握数学与统计学基础知识",
+                "K2 掌握数据科学核心理论与方法",
+                "K3 了解人工智能前沿发展动态"
+            ],
+            "ability": [
+                "A1 具备数据采集与预处理能力",
+                "A2 具备数据分析与建模能力",
+                "A3 熟练使用主流分析工具",
+                "A4 能够解决实际数据问题"
+            ],
+            "quality": [
+                "Q1 具备良好的职业道德",
+                "Q2 具备团队协作能力"
+            ]
+        }
+    }
+    """
+    
+    user_prompt = f"""
+    开课部门：{department}
+    适用专业：{major}
+    额外重要信息：{extra_info}
+    
+    请生成该专业的毕业要求指标点，要求：
+    1. 指标点数量要求：
+       - 知识类指标点：3-4个
+       - 能力类指标点：4-5个
+       - 素养类指标点：2-3个
+    
+    2. 编号规则：
+       - 知识类(K)：K1-K4
+       - 能力类(A)：A1-A5
+       - 素养类(Q)：Q1-Q3
+    
+    3. 描述规则：
+       - 每个指标点20字以内
+       - 使用规范的表述动词
+       - 确保可测量可评价
+       - 体现专业特色
+    
+    请以json格式输出指标点。
+    """
+    
+    try:
+        content = chat_completion(
+            _client(),
+            model="deepseek-chat",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            response_format={'type': 'json_object'},
+            stage="get_graduation_requirements"
+        )
+        
+        result = json.loads(content)
+        return result.get('requirements', None)
+        
+    except Exception as e:
+        _report("error", f"生成毕业要求指标点时出错：{str(e)}")
+        return None
+
+def get_major_graduation_requirements(department, major, extra_info):
+    """获取专业的毕业要求指标点，同一专业只在第一次需要时调用模型生成
+
+    extra_info 只在首次生成时使用；修改指标点后通过 major_requirements.set 保存，
+    要重新生成则先调用 major_requirements.invalidate。
+    """
+    return major_requirements.get_or_create(
+        department, major,
+        lambda: get_graduation_requirements(department, major, extra_info)
+    )
+
+def generate_course_content(course_name, course_type, department, major, aacsb_goals, extra_info, total_hours, theory_hours, practice_hours, graduation_requirements, use_cache=True):
+    system_prompt = """
+    你是一个课程设计专家，请基于完整的课程信息生成课程内容。
+    
+    请以JSON格式输出，格式如下：
+    {
+        "introduction": {
+            "position": "课程定位说明（50字以内）",
+            "purpose": "课程目的说明（50字以内）",
+            "content": "课程内容说明（100字以内）",
+            "method": "教学方法说明（50字以内）",
+            "outcome": "预期成果说明（50字内）"
+        },
+        "objectives": [
+            "1. 知识目标：掌握xxx",
+            "2. 能力目标：能够xxx",
+            "3. 素养目标：具备xxx",
+            "4. 创新目标：能够xxx"
+        ],
+        "textbooks": {
+            "main": [
+                "1.《xxx》（英文）, 作者, 出版社, 2023年（第x版）- 主要用于xxx",
+                "2.《xxx》（中文）, 作者, 出版社, 2022年（第x- 主要用于xxx"
+            ],
+            "references": [
+                "1. 经典教材：《xxx》",
+                "2. 实践指南：《xxx》",
+                "3. 在线资源：xxx平台课程",
+                "4. 技术文档：xxx官方文档",
+                "5. 前沿资料：xxx会议/期刊论文"
+            ]
+        },
+        "objectives_mapping": [
+            {
+                "objective": "1. 知识目标：掌握xxx",
+                "requirements": ["K1 xxx", "K2 xxx"]
+            }
+        ]
+    }
+    """
+    
+    user_prompt = f"""
+    课程名称：{course_name}
+    课程性质：{course_type}
+    开课部门：{department}
+    适用专业：{major}
+    总学时：{total_hours}学时
+    理论学时：{theory_hours}学时
+    实学时{practice_hours}学时
+    
+    AACSB学目标：
+    {aacsb_goals}
+    
+    毕业要求指标点：
+    知识类：
+    {chr(10).join([f"- {x}" for x in graduation_requirements['knowledge']])}
+    能力类：
+    {chr(10).join([f"- {x}" for x in graduation_requirements['ability']])}
+    素养类：
+    {chr(10).join([f"- {x}" for x in graduation_requirements['quality']])}
+    
+    额外信息：
+    {extra_info}
+    
+    请生成课程内容，要求：
+    1. 课程简介要求（总字数300字左右）：
+       - 课程定位：说明在专业培养中的地位和作用
+       - 课程目的：明确培养目标和预期效果
+       - 课程内容：概述主要知识体系和技能要求
+       - 教学方法：说明理论课（{theory_hours}学时）和实践课（{practice_hours}学时）的实施方式
+       - 预期成果：描述学生通过本课程获得的能力提升
+    
+    2. 课程目标要求（必须4个）：
+       - 知识目标：对应AACSB的CG1，映射知识类指标点
+       - 能力目标：对应AACSB的CG2，映射能力类指标点
+       - 素养目标：对应AACSB的CG3，映射素养类指标点
+       - 创新目标：综合性目标，可映射多类指标点
+    
+    3. 教材要求：
+       - 主教材（2本）：
+         * 1本英文教材（近3年版）
+         * 1本中文教材（近3年版）
+         * 要说明适用的教学内容
+       
+       - 参考资料（5项）：
+         * 经典教材：系统性强的基础教材
+         * 实践指南：案例丰富的实践教材
+         * 在线资源：优质MOOC或在线课程
+         * 技术文档：相关工具或平台文档
+         * 前沿资料：学术会议/期刊论文
+    
+    4. 目标映要求：
+       - 每个课程目标映射1-2个指标点
+       - 知识目标必须映射知识类标
+       - 力标必须射能力类指标点
+       - 养目标必须映射养类指标点
+       - 创新目标可以跨类映
+    
+    5. 整体要求：
+       - 内容逻辑性强
+       - 目标可测量
+       - 资源可获得
+       - 映射有依据
+    
+    请以json格式输出课程内容。
+    """
+    
+    try:
+        content = chat_completion(
+            _client(),
+            model="deepseek-chat",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            response_format={'type': 'json_object'},
+            use_cache=use_cache,
+            stage="generate_course_content"
+        )
+        
+        result = json.loads(content)
+        
+        # 验证返回的数据格式
+        if not all(key in result for key in ['introduction', 'objectives', 'textbooks', 'objectives_mapping']):
+            _report("error", "API返回的数据格式不正确")
+            return None
+        
+        # 验证课程目标的一致性
+        objectives_set = set(result['objectives'])
+        mapping_objectives = set(item['objective'] for item in result['objectives_mapping'])
+        
+        if objectives_set != mapping_objectives:
+            _report("error", "课程目标与映射关系表的目标不一致")
+            return None
+            
+        if not all(key in result['textbooks'] for key in ['main', 'references']):
+            _report("error", "API返回的教材数据格式不正确")
+            return None
+            
+        if not isinstance(result['objectives'], list):
+            _report("error", "课程目标必须是列表格式")
+            return None
+            
+        if not isinstance(result['textbooks']['main'], list):
+            _report("error", "主教材必须是列表格式")
+            return None
+            
+        if not isinstance(result['textbooks']['references'], list):
+            _report("error", "参考资料必须是列表格式")
+            return None
+            
+        return result
+        
+    except Exception as e:
+        _report("error", f"生成课程内容时出错：{str(e)}")
+        return None
+
+def generate_aacsb_assessment(aacsb_goals, course_objectives, graduation_requirements, use_cache=True):
+    """生成AACSB学习目标评估体系"""
+    system_prompt = """
+    你是一个AACSB认证专家，请为给定的学习目标生成评估体系。
+    
+    请以JSON格式输出评估体系，格式示例：
+    {
+        "assessments": [
+            {
+                "cg": "CG1 专业知识-L2 系统掌握核心理论与方法",
+                "og": [
+                    {
+                        "og": "OG1.1 掌握基础概念原理",
+                        "traits": [
+                            "能够准确解释核心概念",
+                            "能够描述基本原理和方法"
+                        ],
+                        "methods": [
+                            "课堂测验（20%）",
+                            "期末考试（30%）"
+                        ],
+                        "criteria": [
+                            "优秀(90-100分)：能够准确理解并灵活运用概念和原理，能够举一反三",
+                            "良好(80-89分)：能够正确理解并应用概念和原理，有一定延伸能力",
+                            "中等(70-79分)：基本理解概念和原理，能够进行简单应用",
+                            "及格(60-69分)：对概念和原理理解有限，应用能力较弱"
+                        ],
+                        "mapping": {
+                            "course_objectives": ["1", "2"],
+                            "graduation_requirements": ["K1", "K2"]
+                        }
+                    }
+                ]
+            }
+        ]
+    }
+    """
+    
+    user_prompt = f"""
+    AACSB学习目标：
+    {aacsb_goals}
+    
+    课程目标：
+    {course_objectives}
+    
+    毕业要求指标点：
+    {json.dumps(graduation_requirements, ensure_ascii=False)}
+    
+    请生成AACSB评估体系，要求：
+    1. CG与OG的对应规则：
+       - 每个CG必须对应2个OG（不多不少）
+       - OGx.1：基础能力目标（对应L0-L1级别）
+       - OGx.2：进阶能力目标（对应L2-L4级别）
+       - OG必须与课程目标和毕业要求指标点相对应
+    
+    2. 评估特征(Traits)设计规则：
+       基础能力特征（L0-L1）：
+       - "能够识别和描述xxx"
+       - "能够理解和解释xxx"
+       - "能够举例说明xxx"
+       
+       应用能力特征（L2）：
+       - "能够用xxx解决xxx"
+       - "能够实施xxx完成xxx"
+       - "能够操作xxx实现xxx"
+       
+       分析能力特征（L3）：
+       - "能够分析xxx提出xxx"
+       - "能够评估xxx优化xxx"
+       - "能够设计xxx改进xxx"
+       
+       创新能力特征（L4）：
+       - "能够创造xxx"
+       - "能够革新xxx"
+       - "能够引领xxx"
+    
+    3. 评估方式(Methods)设计规则：
+       过程性评估（30-40%）：
+       - 课堂表现（10-15%）
+       - 作业完成（10-15%）
+       - 实验报告（10-15%）
+       
+       阶段性评估（30-40%）：
+       - 单元测验（10-15%）
+       - 项目报告（15-20%）
+       - 期中考试（15-20%）
+       
+       终结性评估（30-40%）：
+       - 期末考试（30-40%）
+       - 课程设计（30-40%）
+       - 综合项目（30-40%）
+    
+    4. 评量标准(Criteria)设计规则：
+       必须包含4个等级，每个等级的要求如下：
+       
+       优秀(90-100分)：
+       - 完全/准确/深入理解核心知识
+       - 能够灵活运用和举一反三
+       - 具有创新性思维和解决方案
+       - 表现出很强的分析和综合能力
+       
+       良好(80-89分)：
+       - 正确/较好理解核心知识
+       - 能够正确运用和适当延伸
+       - 具有一定的创新思维
+       - 表现出较强的分析能力
+       
+       中等(70-79分)：
+       - 基本理解核心知识
+       - 能够进行简单应用
+       - 解决方案基本合理
+       - 具有基本的分析能力
+       
+       及格(60-69分)：
+       - 理解知识有限
+       - 应用能力较弱
+       - 解决方案不够完善
+       - 分析能力有待提高
+    
+    补充说明：
+    1. CG设计要求：
+       - 每个CG必须对应不同的能力层次
+       - 必须体现专业核心能力
+       - 要与课程目标紧密对应
+       - 描述必须具体且可测量
+    
+    2. OG设计要求：
+       - 必须是具体的、可操作的行为目标
+       - 必须包含可观察的学习成果
+       - 必须与评估方式直接关联
+       - 必须支持持续改进
+    
+    3. 评估方式要求：
+       - 必须包含直接评估和间接评估
+       - 直接评估：考试、项目、论文等
+       - 间接评估：问卷、访谈、反馈等
+       - 评估时间点要覆盖整个学期
+    
+    4. 评量标准要求：
+       - 每个等级必须有明确的区分特征
+       - 必须体现能力发展的递进关系
+       - 必须与专业认证要求对接
+       - 必须支持教学质量改进
+    
+    请以json格式输出评估体系。
+    """
+    
+    try:
+        content = chat_completion(
+            _client(),
+            model="deepseek-chat",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            response_format={'type': 'json_object'},
+            use_cache=use_cache,
+            stage="generate_aacsb_assessment"
+        )
+        
+        result = json.loads(content)
+        return result.get('assessments', None)
+        
+    except Exception as e:
+        _report("error", f"生成AACSB评估体系时出错：{str(e)}")
+        return None
+
+def generate_course_schedule(course_intro, course_objectives, total_hours, theory_hours, use_cache=True):
+    """生成课程内容与学时分配表"""
+    # 计算实践学时
+    practice_hours = total_hours - theory_hours
+    
+    system_prompt = """
+    你是一个课程设计专家，请根据课程信息生成课程内容与学时分配表。
+    
+    请以JSON格式输出，格式如下：
+    {
+        "schedule": [
+            {
+                "chapter": "1. 绪论",
+                "content": [
+                    "1.1 基本概念与理论体系",
+                    "1.2 发展历史与研究现状",
+                    "1.3 应用领域与发展趋势"
+                ],
+                "requirements": [
+                    "理解本课程的基本概念和理论体系",
+                    "掌握主要研究内容和应用领域",
+                    "了解学科发展趋势"
+                ],
+                "hours": "2/2",  # 理论/实践学时
+                "type": "讲授、案例分析、讨论"
+            }
+        ]
+    }
+    """
+    
+    user_prompt = f"""
+    课程简介：
+    {json.dumps(course_intro, ensure_ascii=False)}
+    
+    课程目标：
+    {course_objectives}
+    
+    总学时：{total_hours}
+    理论学时：{theory_hours}
+    实践学时：{practice_hours}
+    
+    请根据课程简介和课程目标生成课程内容与学时分配表，要求：
+    1. 内容组织原则：
+       - 知识体系完整，逻辑性强
+       - 难度循序渐进，由浅入深
+       - 理论联系实际，突出应用
+       - 反映学科前沿，体现创新
+       - 符合认知规律，便于学习
+    
+    2. 章节结构要求：
+       - 每章标题简明扼要，突出重点
+       - 每章必须包含3个主要小节
+       - 小节内容具体详实，可操作
+       - 章节之间有机衔接，避免重复
+       - 理论与实际紧密结合
+    
+    3. 学时分配规则：
+       理论课：
+       - 按2学时或4学时为单位安排
+       - 重要章节可安排4学时
+       - 基础章节安排2学时
+       - 总计必须为{theory_hours}学时
+       
+       实践课：
+       - 统一按2学时为单位安排
+       - 尽量安排在对应理论课后
+       - 总计必须为{practice_hours}学时
+       - 难度与理论课程同步
+    
+    4. 教学方式设计：
+       理论教学：
+       - 课堂讲授：系统讲解知识点
+       - 案例分析：加深理解应用
+       - 课堂研讨：促进思维碰撞
+       - 专题讲座：拓展前沿视野
+       
+       实践教学：
+       - 上机操作：培养实践技能
+       - 案例实践：解决实际问题
+       - 项目训练：提升综合能力
+       - 研讨交流：分享学习体会
+    
+    5. 学习要求设计：
+       知识要求：
+       - 明确重点难点
+       - 指明掌握程度
+       - 突出核心概念
+       - 强调应用价值
+       
+       能力要求：
+       - 具体可操作
+       - 可测量评价
+       - 注重实践性
+       - 体现创新性
+    
+    6. 考虑因素：
+       - 课程性质和定位
+       - 学生知识基础
+       - 教学资源条件
+       - 实践教学环境
+       - 课程考核要求
+       - 毕业要求指标点
+    
+    7. 时间分配建议：
+       - 导论与基础（约15%）：课程概述、基本概念、理论基础
+       - 核心内容（约50%）：重点理论、关键技术、主要方法
+       - 前沿拓展（约20%）：新理论、新技术、新应用
+       - 综合应用（约15%）：案例分析、实践创新、总结提升
+    
+    请以json格式输出课程内容与学时分配表。注意：
+    1. 内容要具体明确，避免空泛
+    2. 每章都要有清晰的教学目标
+    3. 理论与实践要紧密结合
+    4. 学时分配要准确合理
+    5. 教学方式要多样灵活
+    6. 学习要求量
+    """
+    
+    try:
+        content = chat_completion(
+            _client(),
+            model="deepseek-chat",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            response_format={'type': 'json_object'},
+            use_cache=use_cache,
+            stage="generate_course_schedule"
+        )
+        
+        result = json.loads(content)
+        schedule_data = result.get('schedule', [])
+        
+        # 验证学时总和
+        theory_sum = sum(int(item['hours'].split('/')[0]) for item in schedule_data)
+        practice_sum = sum(int(item['hours'].split('/')[1]) for item in schedule_data)
+        
+        if theory_sum != theory_hours or practice_sum != practice_hours:
+            # 在本地重新分配学时，避免为学时不符再调用一次API
+            rebalanced, adjustments, balanced = rebalance_schedule_hours(schedule_data, theory_hours, practice_hours)
+            if balanced:
+                schedule_data = rebalanced
+                _report("info", 
+                    f"学时总和不正确（理论{theory_sum}/{theory_hours}，实践{practice_sum}/{practice_hours}），已自动调整：\n"
+                    + "\n".join(f"- {item}" for item in adjustments)
+                )
+            else:
+                # 无法调整到位时保留生成的原始分配，由用户手动修改
+                if theory_sum != theory_hours:
+                    _report("warning", f"⚠️ 理论学时总和不正确：当前{theory_sum}学时，应为{theory_hours}学时")
+                if practice_sum != practice_hours:
+                    _report("warning", f"⚠️ 实践学时总和不正确：当前{practice_sum}学时，应为{practice_hours}学时")
+                _report("warning",
+                    "⚠️ 无法自动调整到要求的学时，已保留原始分配，可参考以下调整手动修改：\n"
+                    + "\n".join(f"- {item}" for item in adjustments)
+                )
+        
+        # 验证每章内容
+        for item in schedule_data:
+            if len(item.get('content', [])) != 3:
+                _report("warning", f"⚠️ 章节{item['chapter']}的小节数量不正确")
+                
+            if not item.get('requirements', []):
+                _report("warning", f"⚠️ 章节{item['chapter']}缺少学习要求")
+                
+            if not item.get('type', ''):
+                _report("warning", f"⚠️ 章节{item['chapter']}缺少教学方式")
+        
+        return schedule_data if schedule_data else []
+        
+    except Exception as e:
+        _report("warning", f"⚠️ 生成课程内容与学时分配表时出错：{str(e)}")
+        return []
+
+def generate_lab_schedule(course_schedule, practice_hours, course_objectives, use_cache=True):
+    """生成实验教学内容与安排表"""
+    system_prompt = """
+    你是一个课程设计专家，请根据课程内容生成实验教学安排表。
+    
+    请以JSON格式输出，格式如下：
+    {
+        "labs": [
+            {
+                "number": "1",
+                "name": "基础环境搭建与工具使用",
+                "content": [
+                    "1. 开发环境配置",
+                    "2. 基本工具使用",
+                    "3. 示例程序运行"
+                ],
+                "requirements": [
+                    "掌握环境配置方法",
+                    "熟练使用基本工具",
+                    "理解工作流程"
+                ],
+                "hours": 2,
+                "group_size": 1,
+                "type": "基础性",  # 基础性/综合性/设计性
+                "required": "必修",   # 必修/选修
+                "objectives": ["2", "3"],  # 对应的课程目标编号
+                "chapter": "第1章"  # 对应的教学章节
+            }
+        ]
+    }
+    """
+    
+    user_prompt = f"""
+    课程实践总学时：{practice_hours}
+    
+    课程教学内容：
+    {json.dumps(course_schedule, ensure_ascii=False)}
+    
+    课程目标：
+    {course_objectives}
+    
+    请生成实验教学安排表，要求：
+    1. 实验类型及分布：
+       基础性实验（25-30%学时）：
+       - 基本技能训练
+       - 工具使用方法
+       - 单人完成
+       - 对应课程前期章节
+       
+       综合性实验（35-40%学时）：
+       - 综合应用能力
+       - 多知识点结合
+       - 2人协作
+       - 对应课程中期章节
+       
+       设计性实验（35-40%学时）：
+       - 创新设计能力
+       - 方案规划实施
+       - 2-3人团队
+       - 对应课程后期章
+    
+    2. 实验内容要求：
+       - 必须与教学进度同步
+       - 实验内容层次
+       - 难度循序渐进
+       - 体现能力培养
+       - 注重实际应用能力
+    
+    3. 学时分配规则：
+       - 总学时必须等于{practice_hours}
+       - 基础性实验：2-4学时/个
+       - 综合性实验：4学/个
+       - 设计性实验4-6学时/个
+       - 合理分配各类实验
+    
+    4. 分组要求：
+       - 基础性：单人（1人/组）
+       - 综合性：双人（2人/组）
+       - 设计性：团队（2-3人/组）
+       - 明确每个实验分组
+    
+    请以json格式输出实验教学安排表。
+    """
+    
+    try:
+        content = chat_completion(
+            _client(),
+            model="deepseek-chat",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            response_format={'type': 'json_object'},
+            use_cache=use_cache,
+            stage="generate_lab_schedule"
+        )
+        
+        result = json.loads(content)
+        labs_data = result.get('labs', [])
+        
+        # 验证实验数量
+        if len(labs_data) < 1:
+            _report("warning", "⚠️ 实验数量不能少于1个")
+            return None
+        
+        # 验证实验学时总和
+        total_lab_hours = sum(int(item['hours']) for item in labs_data)
+        if total_lab_hours != practice_hours:
+            # 按实验类型的学时范围在本地重新分配
+            rebalanced, adjustments, balanced = rebalance_lab_hours(labs_data, practice_hours)
+            if balanced:
+                labs_data = rebalanced
+                _report("info", 
+                    f"实验学时总和不正确（当前{total_lab_hours}学时，应为{practice_hours}学时），已自动调整：\n"
+                    + "\n".join(f"- {item}" for item in adjustments)
+                )
+            else:
+                # 无法调整到位时保留生成的原始学时，由用户手动修改
+                _report("warning",
+                    f"⚠️ 实验学时总和不正确：当前{total_lab_hours}学时，应为{practice_hours}学时，"
+                    "且无法在各类实验的学时范围内自动调整，已保留原始学时"
+                    + "".join(f"\n- 可参考：{item}" for item in adjustments)
+                )
+        
+        # 验证每个实验的内容和要求
+        for lab in labs_data:
+            if len(lab.get('content', [])) < 1:
+                _report("warning", f"⚠️ 实验{lab['number']}缺少内容")
+            
+            if len(lab.get('requirements', [])) < 1:
+                _report("warning", f"⚠️ 实验{lab['number']}缺少学习要求")
+        
+        return labs_data
+        
+    except Exception as e:
+        _report("error", f"生成实验教学内容与安排表时出错：{str(e)}")
+        return None
+    
+
+def generate_assessment_scheme(course_objectives, assessment_data, labs_data, theory_hours, practice_hours, exam_type, exam_form, course_type, use_cache=True):
+    """生成考核方案"""
+    
+    # 根据考核方式和是否有实验学时选择不同的提示词模板
+    if exam_type == "考试":
+        if exam_form == "闭卷笔试":
+            if practice_hours > 0:
+                assessment_template = """
+                请生成考核方案，要求：
+                1. 期末考试（闭卷笔试）（40-50%）：
+                   - 基础知识（40%）：概念理解、原理掌握
+                   - 应用能力（40%）：问题分析、算法设计
+                   - 综合创新（20%）：方案优化、拓展应用
+                
+                2. 平时成绩（30-40%）：
+                   课堂表现（10-15%）：
+                   - 出勤记录
+                   - 课堂互动
+                   - 学习态度
+                   
+                   课后作业（10-15%）：
+                   - 完成质量
+                   - 提交时效
+                   - 创新思维
+                   
+                   单元测验（10%）：
+                   - 知识掌握
+                   - 应用能力
+                   - 理解程度
+                
+                3. 实验成绩（20-30%）：
+                   实验操作（10-15%）：
+                   - 规范操作
+                   - 完成情况
+                   - 独立性
+                   
+                   实验报告（10-15%）：
+                   - 数据记录
+                   - 分析讨论
+                   - 报告规范
+                """
+            else:
+                assessment_template = """
+                请生成考核方案，要求：
+                1. 期末考试（闭卷笔试）（50-60%）：
+                   - 基础知识（40%）：概念理解、原理掌握
+                   - 应用能力（40%）：问题分析、算法设计
+                   - 综合创新（20%）：方案优化、拓展应用
+                
+                2. 平时成绩（40-50%）：
+                   课堂表现（15-20%）：
+                   - 出勤记录
+                   - 课堂互动
+                   - 学习态度
+                   
+                   课后作业（15-20%）：
+                   - 完成质量
+                   - 提交时效
+                   - 创新思维
+                   
+                   单元测验（10-15%）：
+                   - 知识掌握
+                   - 应用能力
+                   - 理解程度
+                """
+        else:  # 开卷笔试
+            if practice_hours > 0:
+                assessment_template = """
+                请生成考核方案，要求：
+                1. 期末考试（开卷笔试）（40-50%）：
+                   - 应用能力（50%）：问题分析、方案设计
+                   - 综合创新（30%）：方案优化、创新思维
+                   - 文献运用（20%）：资料查找、知识整合
+                
+                2. 平时成绩（30-40%）：
+                   课堂参与（15-20%）：
+                   - 讨论发言
+                   - 案例分析
+                   - 问题解答
+                   
+                   研究报告（15-20%）：
+                   - 文献综述
+                   - 方法应用
+                   - 创新见解
+                
+                3. 实验成绩（20-30%）：
+                   项目实现（10-15%）：
+                   - 功能完整
+                   - 技术水平
+                   - 创新性
+                   
+                   技术报告（10-15%）：
+                   - 方案设计
+                   - 实现过程
+                   - 结果分析
+                """
+            else:
+                assessment_template = """
+                请生成考核方案，要求：
+                1. 期末考试（开卷笔试）（50-60%）：
+                   - 应用能力（50%）：问题分析、方案设计
+                   - 综合创新（30%）：方案优化、创新思维
+                   - 文献运用（20%）：资料查找、知识整合
+                
+                2. 平时成绩（40-50%）：
+                   课堂参与（20-25%）：
+                   - 讨论发言
+                   - 案例分析
+                   - 问题解答
+                   
+                   研究报告（20-25%）：
+                   - 文献综述
+                   - 方法应用
+                   - 创新见解
+                """
+    else:  # 考查课程
+        if exam_form == "课程论文":
+            if practice_hours > 0:
+                assessment_template = """
+                请生成考核方案，要求：
+                1. 课程论文（35-40%）：
+                   - 选题价值（10%）：选题新颖性、研究意义
+                   - 内容水平（15%）：文献综述、研究方法
+                   - 创新程度（10%）：观点创新、方法创新
+                   - 写作规范（5%）：结构完整、格式规范
+                
+                2. 平时成绩（35-40%）：
+                   课堂表现（10-15%）：
+                   - 出勤记录
+                   - 课堂讨论
+                   - 学习态度
+                   
+                   文献研读（15-20%）：
+                   - 阅读笔记
+                   - 文献综述
+                   - 研究动态
+                   
+                   研究过程（10-15%）：
+                   - 选题报告
+                   - 开题答辩
+                   - 进度汇报
+                
+                3. 实验实践（20-30%）：
+                   研究实践（10-15%）：
+                   - 数据收集
+                   - 模型构建
+                   - 实验验证
+                   
+                   成果展示（10-15%）：
+                   - 论文答辩
+                   - 研究成果
+                   - 创新贡献
+                """
+            else:
+                assessment_template = """
+                请生成考核方案，要求：
+                1. 课程论文（50-60%）：
+                   - 选题价值（15%）：选题新颖性、研究意义
+                   - 内容水平（20%）：文献综述、研究方法
+                   - 创新程度（15%）：观点创新、方法创新
+                   - 写作规范（10%）：结构完整、格式规范
+                
+                2. 平时成绩（40-50%）：
+                   课堂表现（15-20%）：
+                   - 出勤记录
+                   - 课堂讨论
+                   - 学习态度
+                   
+                   文献研读（15-20%）：
+                   - 阅读笔记
+                   - 文献综述
+                   - 研究动态
+                   
+                   研究过程（10-15%）：
+                   - 选题报告
+                   - 开题答辩
+                   - 进度汇报
+                """
+        elif exam_form == "项目报告":
+            if practice_hours > 0:
+                assessment_template = """
+                请生成考核方案，要求：
+                1. 项目成果（35-40%）：
+                   - 需求分析（10%）：需求理解、问题定义
+                   - 设计方案（15%）：技术路线、创新点
+                   - 实现效果（10%）：功能完整、性能指标
+                   - 文档质量（5%）：文档规范、内容完整
+                
+                2. 平时成绩（35-40%）：
+                   课堂表现（10-15%）：
+                   - 出勤记录
+                   - 课堂讨论
+                   - 学习态度
+                   
+                   团队协作（15-20%）：
+                   - 任务分工
+                   - 进度管理
+                   - 团队贡献
+                   
+                   阶段评审（10-15%）：
+                   - 方案评审
+                   - 中期检查
+                   - 测试报告
+                
+                3. 技术实现（20-30%）：
+                   代码质量（10-15%）：
+                   - 代码规范
+                   - 功能实现
+                   - 性能优化
+                   
+                   部署运维（10-15%）：
+                   - 环境部署
+                   - 系统测试
+                   - 问题修复
+                """
+            else:
+                assessment_template = """
+                请生成考核方案，要求：
+                1. 项目成果（50-60%）：
+                   - 需求分析（15%）：需求理解、问题定义
+                   - 设计方案（20%）：技术路线、创新点
+                   - 实现效果（15%）：功能完整、性能指标
+                   - 文档质量（10%）：文档规范、内容完整
+                
+                2. 平时成绩（40-50%）：
+                   课堂表现（15-20%）：
+                   - 出勤记录
+                   - 课堂讨论
+                   - 学习态度
+                   
+                   团队协作（15-20%）：
+                   - 任务分工
+                   - 进度管理
+                   - 团队贡献
+                   
+                   阶段评审（10-15%）：
+                   - 方案评审
+                   - 中期检查
+                   - 测试报告
+                """
+        else:  # 课程设计
+            if practice_hours > 0:
+                assessment_template = """
+                请生成考核方案，要求：
+                1. 设计成果（35-40%）：
+                   - 设计方案（15%）：创新性、可行性
+                   - 实现质量（15%）：完整性、技术性
+                   - 答辩表现（10%）：表达、回答
+                
+                2. 平时成绩（35-40%）：
+                   课堂表现（10-15%）：
+                   - 出勤记录
+                   - 课堂讨论
+                   - 学习态度
+                   
+                   过程管理（15-20%）：
+                   - 进度计划
+                   - 文档管理
+                   - 版本控制
+                   
+                   阶段评审（10-15%）：
+                   - 方案评审
+                   - 中期检查
+                   - 验收测试
+                
+                3. 技术实现（20-30%）：
+                   实现质量（10-15%）：
+                   - 代码规范
+                   - 功能完整
+                   - 性能优化
+                   
+                   创新应用（10-15%）：
+                   - 技术创新
+                   - 应用价值
+                   - 实用效果
+                """
+            else:
+                assessment_template = """
+                请生成考核方案，要求：
+                1. 设计成果（50-60%）：
+                   - 设计方案（20%）：创新性、可行性
+                   - 实现质量（20%）：完整性、技术性
+                   - 答辩表现（10%）：表达、回答
+                
+                2. 平时成绩（40-50%）：
+                   课堂表现（15-20%）：
+                   - 出勤记录
+                   - 课堂讨论
+                   - 学习态度
+                   
+                   过程管理（15-20%）：
+                   - 进度计划
+                   - 文档管理
+                   - 版本控制
+                   
+                   阶段评审（10-15%）：
+                   - 方案评审
+                   - 中期检查
+                   - 验收测试
+                """
+    
+    system_prompt = """
+    你是一个课程设计专家，请根据课程信息生成考核方案。
+    
+    请严格按照以下JSON格式输出：
+    {
+        "assessment_items": [
+            {
+                "type": "期末考试（闭卷笔试）",
+                "percentage": 50,
+                "criteria": [
+                    "1. 基础知识（20%）：概念理解、原理掌握",
+                    "2. 应用能力（20%）：问题分析、方案设计",
+                    "3. 创新思维（10%）：方案优化、拓展思考"
+                ],
+                "objectives": ["1", "2"]
+            }
+        ]
+    }
+    """
+    
+    user_prompt = f"""
+    课程目标：
+    {course_objectives}
+    
+    AACSB评估体系：
+    {json.dumps(assessment_data, ensure_ascii=False)}
+    
+    实验安排：
+    {json.dumps(labs_data, ensure_ascii=False) if labs_data else "无实验环节"}
+    
+    考核方式：{exam_type}（{exam_form}）
+    课程性质：{course_type}
+    理论学时：{theory_hours}
+    实践学时：{practice_hours}
+    
+    {assessment_template}
+    
+    请注意：
+    1. 各部分考核比例必须在规定范围内
+    2. 所有考核项目必须对应课程目标
+    3. 考核标准必须具体且可操作
+    4. 总评成绩必须为100%
+    5. 评分标准应体现区分度
+    
+    请以json格式输出考核方案。
+    """
+    
+    try:
+        content = chat_completion(
+            _client(),
+            model="deepseek-chat",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            response_format={'type': 'json_object'},
+            use_cache=use_cache,
+            stage="generate_assessment_scheme"
+        )
+        
+        result = json.loads(content)
+        assessment_items = result.get('assessment_items', [])
+        
+        # 验证考核比例总和
+        total_percentage = sum(item.get('percentage', 0) for item in assessment_items)
+        if total_percentage != 100:
+            _report("warning", f"⚠️ 考核比例总和({total_percentage}%)不等于100%")
+        
+        # 验证考试课程的期末考试要求
+        if exam_type == "考试":
+            final_exam = next((item for item in assessment_items if '期末考试' in item['type']), None)
+            if not final_exam:
+                _report("warning", "⚠️ 考试课程必须包含期末考试")
+            elif final_exam['percentage'] < 40 or final_exam['percentage'] > 60:
+                _report("warning", f"⚠️ 考试课程的期末考试比例({final_exam['percentage']}%)应在40-60%之间")
+        
+        # 验证每项考核都有对应的课程目标
+        for item in assessment_items:
+            if not item.get('objectives'):
+                _report("warning", f"⚠️ {item['type']}缺少对应的课程目标")
+        
+        return assessment_items
+        
+    except Exception as e:
+        _report("warning", f"⚠️ 生成考核方案时出错：{str(e)}")
+        return []
+# 一键生成各阶段的显示名称
+OUTLINE_STAGE_LABELS = {
+    "graduation_requirements": "毕业要求指标点",
+    "aacsb_goals": "AACSB学习目标",
+    "content": "课程内容",
+    "aacsb_assessment": "AACSB评估体系",
+    "course_schedule": "课程内容与学时分配",
+    "labs_schedule": "实验教学内容",
+    "assessment_table": "考核方式和标准"
+}
+
+def build_outline_stages(basic_info, use_cache=True):
+    """根据课程基本信息构建一键生成的阶段依赖图
+
+    use_cache=False 时各阶段跳过大模型响应缓存重新生成（毕业要求指标点仍取自专业级指标点库）。
+    """
+    info = basic_info
+    practice_hours = info['practice_hours']
+    stages = [
+        Stage("graduation_requirements",
+              lambda: get_major_graduation_requirements(info['department'], info['major'], info['extra_info'])),
+        Stage("aacsb_goals",
+              lambda graduation_requirements: generate_aacsb_goals(
+                  info['course_name_cn'], info['course_type'], info['department'], info['major'],
+                  graduation_requirements, info['extra_info'], use_cache=use_cache
+              ),
+              inputs=["graduation_requirements"]),
+        Stage("content",
+              lambda aacsb_goals, graduation_requirements: generate_course_content(
+                  info['course_name_cn'], info['course_type'], info['department'], info['major'],
+                  aacsb_goals, info['extra_info'], info['total_hours'], info['theory_hours'],
+                  practice_hours, graduation_requirements, use_cache=use_cache
+              ),
+              inputs=["aacsb_goals", "graduation_requirements"]),
+        # 评估体系与学时分配都只依赖课程目标，可以并行执行
+        Stage("aacsb_assessment",
+              lambda aacsb_goals, content, graduation_requirements: generate_aacsb_assessment(
+                  aacsb_goals, content['objectives'], graduation_requirements, use_cache=use_cache
+              ),
+              inputs=["aacsb_goals", "content", "graduation_requirements"]),
+        Stage("course_schedule",
+              lambda content: generate_course_schedule(
+                  content['introduction'], content['objectives'], info['total_hours'], info['theory_hours'],
+                  use_cache=use_cache
+              ),
+              inputs=["content"], optional=True),
+    ]
+
+    if practice_hours > 0:
+        stages.append(Stage(
+            "labs_schedule",
+            lambda course_schedule, content: generate_lab_schedule(
+                course_schedule, practice_hours, content['objectives'], use_cache=use_cache
+            ),
+            inputs=["course_schedule", "content"], optional=True
+        ))
+
+    stages.append(Stage(
+        "assessment_table",
+        lambda content, aacsb_assessment, labs_schedule: generate_assessment_scheme(
+            content['objectives'], aacsb_assessment, labs_schedule,
+            info['theory_hours'], practice_hours, info['exam_type'], info['exam_form'], info['course_type'],
+            use_cache=use_cache
+        ),
+        inputs=["content", "aacsb_assessment", "labs_schedule"]
+    ))
+    return stages
+
+def content_sections(content):
+    """把课程内容阶段的结果拆分为大纲中的各部分"""
+    sections = {
+        'course_intro': content.get('introduction', {}),
+        'course_objectives': "\n".join(content.get('objectives', [])),
+        'course_textbooks': {
+            'main': content.get('textbooks', {}).get('main', []),
+            'references': content.get('textbooks', {}).get('references', [])
+        }
+    }
+    if 'objectives_mapping' in content:
+        sections['objectives_mapping'] = [
+            {
+                "number": i,
+                "objective": mapping['objective'],
+                "requirements": "；".join(mapping['requirements'])
+            }
+            for i, mapping in enumerate(content['objectives_mapping'], 1)
+        ]
+    return sections
+
+def outline_from_results(basic_info, results):
+    """把各阶段的结果整理为与“下载课程数据”相同格式的大纲数据"""
+    outline = {"basic_info": basic_info}
+    for key in ["graduation_requirements", "aacsb_goals", "aacsb_assessment", "course_schedule", "assessment_table"]:
+        if results.get(key):
+            outline[key] = results[key]
+    if results.get("content"):
+        outline.update(content_sections(results["content"]))
+    if basic_info['practice_hours'] > 0 and results.get("labs_schedule"):
+        outline["labs_schedule"] = results["labs_schedule"]
+    return outline
+
+def generate_outline(basic_info, stages=None, max_workers=4, wrap=None, on_stage_done=None, checkpoint=None, deadline_seconds=None, use_cache=True):
+    """生成一门课程的完整大纲，返回 (大纲数据, 失败的阶段)
+
+    传入 checkpoint（OutlineCheckpointStore）时，各阶段的输出按课程代码保存，
+    再次运行时从第一个缺失或输入已变化的阶段继续；某阶段超时时退回到其上次成功的输出。
+    deadline_seconds 为整体时限，剩余时间按各阶段后续的串行阶段数分配。
+    use_cache=False 时跳过大模型响应缓存（未传入 stages 时有效），用于全部重新生成。
+    """
+    stages = stages or build_outline_stages(basic_info, use_cache=use_cache)
+    if checkpoint is not None:
+        # 指标点已在专业级指标点库中保存，不另设检查点，修改后下游阶段随之失效
+        stages = checkpoint.wrap_stages(
+            stages, basic_info,
+            skip=("graduation_requirements",),
+            on_fallback=lambda name: _report("warning", f"{OUTLINE_STAGE_LABELS[name]}生成超时，已使用上次生成的结果")
+        )
+    # 没有实验学时时，考核方案的实验输入为空
+    initial = {} if basic_info['practice_hours'] > 0 else {"labs_schedule": None}
+    with request_scope(department=basic_info['department']), deadline_scope(seconds=deadline_seconds):
+        results, failed = run_stages(
+            stages,
+            initial=initial,
+            max_workers=max_workers,
+            wrap=wrap,
+            on_stage_done=on_stage_done
+        )
+    return outline_from_results(basic_info, results), failed
+
+def build_document_context(outline):
+    """根据大纲数据准备template.docx的渲染上下文"""
+    info = outline['basic_info']
+    practice_hours = info['practice_hours']
+    context = {
+        # 基本信息
+        'course_name_cn': info['course_name_cn'],
+        'course_name_en': info['course_name_en'],
+        'course_code': info['course_code'],
+        'course_type': info['course_type'],
+        'credits': info['credits'],
+        'total_hours': info['total_hours'],
+        'theory_hours': info['theory_hours'],
+        'practice_hours': practice_hours,
+        'exam_type': info['exam_type'],
+        'exam_form': info['exam_form'],
+        'department': info['department'],
+        'major': info['major'],
+        'prerequisites': info['prerequisites'],
+        
+        # 毕业要求指标点
+        'graduation_requirements': outline.get('graduation_requirements') or {
+            'knowledge': [],
+            'ability': [],
+            'quality': []
+        },
+        
+        # AACSB学习目标
+        'aacsb_goals': outline['aacsb_goals'].split('\n') if outline.get('aacsb_goals') else [],
+        
+        # 课程简介
+        'course_intro': outline.get('course_intro') or {
+            'position': '',
+            'purpose': '',
+            'content': '',
+            'method': '',
+            'outcome': ''
+        },
+        
+        # 课程目标
+        'course_objectives': outline['course_objectives'].split('\n') if outline.get('course_objectives') else [],
+        
+        # 教材信息
+        'course_textbooks': outline.get('course_textbooks') or {
+            'main': [],
+            'references': []
+        },
+        
+        # 课程目标与毕业要求指标点对应关系
+        'objectives_mapping': [
+            {
+                'number': item['number'],
+                'objective': item['objective'],
+                'requirements': item['requirements']
+            }
+            for item in outline.get('objectives_mapping', [])
+        ],
+        
+        # AACSB评估体系
+        'aacsb_assessment': outline.get('aacsb_assessment', []),
+        
+        # 课程内容与学时分配
+        'course_schedule': [
+            {
+                'chapter': item.get('chapter', ''),
+                'content': item.get('content', []),
+                'requirements': item.get('requirements', []),
+                'hours': item.get('hours', ''),
+                'type': item.get('type', '')
+            }
+            for item in outline.get('course_schedule', [])
+        ],
+        
+        # 实验教学内容（如果有）
+        'labs_schedule': [
+            {
+                'number': lab.get('number', ''),
+                'name': lab.get('name', ''),
+                'content': lab.get('content', []),
+                'requirements': lab.get('requirements', []),
+                'hours': lab.get('hours', ''),
+                'group_size': lab.get('group_size', ''),
+                'required': lab.get('required', '必修'),
+                'type': lab.get('type', '')
+            }
+            for lab in outline.get('labs_schedule', [])
+        ] if practice_hours > 0 else [],
+        
+        # 考核方式和评价标准
+        'assessment_table': [
+            {
+                'type': item.get('type', ''),
+                'percentage': item.get('percentage', 0),
+                'criteria': item.get('criteria', []),
+                'objectives': item.get('objectives', [])
+            }
+            for item in outline.get('assessment_table', [])
+        ]
+    }
+    
+    # 添加总评成绩计算方式
+    context['total_assessment'] = sum(item.get('percentage', 0) for item in context['assessment_table'])
+    
+    # 添加实验课程标记
+    context['has_labs'] = practice_hours > 0
+    
+    # 添加考试/考查课程标记
+    context['is_exam'] = info['exam_type'] == "考试"
+    
+    return context
+
+def render_outline_docx(outline, output, template_path="template.docx"):
+    """用template.docx渲染课程大纲，output可以是文件路径或文件对象"""
+    doc = DocxTemplate(template_path)
+    doc.render(build_document_context(outline))
+    doc.save(output)
+    return doc
+
+# 批量生成时课程基本信息的字段及默认值
+BASIC_INFO_DEFAULTS = {
+    "course_name_cn": "",
+    "course_name_en": "",
+    "course_code": "",
+    "course_type": "专业必修课",
+    "credits": 0,
+    "total_hours": None,
+    "theory_hours": 0,
+    "practice_hours": 0,
+    "exam_type": "考试",
+    "exam_form": None,
+    "department": "",
+    "major": "",
+    "prerequisites": "",
+    "extra_info": ""
+}
+
+def normalize_basic_info(row):
+    """把CSV/JSON中的一行课程信息整理为basic_info，补全默认值并转换数值字段"""
+    info = dict(BASIC_INFO_DEFAULTS)
+    info.update({k: v for k, v in row.items() if k in BASIC_INFO_DEFAULTS and v not in (None, "")})
+    for key in ("credits", "theory_hours", "practice_hours"):
+        info[key] = int(float(info[key] or 0))
+    info['total_hours'] = int(float(info['total_hours'])) if info['total_hours'] not in (None, "") else info['theory_hours'] + info['practice_hours']
+    if not info['exam_form']:
+        info['exam_form'] = "闭卷笔试" if info['exam_type'] == "考试" else "课程论文"
+    if not info['course_code'] or not info['course_name_cn']:
+        raise ValueError(f"课程信息缺少course_code或course_name_cn：{row}")
+    if info['total_hours'] != info['theory_hours'] + info['practice_hours']:
+        raise ValueError(f"{info['course_code']}：总学时必须等于理论学时与实践学时之和")
+    return info
+
+def load_courses(path):
+    """读取课程列表，支持CSV（表头为basic_info字段名）和JSON（basic_info列表或含basic_info的大纲列表）"""
+    if path.lower().endswith('.csv'):
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = json.load(f)
+        rows = [row.get('basic_info', row) for row in rows]
+    return [normalize_basic_info(row) for row in rows]
+
+def generate_course_files(basic_info, output_dir, template_path="template.docx", render_docx=True, stage_workers=3, checkpoint=None, deadline_seconds=None, use_cache=True):
+    """生成一门课程的大纲并保存JSON和Word文档，返回 (课程代码, 失败的阶段)"""
+    with request_scope(priority="batch"):
+        outline, failed = generate_outline(
+            basic_info, max_workers=stage_workers, checkpoint=checkpoint,
+            deadline_seconds=deadline_seconds, use_cache=use_cache
+        )
+    base_name = f"{basic_info['course_code']}_{basic_info['course_name_cn']}"
+
+    with open(os.path.join(output_dir, f"{base_name}_课程大纲数据.json"), 'w', encoding='utf-8') as f:
+        json.dump(outline, f, ensure_ascii=False, indent=2)
+
+    if render_docx and not failed:
+        render_outline_docx(outline, os.path.join(output_dir, f"{base_name}-课程大纲.docx"), template_path)
+
+    return basic_info['course_code'], failed
+
+def main():
+    parser = argparse.ArgumentParser(description="批量生成课程教学大纲")
+    parser.add_argument("courses", help="课程列表文件（CSV或JSON）")
+    parser.add_argument("-o", "--output-dir", default="outlines", help="输出目录")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="同时生成的课程数")
+    parser.add_argument("--stage-workers", type=int, default=3, help="每门课程内并行执行的阶段数")
+    parser.add_argument("--template", default="template.docx", help="Word模板路径")
+    parser.add_argument("--no-docx", action="store_true", help="只输出JSON，不渲染Word文档")
+    parser.add_argument("--checkpoint-db", default="outline_checkpoints.db", help="阶段检查点数据库路径")
+    parser.add_argument("--no-resume", action="store_true", help="清除已有检查点，所有阶段重新生成")
+    parser.add_argument("--deadline", type=float, default=None, help="每门课程的生成时限（秒）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(threadName)s %(message)s")
+    courses = load_courses(args.courses)
+    os.makedirs(args.output_dir, exist_ok=True)
+    checkpoint = OutlineCheckpointStore(args.checkpoint_db)
+    if args.no_resume:
+        for info in courses:
+            checkpoint.clear(info['course_code'])
+    logger.info("共%d门课程，并发数%d", len(courses), args.workers)
+
+    failures = {}
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            executor.submit(
+                generate_course_files, info, args.output_dir, args.template,
+                not args.no_docx, args.stage_workers, checkpoint, args.deadline, not args.no_resume
+            ): info['course_code']
+            for info in courses
+        }
+        for future in as_completed(futures):
+            course_code = futures[future]
+            try:
+                _, failed = future.result()
+            except Exception as e:
+                failed = {"all": str(e)}
+            if failed:
+                failures[course_code] = failed
+                logger.error("%s 生成失败：%s", course_code, failed)
+            else:
+                logger.info("%s 生成完成", course_code)
+
+    logger.info("完成%d门，失败%d门", len(courses) - len(failures), len(failures))
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,168 @@
+import json
+import hashlib
+import logging
+import threading
+import contextvars
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+import deadline
+from fair_scheduler import request_scope
+from pipeline import Stage
+from outline_generator import get_major_graduation_requirements, generate_aacsb_goals, log_reports
+
+logger = logging.getLogger(__name__)
+
+# 指标点与AACSB目标只取决于这些表单字段
+PREFETCH_FIELDS = ("department", "major", "extra_info", "course_name_cn", "course_type")
+
+# 预取的阶段，按执行顺序排列
+PREFETCH_STAGES = ("graduation_requirements", "aacsb_goals")
+
+# 等待预取结果时检查超时和取消的间隔（秒）
+WAIT_INTERVAL = 0.5
+
+class OutlinePrefetcher:
+    def __init__(self, stable_seconds=3.0, timeout=300):
+        """用户填写表单时预先生成前两个阶段（毕业要求指标点、AACSB目标）
+
+        相关输入保持 stable_seconds 秒不变后在后台开始生成，结果按输入哈希保存；
+        一键生成时只有输入仍然一致才使用预取结果，否则照常生成。
+        输入变化时取消尚未完成的预取，预取整体不超过 timeout 秒。
+        """
+        self.stable_seconds = stable_seconds
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._timer = None
+        self._key = None
+        self._running = None
+
+    @staticmethod
+    def input_hash(basic_info):
+        """预取相关输入的哈希"""
+        payload = json.dumps(
+            {field: basic_info.get(field) for field in PREFETCH_FIELDS},
+            ensure_ascii=False, sort_keys=True
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def observe(self, basic_info):
+        """每次页面运行时调用，输入变化后重新计时"""
+        key = self.input_hash(basic_info)
+        with self._lock:
+            if key == self._key:
+                return
+            self._key = key
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._running is not None and self._running['key'] != key:
+                self._running['token'].cancel("课程信息已变化")
+                self._running = None
+            if self._running is None:
+                # 复制当前上下文，预取沿用页面的用户信息
+                self._timer = threading.Timer(
+                    self.stable_seconds, contextvars.copy_context().run,
+                    (self._start, key, dict(basic_info))
+                )
+                self._timer.daemon = True
+                self._timer.start()
+
+    def cancel(self):
+        """停止计时并取消进行中的预取"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._running is not None:
+                self._running['token'].cancel("已关闭预先生成")
+                self._running = None
+            self._key = None
+
+    def status(self, basic_info):
+        """当前输入的预取状态：None（未开始）、running、done 或 failed（一键生成时照常生成失败的阶段）"""
+        running = self._lookup(basic_info)
+        if running is None:
+            return None
+        if not all(f.done() for f in running['futures'].values()):
+            return "running"
+        return "failed" if running['errors'] else "done"
+
+    def errors(self, basic_info):
+        """当前输入的预取失败原因 {阶段名: 原因}"""
+        running = self._lookup(basic_info)
+        return dict(running['errors']) if running is not None else {}
+
+    def _lookup(self, basic_info):
+        key = self.input_hash(basic_info)
+        with self._lock:
+            if self._running is not None and self._running['key'] == key:
+                return self._running
+        return None
+
+    def _start(self, key, basic_info):
+        with self._lock:
+            if key != self._key or self._running is not None:
+                return
+            self._timer = None
+            token = deadline.CancelToken()
+            futures = {name: Future() for name in PREFETCH_STAGES}
+            errors = {}
+            self._running = {'key': key, 'token': token, 'futures': futures, 'errors': errors}
+
+        # 预取是推测性的工作，按批量类请求调度，不挤占交互请求；
+        # 计时线程没有页面上下文，生成过程中的提示写入日志
+        with request_scope(priority="batch", department=basic_info['department']), \
+                deadline.deadline_scope(seconds=self.timeout, token=token), log_reports():
+            requirements = goals = None
+            try:
+                requirements = get_major_graduation_requirements(
+                    basic_info['department'], basic_info['major'], basic_info['extra_info']
+                )
+                if requirements is None:
+                    errors['graduation_requirements'] = "未能生成毕业要求指标点"
+                else:
+                    goals = generate_aacsb_goals(
+                        basic_info['course_name_cn'], basic_info['course_type'], basic_info['department'],
+                        basic_info['major'], requirements, basic_info['extra_info']
+                    )
+                    if goals is None:
+                        errors['aacsb_goals'] = "未能生成AACSB目标"
+            except Exception as e:
+                stage = 'graduation_requirements' if requirements is None else 'aacsb_goals'
+                errors[stage] = str(e)
+                logger.warning("预先生成%s失败：%s", stage, e)
+            finally:
+                futures['graduation_requirements'].set_result(requirements)
+                # AACSB目标连同生成它所用的指标点一起保存，一键生成时核对
+                futures['aacsb_goals'].set_result((requirements, goals))
+
+    @staticmethod
+    def _wait(future):
+        """等待预取结果，期间响应调用方的超时和取消"""
+        while True:
+            try:
+                return future.result(timeout=WAIT_INTERVAL)
+            except FutureTimeout:
+                deadline.check()
+
+    def wrap_stages(self, stages, basic_info):
+        """让预取的阶段直接使用（或等待）后台结果，输入不一致或预取失败时照常生成"""
+        running = self._lookup(basic_info)
+        if running is None:
+            return stages
+        futures = running['futures']
+
+        def prefetched(stage):
+            def func(**inputs):
+                value = self._wait(futures[stage.name])
+                if stage.name == "aacsb_goals":
+                    requirements, value = value
+                    # 指标点在预取后被修改时，AACSB目标需要重新生成
+                    if requirements != inputs['graduation_requirements']:
+                        value = None
+                return value if value is not None else stage.func(**inputs)
+            return func
+
+        return [
+            Stage(s.name, prefetched(s), s.inputs, s.optional) if s.name in futures else s
+            for s in stages
+        ]
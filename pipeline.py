@@ -0,0 +1,141 @@
+import time
+import contextvars
+import deadline
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# 等待阶段完成时检查超时和取消的间隔（秒）
+STAGE_POLL_INTERVAL = 0.5
+
+class Stage:
+    def __init__(self, name, func, inputs=(), optional=False):
+        """流水线中的一个生成阶段
+
+        name 同时作为该阶段输出的键；func 以 inputs 中各键对应的值作为关键字参数调用。
+        返回None或抛出异常视为失败，依赖它的阶段将被跳过；
+        optional=True 时失败结果记为None，下游阶段照常执行。
+        """
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.optional = optional
+
+def validate_stages(stages, initial_keys=()):
+    """检查阶段依赖是否完整且无环"""
+    available = set(initial_keys)
+    names = [stage.name for stage in stages]
+    if len(names) != len(set(names)):
+        raise ValueError("阶段名称重复")
+
+    pending = list(stages)
+    while pending:
+        ready = [s for s in pending if all(key in available for key in s.inputs)]
+        if not ready:
+            missing = {s.name: [k for k in s.inputs if k not in available] for s in pending}
+            raise ValueError(f"阶段依赖无法满足或存在循环：{missing}")
+        for stage in ready:
+            available.add(stage.name)
+            pending.remove(stage)
+
+def _remaining_chain(stages):
+    """每个阶段到最后一个下游阶段的最长链长度（含自身），用于分配剩余时间"""
+    dependents = {stage.name: [] for stage in stages}
+    for stage in stages:
+        for key in stage.inputs:
+            if key in dependents:
+                dependents[key].append(stage.name)
+
+    lengths = {}
+    def length(name):
+        if name not in lengths:
+            lengths[name] = 1 + max((length(d) for d in dependents[name]), default=0)
+        return lengths[name]
+    return {stage.name: length(stage.name) for stage in stages}
+
+def run_stages(stages, initial=None, max_workers=4, wrap=None, on_stage_done=None):
+    """按依赖关系并行执行各阶段，输入就绪的阶段立即开始
+
+    wrap 用于在提交到线程池前包装阶段函数（例如绑定Streamlit上下文）；
+    on_stage_done(name, value, error, elapsed) 在主线程中回调。
+    在 deadline.deadline_scope 内调用时，每个阶段按其后还需串行执行的阶段数分得剩余时间；
+    超时、取消或调用方异常退出时，未完成的阶段记为失败并通过取消令牌通知其停止。
+    返回 (results, failed)，results 包含初始输入与成功阶段的输出，
+    failed 为 {阶段名: 失败原因}。
+    """
+    results = dict(initial or {})
+    validate_stages(stages, results.keys())
+    chain = _remaining_chain(stages)
+
+    pending = {stage.name: stage for stage in stages}
+    failed = {}
+    running = {}
+
+    outer_token = deadline.current_token()
+    token = outer_token.child() if outer_token else deadline.CancelToken()
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        with deadline.deadline_scope(token=token):
+            while pending or running:
+                # 跳过上游失败的阶段
+                for name, stage in list(pending.items()):
+                    blocked = [key for key in stage.inputs if key in failed]
+                    if blocked:
+                        failed[name] = f"上游阶段失败：{', '.join(blocked)}"
+                        del pending[name]
+                        if on_stage_done:
+                            on_stage_done(name, None, failed[name], 0.0)
+
+                # 提交输入已就绪的阶段
+                for name, stage in list(pending.items()):
+                    if all(key in results for key in stage.inputs):
+                        func = wrap(stage.func) if wrap else stage.func
+                        kwargs = {key: results[key] for key in stage.inputs}
+                        left = deadline.remaining()
+                        budget = None if left is None else max(left, 0) / chain[name]
+                        # 复制当前上下文，阶段函数继承调用方的请求范围（如调度优先级、截止时间）
+                        future = executor.submit(contextvars.copy_context().run, _timed_call, func, kwargs, budget)
+                        running[future] = stage
+                        del pending[name]
+
+                if not running:
+                    break
+
+                done, _ = wait(running, timeout=STAGE_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                if not done and deadline.missed():
+                    # 超时或已取消：不再等待进行中的阶段
+                    reason = token.reason if token.cancelled else "超过截止时间"
+                    for stage in list(running.values()) + list(pending.values()):
+                        failed[stage.name] = reason
+                        if on_stage_done:
+                            on_stage_done(stage.name, None, reason, 0.0)
+                    running.clear()
+                    pending.clear()
+                    break
+
+                for future in done:
+                    stage = running.pop(future)
+                    try:
+                        value, elapsed = future.result()
+                        error = None if value is not None else "返回结果为空"
+                    except Exception as e:
+                        value, elapsed, error = None, 0.0, str(e)
+
+                    if error and not stage.optional:
+                        failed[stage.name] = error
+                    else:
+                        results[stage.name] = value
+
+                    if on_stage_done:
+                        on_stage_done(stage.name, value, error, elapsed)
+    finally:
+        # 提前结束时通知仍在执行的阶段停止，且不等待它们结束
+        if running or pending:
+            token.cancel("流水线已停止")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results, failed
+
+def _timed_call(func, kwargs, budget=None):
+    start = time.perf_counter()
+    with deadline.deadline_scope(seconds=budget):
+        value = func(**kwargs)
+    return value, time.perf_counter() - start
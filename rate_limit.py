@@ -0,0 +1,154 @@
+import threading
+import time
+
+# 等待期间调用check的间隔（秒）
+CHECK_INTERVAL = 0.5
+
+class TokenBucketLimiter:
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0):
+        """按每分钟请求数和每分钟token数限流的令牌桶，取值为0表示不限制"""
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_allowance = float(requests_per_minute)
+        self._token_allowance = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._request_allowance = min(
+                self.requests_per_minute,
+                self._request_allowance + elapsed * self.requests_per_minute / 60.0
+            )
+        if self.tokens_per_minute:
+            self._token_allowance = min(
+                self.tokens_per_minute,
+                self._token_allowance + elapsed * self.tokens_per_minute / 60.0
+            )
+
+    def acquire(self, tokens=0, check=None):
+        """阻塞直到额度足够，返回等待的秒数
+
+        check 为等待期间定期调用的函数（如检查超时和取消），抛出异常时放弃等待，不扣除额度。
+        """
+        waited = 0.0
+        # 单次请求超过整桶容量时按整桶计，避免永久阻塞
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                wait_time = 0.0
+                if self.requests_per_minute and self._request_allowance < 1:
+                    wait_time = max(wait_time, (1 - self._request_allowance) * 60.0 / self.requests_per_minute)
+                if self.tokens_per_minute and self._token_allowance < tokens:
+                    wait_time = max(wait_time, (tokens - self._token_allowance) * 60.0 / self.tokens_per_minute)
+
+                if wait_time <= 0:
+                    if self.requests_per_minute:
+                        self._request_allowance -= 1
+                    if self.tokens_per_minute:
+                        self._token_allowance -= tokens
+                    return waited
+
+            if check:
+                wait_time = min(wait_time, CHECK_INTERVAL)
+            time.sleep(wait_time)
+            waited += wait_time
+            if check:
+                check()
+
+class AdaptiveConcurrencyLimiter:
+    def __init__(self, initial_limit=4, min_limit=1, max_limit=32, latency_tolerance=2.0,
+                 backoff_ratio=0.5, cooldown_seconds=2.0, reserved=0):
+        """按接口反馈自动调整并发数的限流器（AIMD）
+
+        延迟稳定时每完成约 limit 个请求并发数加1；收到429/5xx或超时时并发数乘以
+        backoff_ratio，延迟超过基线的 latency_tolerance 倍时并发数减少10%。
+        两次下调之间至少间隔 cooldown_seconds，避免同一波错误反复下调。
+        reserved 为调度器按上限分配时为高优先级请求预留的名额数（见 FairScheduler），
+        进行中的请求达到 limit - reserved 即视为用满，只有低优先级请求时上限也能继续增加。
+        """
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        self.cooldown_seconds = cooldown_seconds
+        self.reserved = reserved
+        self.in_flight = 0
+        self._baselines = {}
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self.successes = 0
+        self.overloads = 0
+        self.errors = 0
+        self.retries = 0
+        self.latency_decreases = 0
+
+    def enter(self):
+        """登记一个开始执行的请求，不等待；完成后调用 release
+
+        限流器本身不阻塞请求，并发名额由调度器（如 FairScheduler）按 current_limit() 分配。
+        """
+        with self._cond:
+            self.in_flight += 1
+
+    def current_limit(self):
+        """当前的并发上限"""
+        return int(self.limit)
+
+    def _decrease(self, ratio, now):
+        if now - self._last_decrease < self.cooldown_seconds:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * ratio)
+
+    def release(self, outcome="success", latency=None, kind="default"):
+        """释放并发名额并根据结果调整上限
+
+        outcome 为 success、overload（429/5xx/超时）或 error（其他错误，不调整上限）；
+        latency 为本次请求的延迟样本，不同 kind 的样本分别维护基线。
+        """
+        now = time.monotonic()
+        with self._cond:
+            # 调整前记录是否用满了并发，只有用满时才需要继续增加
+            saturated = self.in_flight >= max(1, int(self.limit) - self.reserved)
+            self.in_flight -= 1
+            if outcome == "overload":
+                self.overloads += 1
+                self._decrease(self.backoff_ratio, now)
+            elif outcome == "error":
+                self.errors += 1
+            else:
+                self.successes += 1
+                baseline = self._baselines.get(kind)
+                if latency is not None:
+                    # 基线取较快的样本，并缓慢跟随整体延迟的变化
+                    self._baselines[kind] = latency if baseline is None or latency < baseline else baseline * 0.95 + latency * 0.05
+                if baseline is not None and latency is not None and latency > baseline * self.latency_tolerance:
+                    self.latency_decreases += 1
+                    self._decrease(0.9, now)
+                elif saturated:
+                    self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def record_retry(self):
+        with self._cond:
+            self.retries += 1
+
+    def metrics(self):
+        """当前并发上限、进行中的请求数及累计计数"""
+        with self._cond:
+            return {
+                'limit': int(self.limit),
+                'in_flight': self.in_flight,
+                'successes': self.successes,
+                'overloads': self.overloads,
+                'errors': self.errors,
+                'retries': self.retries,
+                'latency_decreases': self.latency_decreases,
+                'latency_baselines': dict(self._baselines)
+            }
@@ -0,0 +1,25 @@
+import os
+import threading
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+def attach_script_run_ctx(func):
+    """让线程池中执行的函数可以调用st.error/st.warning等Streamlit接口"""
+    ctx = get_script_run_ctx()
+
+    def run(*args, **kwargs):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return func(*args, **kwargs)
+    return run
+
+def get_api_key(name="DEEPSEEK_API_KEY"):
+    """优先读取Streamlit secrets中的API Key，未配置时读取同名环境变量"""
+    try:
+        return st.secrets[name]
+    except Exception:
+        return os.environ.get(name, "")
+
+def current_session_id():
+    """当前浏览器会话的ID，用于区分不同用户；不在Streamlit中运行时返回空字符串"""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else ""